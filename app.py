@@ -1,14 +1,13 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 from datetime import datetime
-import queue
-import csv
-import os
 from tkcalendar import DateEntry # type: ignore
-from PIL import Image, ImageTk # type: ignore
-
-CSV_PENDING = "pending.csv"
-CSV_DELIVERED = "DELIVERED.csv"
+from core.events import EventLog
+from core.orders import OrderBook, format_order, format_delivery, format_customer, save_manifest
+from core.order_rules import OrderError, parse_batch
+from core.instrumentation import STATS, timed
+from core.io_worker import IOWorker
+from asset_cache import logo
 
 class OrderApp:
     def __init__(self, root):
@@ -22,18 +21,20 @@ class OrderApp:
         header.pack(fill='x')
 
         # Load and display image
-        image_path = "sofa corner logo new.png"
         try:
-            original_image = Image.open(image_path)
-            resized_image = original_image.resize((150, 100))
-            self.tk_image = ImageTk.PhotoImage(resized_image)
-            image_label = tk.Label(root, image=self.tk_image, bg='#153e75')
-            image_label.pack(pady=10)
+            self.tk_image = logo(root, (150, 100))
+            if self.tk_image is not None:
+                image_label = tk.Label(root, image=self.tk_image, bg='#153e75')
+                image_label.pack(pady=10)
         except Exception as e:
             print("Image load error:", e)
 
-        self.order_queue = queue.PriorityQueue()
-        self.order_counter = 0
+        # Storage writes and manifests run on the I/O worker, in order; each
+        # change is then published for Today's Plan
+        self.io = IOWorker("orders-io")
+        self.book = OrderBook(io=self.io, events=EventLog())
+        self.view_offset = 0   # index of the first order shown in the listbox
+        self.listbox_ids = []  # Listbox row -> order_id
 
         frame = tk.Frame(root, padx=10, pady=10, bg='#153e75')
         frame.pack()
@@ -86,16 +87,46 @@ class OrderApp:
         button_font = ("Arial", 10, "bold")
         tk.Button(btn_frame, text="Add Order", command=self.add_order, font=button_font).grid(row=0, column=0, padx=5)
         tk.Button(btn_frame, text="Deliver Next Order", command=self.deliver_order, font=button_font).grid(row=0, column=1, padx=5)
-        tk.Button(btn_frame, text="Show Pending Orders", command=self.show_orders, font=button_font).grid(row=0, column=2, padx=5)
-
-        self.listbox = tk.Listbox(root, width=120, height=10, bg='lightblue', fg='black', font=("Arial", 10, "bold"))
-        self.listbox.pack(padx=10, pady=10)
+        tk.Button(btn_frame, text="Deliver Batch", command=self.open_batch_dialog, font=button_font).grid(row=0, column=2, padx=5)
+        tk.Button(btn_frame, text="Show Pending Orders", command=self.show_orders, font=button_font).grid(row=0, column=3, padx=5)
+        tk.Button(btn_frame, text="Cancel Selected", command=self.cancel_order, font=button_font).grid(row=0, column=4, padx=5)
+        tk.Button(btn_frame, text="Toggle Priority", command=self.toggle_priority, font=button_font).grid(row=0, column=5, padx=5)
+        tk.Button(btn_frame, text="Customer Lookup", command=self.open_customer_panel, font=button_font).grid(row=0, column=6, padx=5)
+        tk.Button(btn_frame, text="Stats", command=self.toggle_stats, font=button_font).grid(row=0, column=7, padx=5)
+        tk.Button(btn_frame, text="Dashboard", command=self.toggle_dashboard, font=button_font).grid(row=0, column=8, padx=5)
+
+        # Only the visible window of the pending list is inserted into the Listbox;
+        # the scrollbar and mouse wheel move that window over self.book.orders
+        list_frame = tk.Frame(root, bg='#153e75')
+        list_frame.pack(padx=10, pady=10)
+        self.listbox = tk.Listbox(list_frame, width=120, height=10, bg='lightblue', fg='black', font=("Arial", 10, "bold"))
+        self.listbox.pack(side='left')
+        self.list_scrollbar = tk.Scrollbar(list_frame, orient='vertical', command=self.scroll_orders)
+        self.list_scrollbar.pack(side='right', fill='y')
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll_orders("scroll", -1 if e.delta > 0 else 1, "units"))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll_orders("scroll", -1, "units"))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll_orders("scroll", 1, "units"))
 
         footer = tk.Label(root, text="© 2025 Your Company Name - All rights reserved",
                           bg="#C62300", fg="white", font=("Arial", 10, "bold"), pady=5)
         footer.pack(fill='x', side='bottom')
+        self.status_label = tk.Label(root, text="", bg='#153e75', fg='white', font=("Arial", 10))
+        self.status_label.pack(side='bottom')
+        self.io.attach(root, on_status=lambda text: self.status_label.config(text=text),
+                       on_error=self.show_io_error)
 
         self.load_orders()
+        STATS.start_dump("stats_app.json")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_close(self):
+        # The window goes at once; shutdown() finishes the queued writes after
+        # the event loop has stopped
+        self.root.destroy()
+
+    def shutdown(self):
+        self.io.close(callbacks=False)
+        self.book.close()
 
     def add_order(self):
         try:
@@ -103,93 +134,178 @@ class OrderApp:
         except:
             order_date_str = datetime.today().strftime("%Y-%m-%d")
 
-        name = self.entry_name.get().strip()
-        cust_id = self.entry_cust_id.get().strip()
-        phone_number = self.entry_phone_number.get().strip()
-        address = self.entry_address.get().strip()
-        prod_id = self.entry_prod_id.get().strip()
-        order_details = self.entry_order_details.get().strip()
-        total_amount_str = self.entry_total_amount.get().strip()
-        advance_paid_str = self.entry_advance_paid.get().strip()
-        important = self.var_important.get()
-
-        if not (name and cust_id and address and prod_id and phone_number and order_details and total_amount_str and advance_paid_str):
-            messagebox.showerror("Input Error", "Please fill all fields.")
-            return
+        def added(order):
+            messagebox.showinfo("Success", f"Order added for {order['name']}.")
+            self.show_orders()
 
         try:
-            order_date = datetime.strptime(order_date_str, "%Y-%m-%d").date()
-            total_amount = float(total_amount_str)
-            advance_paid = float(advance_paid_str)
-        except ValueError:
-            messagebox.showerror("Format Error", "Check date and amount formats.")
+            self.book.add({
+                "order_date": order_date_str,
+                "name": self.entry_name.get(),
+                "customer_id": self.entry_cust_id.get(),
+                "address": self.entry_address.get(),
+                "phone_number": self.entry_phone_number.get(),
+                "product_id": self.entry_prod_id.get(),
+                "order": self.entry_order_details.get(),
+                "total_amount": self.entry_total_amount.get(),
+                "advance_paid": self.entry_advance_paid.get(),
+                "important": "1" if self.var_important.get() else "0"
+            }, on_done=added)
+        except OrderError as e:
+            messagebox.showerror(e.title, str(e))
             return
-
-        importance_flag = 0 if important else 1
-
-        order = {
-            "order_date": order_date,
-            "name": name,
-            "customer_id": cust_id,
-            "address": address,
-            "phone_number": phone_number,
-            "product_id": prod_id,
-            "order": order_details,
-            "total_amount": total_amount,
-            "advance_paid": advance_paid,
-            "priority_flag": importance_flag
-        }
-
-        priority_tuple = (importance_flag, order_date, -total_amount, self.order_counter)
-        self.order_queue.put((priority_tuple, order))
-        self.order_counter += 1
-
-        self.append_order_to_csv(order, CSV_PENDING)
-        messagebox.showinfo("Success", f"Order added for {name}.")
         self.clear_inputs()
-        self.show_orders()
 
     def deliver_order(self):
-        if self.order_queue.empty():
+        order = self.book.deliver_next()
+        if order is None:
             messagebox.showinfo("No Orders", "No orders to deliver.")
             return
 
-        priority_tuple, order = self.order_queue.get()
-        self.append_order_to_csv(order, CSV_DELIVERED)
-        self.remove_order_from_pending(order)
-
-        details = (
-            f"Delivering Order:\n\n"
-            f"Order Date    : {order['order_date']}\n"
-            f"Customer Name : {order['name']}\n"
-            f"Customer ID   : {order['customer_id']}\n"
-            f"Address       : {order['address']}\n"
-            f"Phone Number  : {order['phone_number']}\n"
-            f"Product ID    : {order['product_id']}\n"
-            f"Order Details : {order['order']}\n"
-            f"Total Amount  : ₹{order['total_amount']}\n"
-            f"Advance Paid  : ₹{order['advance_paid']}\n"
-            f"Balance Due   : ₹{order['total_amount'] - order['advance_paid']}\n"
-            f"Priority      : {'High' if order['priority_flag'] == 0 else 'Normal'}"
-        )
-        messagebox.showinfo("Order DELIVERED", details)
+        messagebox.showinfo("Order DELIVERED", format_delivery(order))
+        self.show_orders()
+
+    def open_batch_dialog(self):
+        # Deliver next N: the top N orders, or all orders up to a value or date
+        # cutoff, in one operation with a dispatch manifest file
+        win = tk.Toplevel(self.root)
+        win.title("Deliver Batch")
+        win.configure(bg='#153e75')
+        label_font = ("Arial", 10, "bold")
+        entries = []
+        for row, text in enumerate(["Number of Orders:", "Max Total Value (₹):", "Order Date up to (YYYY-MM-DD):"]):
+            tk.Label(win, text=text, bg='#153e75', fg='white', font=label_font).grid(row=row, column=0, sticky="e", padx=5, pady=3)
+            entry = tk.Entry(win)
+            entry.grid(row=row, column=1, padx=5, pady=3)
+            entries.append(entry)
+        tk.Label(win, text="Manifest Format:", bg='#153e75', fg='white', font=label_font).grid(row=3, column=0, sticky="e", padx=5, pady=3)
+        var_format = tk.StringVar(value="text")
+        tk.OptionMenu(win, var_format, "text", "csv").grid(row=3, column=1, sticky="w", padx=5, pady=3)
+        tk.Label(win, text="Leave a field blank for no limit.", bg='#153e75', fg='white').grid(row=4, column=0, columnspan=2)
+        tk.Button(win, text="Deliver", font=label_font,
+                  command=lambda: self.deliver_batch(win, [e.get() for e in entries], var_format.get())
+                  ).grid(row=5, column=0, columnspan=2, pady=10)
+        entries[0].focus_set()
+
+    def deliver_batch(self, win, limits, fmt):
+        try:
+            limit, max_value, until = parse_batch(*limits)
+        except OrderError as e:
+            messagebox.showerror(e.title, str(e), parent=win)
+            return
+        if limit is None and max_value is None and until is None:
+            if not messagebox.askyesno("Deliver Batch", f"No limits set. Deliver all {len(self.book)} pending orders?",
+                                       parent=win):
+                return
+        extension = ".csv" if fmt == "csv" else ".txt"
+        path = filedialog.asksaveasfilename(parent=win, title="Save Dispatch Manifest", defaultextension=extension,
+                                            initialfile=f"dispatch_{datetime.now():%Y%m%d_%H%M}{extension}")
+        if not path:
+            return
+        orders = self.book.deliver_batch(limit, max_value, until)
+        if not orders:
+            messagebox.showinfo("No Orders", "No orders to deliver.", parent=win)
+            return
+        win.destroy()
+        self.show_orders()
+
+        def delivered(result):
+            count, total, balance = result
+            messagebox.showinfo("Batch DELIVERED", f"Delivered {count} orders.\n\nTotal: ₹{total:.2f}\n"
+                                                   f"Balance Due: ₹{balance:.2f}\n\nManifest: {path}")
+        self.io.submit(save_manifest, path, orders, fmt, label="Writing dispatch manifest", on_done=delivered)
+
+    def show_io_error(self, job, error):
+        # The queue in memory is ahead of the files; tell the operator what did not reach disk
+        messagebox.showerror("Storage Error", f"{job.label or 'Saving orders'} failed:\n{error}")
+
+    def selected_order_id(self):
+        selection = self.listbox.curselection()
+        if not selection or selection[0] >= len(self.listbox_ids):
+            messagebox.showinfo("No Selection", "Select a pending order first.")
+            return None
+        return self.listbox_ids[selection[0]]
+
+    def cancel_order(self):
+        order_id = self.selected_order_id()
+        if order_id is None:
+            return
+        order = self.book.get(order_id)
+        if not messagebox.askyesno("Cancel Order", f"Cancel order {order_id} for {order['name']}?"):
+            return
+        self.book.cancel(order_id)
+        self.show_orders()
+
+    def toggle_priority(self):
+        order_id = self.selected_order_id()
+        if order_id is None:
+            return
+        self.book.toggle_priority(order_id)
         self.show_orders()
 
+    def scroll_orders(self, action, amount, unit=None):
+        total = len(self.book)
+        page = int(self.listbox.cget("height"))
+        if action == "moveto":
+            self.view_offset = int(float(amount) * total)
+        elif action == "scroll":
+            step = page if unit == "pages" else 1
+            self.view_offset += int(amount) * step
+        self.show_orders()
+        return "break"
+
+    @timed("ui.show_orders")
     def show_orders(self):
+        # Render only the rows that fit in the listbox, starting at view_offset
         self.listbox.delete(0, tk.END)
-        if self.order_queue.empty():
+        total = len(self.book)
+        page = int(self.listbox.cget("height"))
+        self.view_offset = max(0, min(self.view_offset, total - page))
+        self.listbox_ids = self.book.order_ids(self.view_offset, self.view_offset + page)
+        if total:
+            self.list_scrollbar.set(self.view_offset / total, (self.view_offset + len(self.listbox_ids)) / total)
+        else:
+            self.list_scrollbar.set(0, 1)
             self.listbox.insert(tk.END, "No pending orders.")
             return
-        temp_list = list(self.order_queue.queue)
-        temp_list.sort()
-        for idx, (priority_tuple, order) in enumerate(temp_list, 1):
-            display_text = (
-                f"{idx}. {order['name']} | ID: {order['customer_id']} | Address: {order['address']} | Phone: {order['phone_number']} | "
-                f"Prod ID: {order['product_id']} | Date: {order['order_date']} | "
-                f"Total: ₹{order['total_amount']} | Advance: ₹{order['advance_paid']} | "
-                f"Priority: {'High' if order['priority_flag'] == 0 else 'Normal'}"
-            )
-            self.listbox.insert(tk.END, display_text)
+        for idx, order_id in enumerate(self.listbox_ids, self.view_offset + 1):
+            self.listbox.insert(tk.END, format_order(idx, self.book.get(order_id)))
+
+    def open_customer_panel(self):
+        # Customer 360: pending, delivered and vendor records for one customer ID or phone number
+        win = tk.Toplevel(self.root)
+        win.title("Customer Lookup")
+        win.configure(bg='#153e75')
+
+        search_frame = tk.Frame(win, bg='#153e75', pady=5)
+        search_frame.pack(fill='x')
+        tk.Label(search_frame, text="Customer ID or Phone:", bg='#153e75', fg='white',
+                 font=("Arial", 10, "bold")).pack(side='left', padx=5)
+        entry = tk.Entry(search_frame)
+        entry.pack(side='left', padx=5)
+
+        text = tk.Text(win, width=110, height=25, font=("Courier", 10))
+        text.pack(padx=10, pady=10)
+
+        def show(summary):
+            if text.winfo_exists():
+                text.delete("1.0", tk.END)
+                text.insert(tk.END, format_customer(summary))
+
+        def lookup(event=None):
+            self.book.lookup_customer(entry.get(), show)
+
+        tk.Button(search_frame, text="Search", command=lookup).pack(side='left', padx=5)
+        entry.bind("<Return>", lookup)
+        entry.focus_set()
+
+    def toggle_stats(self):
+        from stats_window import toggle_stats_window
+        toggle_stats_window(self.root)
+
+    def toggle_dashboard(self):
+        from dashboard_window import toggle_dashboard_window
+        toggle_dashboard_window(self.root, self.book.finance_summary)
 
     def clear_inputs(self):
         self.entry_name.delete(0, tk.END)
@@ -203,71 +319,15 @@ class OrderApp:
         self.entry_advance_paid.delete(0, tk.END)
         self.var_important.set(0)
 
-    def append_order_to_csv(self, order, filename):
-        file_exists = os.path.isfile(filename)
-        with open(filename, 'a', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ["order_date", "name", "customer_id", "address", "phone_number",
-                          "product_id", "order", "total_amount", "advance_paid", "priority_flag"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            if not file_exists:
-                writer.writeheader()
-            order_to_write = order.copy()
-            order_to_write['order_date'] = order['order_date'].strftime("%Y-%m-%d")
-            writer.writerow(order_to_write)
-
-    def remove_order_from_pending(self, order_to_remove):
-        if not os.path.isfile(CSV_PENDING):
-            return
-        orders = []
-        with open(CSV_PENDING, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if (row["name"] == order_to_remove["name"] and
-                    row["customer_id"] == order_to_remove["customer_id"] and
-                    row["product_id"] == order_to_remove["product_id"] and
-                    row["order_date"] == order_to_remove["order_date"].strftime("%Y-%m-%d") and
-                    abs(float(row["total_amount"]) - order_to_remove["total_amount"]) < 0.01):
-                    continue
-                orders.append(row)
-        with open(CSV_PENDING, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ["order_date", "name", "customer_id", "address", "phone_number",
-                          "product_id", "order", "total_amount", "advance_paid", "priority_flag"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for row in orders:
-                writer.writerow(row)
-
+    @timed("app.load_orders")
     def load_orders(self):
-        if not os.path.isfile(CSV_PENDING):
-            return
-        with open(CSV_PENDING, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                try:
-                    order_date = datetime.strptime(row["order_date"], "%Y-%m-%d").date()
-                    total_amount = float(row["total_amount"])
-                    advance_paid = float(row["advance_paid"])
-                    priority_flag = int(row["priority_flag"])
-                except Exception as e:
-                    print("Skipping invalid row:", row, "Error:", e)
-                    continue
-                order = {
-                    "order_date": order_date,
-                    "name": row["name"],
-                    "customer_id": row["customer_id"],
-                    "address": row["address"],
-                    "phone_number": row["phone_number"],
-                    "product_id": row["product_id"],
-                    "order": row["order"],
-                    "total_amount": total_amount,
-                    "advance_paid": advance_paid,
-                    "priority_flag": priority_flag
-                }
-                priority_tuple = (priority_flag, order_date, -total_amount, self.order_counter)
-                self.order_queue.put((priority_tuple, order))
-                self.order_counter += 1
+        stats = self.book.load()
+        self.book.customers()  # indexed on the I/O worker now rather than on the first lookup
+        print(f"Loaded {stats['rows']} pending orders in {stats['seconds']:.2f}s "
+              f"({stats['rows_per_sec']:,.0f} rows/sec, {stats['skipped']} skipped)")
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = OrderApp(root)
     root.mainloop()
+    app.shutdown()
@@ -2,11 +2,18 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 from tkcalendar import DateEntry # type: ignore
-import csv
-from PIL import Image, ImageTk # type: ignore
-import os
+from core.events import EventLog
+from core.vendor import VendorBook
+from core.instrumentation import STATS, timed
+from core.io_worker import IOWorker
+from asset_cache import logo
+
+def s_no(vendor_id):
+    # S.No shown for a row: fixed for the session, so a delete leaves a gap
+    # instead of renumbering every row below it. Vendor IDs follow the CSV
+    # order, and the file's S.No column is renumbered by the next rewrite
+    return vendor_id + 1
 
-CSV_FILE = "orders_export.csv"
 
 # Custom draggable message box
 def custom_message(parent, title, message):
@@ -16,12 +23,9 @@ def custom_message(parent, title, message):
     win.resizable(False, False)
     win.grab_set()
 
-    # Load and display logo image if exists
-    image_path = "sofa corner logo new.png"
-    if os.path.exists(image_path):
-        original_image = Image.open(image_path)
-        resized_image = original_image.resize((250, 200))
-        tk_image = ImageTk.PhotoImage(resized_image)
+    # Display logo image if exists (decoded and resized once, then cached)
+    tk_image = logo(win, (250, 200))
+    if tk_image is not None:
         image_label = tk.Label(win, image=tk_image)
         image_label.image = tk_image  # Keep reference to avoid GC
         image_label.pack(pady=10)
@@ -50,18 +54,16 @@ class VendorDeliveryApp:
         self.root = root
         self.root.title("Vendor Delivery System")
         self.root.configure(bg='#000957')
-        self.orders = []
+        self.io = IOWorker("vendor-io")  # status/delete writes and the CSV rewrite
+        self.book = VendorBook(io=self.io, events=EventLog())  # book.orders: vendor_id -> values; the Treeview item iid is str(vendor_id)
 
         # Header with logo and text
         header_frame = tk.Frame(root, bg='#C5172E', pady=10)
         header_frame.pack(fill='x')
 
         # Load and resize the logo image
-        image_path = "sofa corner logo new.png"
-        if os.path.exists(image_path):
-            original_image = Image.open(image_path)
-            resized_image = original_image.resize((60, 40))
-            self.logo_img = ImageTk.PhotoImage(resized_image)
+        self.logo_img = logo(root, (60, 40))
+        if self.logo_img is not None:
             img_label = tk.Label(header_frame, image=self.logo_img, bg='#C5172E')
             img_label.pack(side='left', padx=10)
 
@@ -116,6 +118,8 @@ class VendorDeliveryApp:
         tk.Button(button_frame, text="Update Selected", command=self.update_status_only, bg="blue", fg="white", width=15).grid(row=0, column=1, padx=5)
         tk.Button(button_frame, text="Delete Selected", command=self.delete_order, bg="#C5172E", fg="white", width=15).grid(row=0, column=2, padx=5)
         tk.Button(button_frame, text="Clear", command=self.clear_form, bg="gray", fg="white", width=15).grid(row=0, column=3, padx=5)
+        tk.Button(button_frame, text="Stats", command=self.toggle_stats, bg="gray", fg="white", width=15).grid(row=0, column=4, padx=5)
+        tk.Button(button_frame, text="Dashboard", command=self.toggle_dashboard, bg="gray", fg="white", width=15).grid(row=0, column=5, padx=5)
 
         # Treeview with vertical scrollbar
         tree_frame = tk.Frame(root)
@@ -144,18 +148,20 @@ class VendorDeliveryApp:
         footer = tk.Label(root, text="© 2025 Vendor Delivery System | All rights reserved", font=('Arial', 10),
                           bg='#C5172E', fg='white', pady=5)
         footer.pack(fill='x')
+        self.status_label = tk.Label(root, text="", bg='#000957', fg='white')
+        self.status_label.pack()
+        self.io.attach(root, on_status=lambda text: self.status_label.config(text=text),
+                       on_error=self.show_io_error)
 
         self.entries['Order Date'].set_date(datetime.now().date())
 
         # Load orders from CSV on startup
         self.load_orders_from_csv()
         self.populate_treeview()
+        STATS.start_dump("stats_app2.json")
 
-    def calculate_total_price(self, quantity, price):
-        try:
-            return float(quantity) * float(price)
-        except:
-            return 0.0
+        # Pending debounced rewrites are flushed when the window closes
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def add_order(self):
         try:
@@ -167,16 +173,11 @@ class VendorDeliveryApp:
                     return
                 order_data.append(value)
 
-            total_price = self.calculate_total_price(order_data[5], order_data[7])  # quantity index 5, price index 7
-            s_no = len(self.orders) + 1
-            full_data = [s_no] + order_data + [f"{total_price:.2f}"]
-            self.orders.append(full_data)
-            self.tree.insert('', 'end', values=full_data)
+            def added(vendor_id):
+                self.tree.insert('', 'end', iid=str(vendor_id), values=[s_no(vendor_id)] + self.book.orders[vendor_id])
+            self.book.add(order_data, on_done=added)
             self.clear_form()
 
-            # Auto-save to CSV after adding
-            self.save_orders_to_csv()
-
         except Exception as e:
             custom_message(self.root, "Error", str(e))
 
@@ -194,18 +195,18 @@ class VendorDeliveryApp:
     def load_selected_order(self, event):
         selected = self.tree.selection()
         if selected:
-            values = self.tree.item(selected[0])['values']
+            values = self.book.orders[int(selected[0])]
             for i, field in enumerate(self.fields):
                 if field == "Status":
-                    self.entries[field].set(values[i + 1])
+                    self.entries[field].set(values[i])
                 elif field in ["Order Date", "Vendor Delivered Date"]:
                     try:
-                        self.entries[field].set_date(values[i + 1])
+                        self.entries[field].set_date(values[i])
                     except:
                         self.entries[field].set_date(datetime.now().date())
                 else:
                     self.entries[field].delete(0, tk.END)
-                    self.entries[field].insert(0, values[i + 1])
+                    self.entries[field].insert(0, values[i])
 
     # ONLY update the Status field of the selected order
     def update_status_only(self):
@@ -220,23 +221,14 @@ class VendorDeliveryApp:
                 custom_message(self.root, "Input Error", "Please select Status")
                 return
 
-            item = self.tree.item(selected[0])
-            current_values = list(item['values'])  # Make a mutable copy
+            vendor_id = int(selected[0])
+            status_index = self.fields.index('Status')
+            self.book.update_status(vendor_id, new_status)
 
-            status_index = self.fields.index('Status') + 1  # +1 because first column is S.No
-            current_values[status_index] = new_status
-
-            s_no = current_values[0]
-            index = s_no - 1
-            self.orders[index][status_index] = new_status
-
-            # Update treeview display
-            self.tree.item(selected[0], values=current_values)
+            # Update just the Status cell (+1 because first column is S.No)
+            self.tree.set(selected[0], str(status_index + 1), new_status)
             custom_message(self.root, "Success", "Status updated successfully.")
 
-            # Auto-save after update
-            self.save_orders_to_csv()
-
         except Exception as e:
             custom_message(self.root, "Error", str(e))
 
@@ -247,47 +239,50 @@ class VendorDeliveryApp:
             return
         confirm = messagebox.askyesno("Delete", "Are you sure you want to delete this order?")
         if confirm:
-            item = self.tree.item(selected[0])
-            s_no = item['values'][0]
+            vendor_id = int(selected[0])
             self.tree.delete(selected[0])
-            self.orders.pop(s_no - 1)
-            # Re-number all remaining orders
-            self.tree.delete(*self.tree.get_children())
-            for i, order in enumerate(self.orders):
-                order[0] = i + 1
-                self.tree.insert('', 'end', values=order)
-
-            # Auto-save after deletion
-            self.save_orders_to_csv()
+            self.book.delete(vendor_id)
             self.clear_form()
 
-    def save_orders_to_csv(self):
-        try:
-            with open(CSV_FILE, mode='w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['S.No'] + self.fields + ['Total Price'])
-                writer.writerows(self.orders)
-        except Exception as e:
-            custom_message(self.root, "Error", f"Failed to save orders:\n{e}")
+    def show_io_error(self, job, error):
+        custom_message(self.root, "Error", f"{job.label or 'Saving orders'} failed:\n{error}")
+
+    def save_orders_to_csv(self, on_done=None):
+        def failed(job, error):
+            self.show_io_error(job, error)
+            if on_done is not None:
+                on_done()
+        self.book.flush(on_done=on_done, on_error=failed)
+
+    def on_close(self):
+        # The window stays up until the rewrite (queued after any other writes) is on disk
+        self.save_orders_to_csv(on_done=self.root.destroy)
+
+    def shutdown(self):
+        # After the event loop: anything still queued behind the rewrite
+        self.io.close(callbacks=False)
 
+    @timed("app.load_orders_from_csv")
     def load_orders_from_csv(self):
-        if not os.path.exists(CSV_FILE):
-            return
         try:
-            with open(CSV_FILE, mode='r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                headers = next(reader)
-                self.orders.clear()
-                for row in reader:
-                    if len(row) == len(self.fields) + 2:
-                        self.orders.append(row)
+            self.book.load()
+            self.book.index_search()
         except Exception as e:
             custom_message(self.root, "Error", f"Failed to load orders:\n{e}")
 
+    @timed("ui.populate_treeview")
     def populate_treeview(self):
         self.tree.delete(*self.tree.get_children())
-        for order in self.orders:
-            self.tree.insert('', 'end', values=order)
+        for vendor_id, values in self.book.orders.items():
+            self.tree.insert('', 'end', iid=str(vendor_id), values=[s_no(vendor_id)] + values)
+
+    def toggle_stats(self):
+        from stats_window import toggle_stats_window
+        toggle_stats_window(self.root)
+
+    def toggle_dashboard(self):
+        from dashboard_window import toggle_dashboard_window
+        toggle_dashboard_window(self.root, self.book.finance_summary)
 
     def search_orders(self):
         search_text = self.search_name.get().strip().lower()
@@ -295,28 +290,24 @@ class VendorDeliveryApp:
             custom_message(self.root, "Input Error", "Please enter customer name or ID to search.")
             return
 
-        found = False
-        for item in self.tree.get_children():
-            values = self.tree.item(item)['values']
-            customer_name = str(values[self.fields.index('Customer Name') + 1]).lower()
-            customer_id = str(values[self.fields.index('Customer ID') + 1]).lower()
-
-            if search_text == customer_name or search_text == customer_id:
-                self.tree.selection_set(item)
-                self.tree.focus(item)
-
-                status = values[self.fields.index('Status') + 1]
-                vendor_name = values[self.fields.index('Vendor Name') + 1]
-
-                self.search_status_label.config(
-                    text=f"Delivery Status: {status} | Vendor Name: {vendor_name}"
-                )
-                found = True
-                break
-
-        if not found:
+        matches = self.book.search(search_text)
+        if not matches:
             self.search_status_label.config(text="No matching customer found.")
             self.tree.selection_remove(self.tree.selection())
+            return
+
+        items = [str(vendor_id) for vendor_id in matches]
+        self.tree.selection_set(items)
+        self.tree.focus(items[0])
+        self.tree.see(items[0])
+
+        values = self.book.orders[matches[0]]
+        status = values[self.fields.index('Status')]
+        vendor_name = values[self.fields.index('Vendor Name')]
+        text = f"Delivery Status: {status} | Vendor Name: {vendor_name}"
+        if len(matches) > 1:
+            text = f"{len(matches)} matches - first: {text}"
+        self.search_status_label.config(text=text)
 
     def reset_search(self):
         self.search_name.delete(0, tk.END)
@@ -327,3 +318,4 @@ if __name__ == "__main__":
     root = tk.Tk()
     app = VendorDeliveryApp(root)
     root.mainloop()
+    app.shutdown()
@@ -1,12 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from datetime import datetime
-import csv
-import os
-from PIL import Image, ImageTk  # type: ignore
+from tkcalendar import DateEntry  # type: ignore
+from core.order_rules import OrderError
+from core.events import EventLog
+from core.plan import PLAN_WINDOWS, PLAN_COLUMNS, plan_window, plan_values, LivePlan
+from core.scheduler import (RUN_COLUMNS, DEFAULT_STOPS, DEFAULT_VEHICLES, DEFAULT_SLOTS,
+                            parse_capacity, schedule, run_sheet_rows, add_to_runs, remove_from_run)
+from core.search_index import SearchIndex
+from core.storage import open_storage
+from core.instrumentation import STATS, timer
+from core.io_worker import IOWorker
+from asset_cache import logo
 
-CUSTOMER_CSV = "pending.csv"
-VENDOR_CSV = "orders_export.csv"
+EVENT_POLL_MS = 500  # how often the event log is checked for new lines
 
 # ----- LOGIN WINDOW -----
 def show_login_window():
@@ -44,17 +50,24 @@ class TodaysPlanApp:
         self.root.title("Today's Plan - Delivery Status")
         self.root.geometry("1200x600")
         self.root.configure(bg='darkblue')
+        self.storage = open_storage()
+        self.search_index = SearchIndex()  # Treeview iid (str(Order ID)) -> customer name / ID
+        self.plan_items = {}  # Order ID -> plan item, every order loaded into the plan so far
+        self.runs = []  # the run sheet shown, from schedule() and then the live updates
+        self.run_of = {}  # Order ID -> its run in self.runs
+        self.run_capacity = None  # capacity self.runs was scheduled with
+        self.io = IOWorker("plan-io")  # the plan join and the live updates run here, off the event loop
+        self.io.attach(root, on_status=self.show_status, on_error=self.show_io_error)
+        self.events = EventLog()
+        self.live_plan = None  # LivePlan for the loaded window, fed by the order and vendor windows' events
 
         # Header
         tk.Label(root, text="Today's Plan - Vendor Delivered Orders for Dispatch",
                  font=("Arial", 22, "bold"), bg='#C62300', fg='white').pack(fill='x')
 
         # Load logo image if available
-        image_path = "sofa corner logo new.png"
-        if os.path.exists(image_path):
-            original_image = Image.open(image_path)
-            resized_image = original_image.resize((150, 100))
-            tk_image = ImageTk.PhotoImage(resized_image)
+        tk_image = logo(root, (150, 100))
+        if tk_image is not None:
             image_label = tk.Label(root, image=tk_image)
             image_label.image = tk_image
             image_label.pack(pady=10)
@@ -69,9 +82,8 @@ class TodaysPlanApp:
         tk.Button(search_frame, text="Search", command=self.search_customer,
                   bg='darkblue', fg='white', font=('Arial', 11, 'bold')).pack(side='left', padx=10)
 
-        # Treeview columns
-        columns = ['Customer ID', 'Product ID', 'Customer Name', 'Phone Number', 'Address',
-                   'Order Date', 'Product Name', 'Quantity', 'Total Amount', 'Vendor Delivered Date']
+        # Treeview columns: the run sheet, one row per stop
+        columns = RUN_COLUMNS + PLAN_COLUMNS
 
         style = ttk.Style()
         style.theme_use("default")
@@ -94,88 +106,189 @@ class TodaysPlanApp:
         self.tree = ttk.Treeview(tree_frame, columns=columns, show='headings', style="Treeview")
         for col in columns:
             self.tree.heading(col, text=col)
-            self.tree.column(col, anchor='center', width=120)
+            self.tree.column(col, anchor='center', width=60 if col in RUN_COLUMNS else 110)
         self.tree.pack(fill='both', expand=True)
 
+        # Date window for the plan: today, the last N days, or a custom range
+        window_frame = tk.Frame(root, bg='darkblue')
+        window_frame.pack(pady=5)
+        tk.Label(window_frame, text="Vendor Delivered:", bg='darkblue', fg='white',
+                 font=("Arial", 12)).pack(side='left', padx=5)
+        self.window_mode = ttk.Combobox(window_frame, values=PLAN_WINDOWS, state="readonly", width=12)
+        self.window_mode.current(0)
+        self.window_mode.pack(side='left', padx=5)
+        tk.Label(window_frame, text="N:", bg='darkblue', fg='white', font=("Arial", 12)).pack(side='left')
+        self.window_days = tk.Spinbox(window_frame, from_=1, to=365, width=5)
+        self.window_days.pack(side='left', padx=5)
+        tk.Label(window_frame, text="From:", bg='darkblue', fg='white', font=("Arial", 12)).pack(side='left')
+        self.window_start = DateEntry(window_frame, date_pattern='yyyy-mm-dd')
+        self.window_start.pack(side='left', padx=5)
+        tk.Label(window_frame, text="To:", bg='darkblue', fg='white', font=("Arial", 12)).pack(side='left')
+        self.window_end = DateEntry(window_frame, date_pattern='yyyy-mm-dd')
+        self.window_end.pack(side='left', padx=5)
+
+        # Run capacity: orders per vehicle run, vehicles per slot and the day's slots
+        capacity_frame = tk.Frame(root, bg='darkblue')
+        capacity_frame.pack(pady=5)
+        tk.Label(capacity_frame, text="Stops per Run:", bg='darkblue', fg='white',
+                 font=("Arial", 12)).pack(side='left', padx=5)
+        self.capacity_stops = tk.Spinbox(capacity_frame, from_=1, to=200, width=5)
+        self.capacity_stops.delete(0, 'end')
+        self.capacity_stops.insert(0, DEFAULT_STOPS)
+        self.capacity_stops.pack(side='left', padx=5)
+        tk.Label(capacity_frame, text="Vehicles:", bg='darkblue', fg='white', font=("Arial", 12)).pack(side='left')
+        self.capacity_vehicles = tk.Spinbox(capacity_frame, from_=1, to=50, width=5)
+        self.capacity_vehicles.delete(0, 'end')
+        self.capacity_vehicles.insert(0, DEFAULT_VEHICLES)
+        self.capacity_vehicles.pack(side='left', padx=5)
+        tk.Label(capacity_frame, text="Slots:", bg='darkblue', fg='white', font=("Arial", 12)).pack(side='left')
+        self.capacity_slots = tk.Entry(capacity_frame, width=30)
+        self.capacity_slots.insert(0, ", ".join(DEFAULT_SLOTS))
+        self.capacity_slots.pack(side='left', padx=5)
+        tk.Button(capacity_frame, text="Rebuild Run Sheet", command=self.show_run_sheet,
+                  bg='darkblue', fg='white', font=('Arial', 11, 'bold')).pack(side='left', padx=10)
+
         # Footer Button
-        tk.Button(root, text="Load Today's Plan", command=self.load_todays_plan,
-                  bg='#C62300', fg='white', font=("Arial", 13, "bold")).pack(pady=5, fill='x')
+        self.load_button = tk.Button(root, text="Load Today's Plan", command=self.load_todays_plan,
+                                     bg='#C62300', fg='white', font=("Arial", 13, "bold"))
+        self.load_button.pack(pady=5, fill='x')
+        self.status_label = tk.Label(root, text="", bg='darkblue', fg='white', font=("Arial", 11))
+        self.status_label.pack()
+        tk.Button(root, text="Stats", command=self.toggle_stats,
+                  bg='darkblue', fg='white', font=("Arial", 11, "bold")).pack(pady=5)
+        STATS.start_dump("stats_app3.json")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(EVENT_POLL_MS, self.poll_events)
+
+    def on_close(self):
+        # A plan join in progress is removing matched orders from pending; let it finish
+        self.io.submit(lambda: None, on_done=lambda _: self.root.destroy(),
+                       on_error=lambda job, error: self.root.destroy())
+
+    def plan_window(self):
+        return plan_window(self.window_mode.get(), self.window_days.get(),
+                           self.window_start.get_date(), self.window_end.get_date())
+
+    def toggle_stats(self):
+        from stats_window import toggle_stats_window
+        toggle_stats_window(self.root)
+
+    def show_status(self, text):
+        self.status_label.config(text=text)
+
+    def show_io_error(self, job, error):
+        self.load_button.config(state='normal')
+        messagebox.showerror("Storage Error", f"{job.label or 'Saving'} failed:\n{error}")
+
+    def capacity(self):
+        try:
+            return parse_capacity(self.capacity_stops.get(), self.capacity_vehicles.get(), self.capacity_slots.get())
+        except OrderError as e:
+            messagebox.showerror(e.title, str(e))
+            return None
 
     def load_todays_plan(self):
-        existing_entries = set()
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
-            if values:
-                existing_entries.add((values[0], values[1]))  # (Customer ID, Product ID)
-
-        if not os.path.exists(CUSTOMER_CSV) or not os.path.exists(VENDOR_CSV):
-            messagebox.showerror("File Error", "Customer or Vendor CSV file not found.")
+        if self.io.busy:
+            return
+        window = self.plan_window()
+        if window is None:
+            self.show_custom_messagebox("Check the date window.")
+            return
+        start_str, end_str = window
+        if self.capacity() is None:
             return
 
-        today_str = datetime.now().strftime("%Y-%m-%d")
-        vendor_delivered = set()
-        vendor_dates = {}
-
-        # Step 1: Collect vendor-delivered orders
-        with open(VENDOR_CSV, newline='', encoding='utf-8') as vf:
-            reader = csv.DictReader(vf)
-            for row in reader:
-                if row.get('Status', '').strip().lower() == 'delivered':
-                    cust_id = row['Customer ID'].strip()
-                    prod_id = row['Product ID'].strip()
-                    delivered_date = row.get('Vendor Delivered Date', '').strip()
-                    vendor_delivered.add((cust_id, prod_id))
-                    vendor_dates[(cust_id, prod_id)] = delivered_date
-
-        # Step 2: Build today's plan from pending.csv based on vendor delivery date
-        updated_rows = []
-        todays_plan = []
-
-        with open(CUSTOMER_CSV, newline='', encoding='utf-8') as cf:
-            reader = list(csv.DictReader(cf))
-            for row in reader:
-                cust_id = row['customer_id'].strip()
-                prod_id = row['product_id'].strip()
-                key = (cust_id, prod_id)
-                delivered_date = vendor_dates.get(key, '')
-
-                if key in vendor_delivered and delivered_date == today_str:
-                    if key not in existing_entries:
-                        todays_plan.append({
-                            'Customer ID': cust_id,
-                            'Product ID': prod_id,
-                            'Customer Name': row['name'].strip(),
-                            'Phone Number': row['phone_number'].strip(),
-                            'Address': row['address'].strip(),
-                            'Order Date': row['order_date'].strip(),
-                            'Product Name': row['order'].strip(),
-                            'Quantity': '1',
-                            'Total Amount': float(row['total_amount']) if row['total_amount'] else 0,
-                            'Vendor Delivered Date': delivered_date
-                        })
-                    # Don't keep it in pending.csv
-                else:
-                    updated_rows.append(row)
-
-        # Step 3: Update pending.csv to remove completed dispatches
-        if updated_rows:
-            with open(CUSTOMER_CSV, 'w', newline='', encoding='utf-8') as cf:
-                writer = csv.DictWriter(cf, fieldnames=updated_rows[0].keys())
-                writer.writeheader()
-                writer.writerows(updated_rows)
-
-        # Step 4: Display Today's Plan sorted by Total Amount
+        # Pairs already in the plan, kept by the previous window's LivePlan
+        existing_entries = self.live_plan.shown if self.live_plan is not None else set()
+        if self.live_plan is not None:
+            self.live_plan.close()
+        self.live_plan = LivePlan(self.storage, self.events, start_str, end_str)
+
+        # Step 1: Join vendor-delivered orders in the window against pending orders
+        # on the I/O worker. Matched orders leave the pending store in the same
+        # streaming pass; from then on the window's changes arrive as events
+        self.load_button.config(state='disabled')
+        self.io.submit(self.live_plan.load, existing_entries,
+                       label="Building Today's Plan", on_done=self.show_plan)
+
+    def show_plan(self, todays_plan):
+        # Step 2: Schedule everything loaded so far into vehicle runs
+        self.load_button.config(state='normal')
         if todays_plan:
-            todays_plan.sort(key=lambda x: x['Total Amount'], reverse=True)
-            for plan in todays_plan:
-                self.tree.insert('', 'end', values=(
-                    plan['Customer ID'], plan['Product ID'], plan['Customer Name'],
-                    plan['Phone Number'], plan['Address'], plan['Order Date'],
-                    plan['Product Name'], plan['Quantity'],
-                    f"{plan['Total Amount']:.2f}", plan['Vendor Delivered Date']
-                ))
+            self.plan_items.update((item['Order ID'], item) for item in todays_plan)
+            self.show_run_sheet()
+        else:
+            self.show_custom_messagebox("No new vendor-delivered orders in this window.")
+
+    def poll_events(self):
+        # Picks up the changes published since the last check on the I/O
+        # worker: one stat of the log, plus the new lines if there are any
+        self.root.after(EVENT_POLL_MS, self.poll_events)
+        if self.live_plan is not None and not self.io.busy:
+            self.io.submit(self.live_plan.poll, on_done=self.apply_events)
+
+    def apply_events(self, delta):
+        # New dispatch-ready orders join a run of their locality with a stop
+        # to spare (or a new run at the end), orders delivered or cancelled in
+        # the order window leave theirs. Only the rows of those runs change;
+        # Rebuild Run Sheet schedules the whole plan again
+        added, removed = delta
+        if not added and not removed:
+            return
+        if self.run_capacity is None:
+            for order_id in removed:
+                self.plan_items.pop(order_id, None)
+            self.plan_items.update((item['Order ID'], item) for item in added)
+            self.show_run_sheet()
         else:
-            self.show_custom_messagebox("No new vendor-delivered orders for today.")
+            changed = {}
+            with timer("ui.plan_update"):
+                for order_id in removed:
+                    item = self.plan_items.pop(order_id, None)
+                    if item is not None:
+                        run = self.run_of.pop(order_id)
+                        remove_from_run(run, item)
+                        changed[run["run"]] = run
+                        self.tree.delete(str(order_id))
+                        self.search_index.remove(str(order_id))
+                for item in added:
+                    self.plan_items[item['Order ID']] = item
+                    run = add_to_runs(self.runs, item, *self.run_capacity)
+                    self.run_of[item['Order ID']] = run
+                    changed[run["run"]] = run
+                # In dispatch order, so the runs before each one are already in place
+                for number in sorted(changed):
+                    self.show_run(changed[number])
+        self.show_status(f"Plan updated: {len(added)} added, {len(removed)} removed")
+
+    def show_run(self, run):
+        # Writes the rows of one run at its place in the Treeview: stop numbers
+        # and order may have changed, and new stops are inserted
+        position = sum(len(other["stops"]) for other in self.runs[:run["run"] - 1])
+        for item, values in zip(run["stops"], run_sheet_rows([run], plan_values)):
+            iid = str(item['Order ID'])
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=values)
+                self.tree.move(iid, '', position)
+            else:
+                self.tree.insert('', position, iid=iid, values=values)
+                self.search_index.add(iid, item['Customer Name'], item['Customer ID'])
+            position += 1
+
+    def show_run_sheet(self):
+        capacity = self.capacity()
+        if capacity is None:
+            return
+        self.run_capacity = capacity
+        self.runs = schedule(self.plan_items.values(), *capacity)
+        self.run_of = {item['Order ID']: run for run in self.runs for item in run["stops"]}
+        with timer("ui.plan_insert"):
+            self.tree.delete(*self.tree.get_children())
+            self.search_index.clear()
+            for run in self.runs:
+                for item, values in zip(run["stops"], run_sheet_rows([run], plan_values)):
+                    iid = self.tree.insert('', 'end', iid=str(item['Order ID']), values=values)
+                    self.search_index.add(iid, item['Customer Name'], item['Customer ID'])
 
     def show_custom_messagebox(self, message):
         top = tk.Toplevel(self.root)
@@ -192,12 +305,11 @@ class TodaysPlanApp:
             self.show_custom_messagebox("Enter a customer name to search.")
             return
 
-        for item in self.tree.get_children():
-            values = self.tree.item(item, 'values')
-            if values and name_to_search in values[2].lower():  # Customer Name at index 2
-                self.tree.selection_set(item)
-                self.tree.see(item)
-                return
+        matches = self.search_index.search(name_to_search)
+        if matches:
+            self.tree.selection_set(matches)
+            self.tree.see(matches[0])
+            return
 
         self.show_custom_messagebox("Customer not found in today's plan.")
 
@@ -0,0 +1,93 @@
+# Shared image asset cache for the three apps. Each source image is decoded
+# once, resized variants are memoized in an LRU keyed by (path, mtime, size),
+# and resized thumbnails can be kept on disk so a cold start skips decoding
+# the full-size logo. Tk PhotoImages are cached per interpreter, so dialogs
+# reuse the same image instead of rebuilding it on every message box.
+import glob
+import os
+from collections import OrderedDict
+from PIL import Image, ImageTk  # type: ignore
+from core.instrumentation import timed
+
+LOGO_PATH = "sofa corner logo new.png"
+THUMB_DIR = os.environ.get("CMS_ASSET_DIR", ".asset_cache")
+DISK_CACHE = os.environ.get("CMS_ASSET_DISK_CACHE", "1") != "0"
+LRU_SIZE = 32
+
+
+class AssetCache:
+    def __init__(self, thumb_dir=THUMB_DIR, disk_cache=DISK_CACHE, lru_size=LRU_SIZE):
+        self.thumb_dir = thumb_dir
+        self.disk_cache = disk_cache
+        self.lru_size = lru_size
+        self._sources = {}              # path -> (mtime_ns, decoded Image)
+        self._resized = OrderedDict()   # (path, mtime_ns, size) -> Image
+        self._photos = {}               # (tk interpreter, path, mtime_ns, size) -> PhotoImage
+
+    def _thumb_path(self, path, mtime_ns, size):
+        name = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+        return os.path.join(self.thumb_dir, f"{name}-{size[0]}x{size[1]}-{mtime_ns}.png")
+
+    def source(self, path):
+        mtime_ns = os.stat(path).st_mtime_ns
+        cached = self._sources.get(path)
+        if cached is None or cached[0] != mtime_ns:
+            image = Image.open(path)
+            image.load()
+            cached = self._sources[path] = (mtime_ns, image)
+        return cached[1]
+
+    @timed("assets.resized")
+    def resized(self, path, size):
+        size = tuple(size)
+        mtime_ns = os.stat(path).st_mtime_ns
+        key = (path, mtime_ns, size)
+        image = self._resized.get(key)
+        if image is not None:
+            self._resized.move_to_end(key)
+            return image
+
+        thumb_path = self._thumb_path(path, mtime_ns, size) if self.disk_cache else None
+        if thumb_path and os.path.exists(thumb_path):
+            image = Image.open(thumb_path)
+            image.load()
+        else:
+            image = self.source(path).resize(size)
+            if thumb_path:
+                self._save_thumb(thumb_path, image)
+
+        self._resized[key] = image
+        if len(self._resized) > self.lru_size:
+            self._resized.popitem(last=False)
+        return image
+
+    def _save_thumb(self, thumb_path, image):
+        try:
+            os.makedirs(self.thumb_dir, exist_ok=True)
+            # Thumbnails of older versions of the same image at this size are stale
+            stale_prefix = thumb_path.rsplit("-", 1)[0] + "-"
+            for stale in glob.glob(glob.escape(stale_prefix) + "*.png"):
+                os.remove(stale)
+            tmp_path = thumb_path + ".tmp"
+            image.save(tmp_path, format="PNG")
+            os.replace(tmp_path, thumb_path)
+        except OSError as e:
+            print("Thumbnail cache error:", e)
+
+    def photo(self, master, path, size):
+        # PhotoImage for master's Tk interpreter, or None if the image is missing
+        if not os.path.exists(path):
+            return None
+        size = tuple(size)
+        key = (master.tk, path, os.stat(path).st_mtime_ns, size)
+        photo = self._photos.get(key)
+        if photo is None:
+            photo = self._photos[key] = ImageTk.PhotoImage(self.resized(path, size), master=master)
+        return photo
+
+
+ASSETS = AssetCache()
+
+
+def logo(master, size):
+    return ASSETS.photo(master, LOGO_PATH, size)
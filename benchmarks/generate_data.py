@@ -0,0 +1,106 @@
+# Synthetic data for the benchmarks: pending.csv, DELIVERED.csv and
+# orders_export.csv with realistic customers, products, dates and amounts.
+#   python benchmarks/generate_data.py --rows 100000 --out data/100k
+import argparse
+import csv
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pending_store import FIELDNAMES, COUNTER_FILE
+from core.vendor_store import VENDOR_HEADER
+
+FIRST_NAMES = ["Arun", "Priya", "Karthik", "Divya", "Suresh", "Lakshmi", "Vijay", "Meena", "Ravi", "Anitha",
+               "Praveen", "Kavya", "Ganesh", "Deepa", "Manoj", "Revathi", "Senthil", "Nithya", "Hari", "Sangeetha"]
+LAST_NAMES = ["Kumar", "Raj", "Anbalagan", "Subramanian", "Krishnan", "Natarajan", "Pillai", "Iyer", "Murugan", "Rao"]
+STREETS = ["Anna Salai", "Gandhi Road", "Nehru Street", "Lake View Road", "Temple Street", "Market Road"]
+CITIES = ["Chennai", "Madurai", "Coimbatore", "Trichy", "Salem", "Erode"]
+PRODUCTS = ["3 Seater Sofa", "L Shape Sofa", "Recliner", "Sofa Cum Bed", "Dining Chair", "Ottoman", "Diwan",
+            "Corner Sofa", "Bean Bag", "Accent Chair"]
+COLOURS = ["Grey", "Brown", "Blue", "Beige", "Maroon", "Green", "Black"]
+VENDORS = ["Sri Furnitures", "Royal Woods", "Comfort Craft", "Urban Seating", "Classic Interiors"]
+
+
+def make_customers(count, rng):
+    customers = []
+    for i in range(count):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        address = f"{rng.randint(1, 250)}, {rng.choice(STREETS)}, {rng.choice(CITIES)}"
+        phone = f"9{rng.randint(100000000, 999999999)}"
+        customers.append((f"CUST{i:07d}", name, address, phone))
+    return customers
+
+
+def make_order(order_id, customers, rng, today):
+    customer_id, name, address, phone = rng.choice(customers)
+    product = rng.randrange(len(PRODUCTS) * 50)
+    total = rng.randrange(5000, 150000, 500)
+    return [
+        (today - timedelta(days=rng.randint(0, 365))).strftime("%Y-%m-%d"),
+        name, customer_id, address, phone,
+        f"P{product:04d}", PRODUCTS[product % len(PRODUCTS)],
+        f"{float(total)}", f"{float(rng.randrange(0, total // 2 + 1, 500))}",
+        "0" if rng.random() < 0.2 else "1",
+        str(order_id)
+    ]
+
+
+def generate(directory, rows, seed=42, today=None):
+    # rows pending orders, rows delivered orders and rows vendor records.
+    # About half of the vendor records belong to pending orders, and half of
+    # those are Delivered within the last 30 days, so Today's Plan has work to do
+    rng = random.Random(seed)
+    today = today or date.today()
+    os.makedirs(directory, exist_ok=True)
+    customers = make_customers(max(rows // 5, 1), rng)
+
+    pending = []
+    with open(os.path.join(directory, "pending.csv"), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        for order_id in range(rows):
+            row = make_order(order_id, customers, rng, today)
+            writer.writerow(row)
+            if rng.random() < 0.5:
+                pending.append(row)
+    with open(os.path.join(directory, COUNTER_FILE), 'w', encoding='utf-8') as f:
+        f.write(str(rows * 2))
+
+    with open(os.path.join(directory, "DELIVERED.csv"), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        for order_id in range(rows, rows * 2):
+            writer.writerow(make_order(order_id, customers, rng, today))
+
+    with open(os.path.join(directory, "orders_export.csv"), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(VENDOR_HEADER)
+        for s_no in range(1, rows + 1):
+            if pending and s_no % 2:
+                order = pending[(s_no // 2) % len(pending)]
+                order_date, name, customer_id, product_id, product = order[0], order[1], order[2], order[5], order[6]
+            else:
+                customer_id, name, _, _ = rng.choice(customers)
+                order_date = (today - timedelta(days=rng.randint(0, 365))).strftime("%Y-%m-%d")
+                product_id = f"P{rng.randrange(len(PRODUCTS) * 50):04d}"
+                product = rng.choice(PRODUCTS)
+            quantity = rng.randint(1, 3)
+            price = rng.randrange(5000, 60000, 500)
+            delivered = rng.random() < 0.5
+            delivered_date = (today - timedelta(days=rng.randint(0, 30))).strftime("%Y-%m-%d")
+            writer.writerow([s_no, order_date, customer_id, product_id, product, name, quantity,
+                             rng.choice(COLOURS), price, "Delivered" if delivered else "Not Delivered",
+                             rng.choice(VENDORS), delivered_date, quantity * price])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate benchmark CSV files")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--out", default=".")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate(args.out, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows per file to {args.out}")
@@ -0,0 +1,100 @@
+# The pre-table loader (heap entries with LazyOrder), kept as a baseline for
+# run_memory.py. Turns stored records into heap entries in one pass; when
+# lazy=True the full order dict is only built the first time it is read.
+import time
+from core.order_loader import parse_date, gc_paused
+from core.pending_store import FIELDNAMES, FIELD_INDEX
+from core.instrumentation import count, timed
+
+NAME, CUSTOMER_ID, ADDRESS, PHONE, PRODUCT_ID, ORDER = (
+    FIELD_INDEX[f] for f in ("name", "customer_id", "address", "phone_number", "product_id", "order"))
+ORDER_DATE, TOTAL, ADVANCE, FLAG, ORDER_ID = (
+    FIELD_INDEX[f] for f in ("order_date", "total_amount", "advance_paid", "priority_flag", "order_id"))
+PARSED_FIELDS = ("order_date", "total_amount", "advance_paid", "priority_flag", "order_id")
+
+
+class LazyOrder:
+    __slots__ = ("_record", "_order", "order_date", "total_amount", "advance_paid", "priority_flag", "order_id")
+
+    def __init__(self, record, order_date, total_amount, advance_paid, priority_flag, order_id):
+        self._record = record
+        self._order = None
+        self.order_date = order_date
+        self.total_amount = total_amount
+        self.advance_paid = advance_paid
+        self.priority_flag = priority_flag
+        self.order_id = order_id
+
+    def materialize(self):
+        if self._order is None:
+            record = self._record
+            self._order = {
+                "order_date": self.order_date,
+                "name": record[NAME],
+                "customer_id": record[CUSTOMER_ID],
+                "address": record[ADDRESS],
+                "phone_number": record[PHONE],
+                "product_id": record[PRODUCT_ID],
+                "order": record[ORDER],
+                "total_amount": self.total_amount,
+                "advance_paid": self.advance_paid,
+                "priority_flag": self.priority_flag,
+                "order_id": self.order_id
+            }
+            self._record = None
+        return self._order
+
+    def __getitem__(self, key):
+        return self.materialize()[key]
+
+    def __setitem__(self, key, value):
+        self.materialize()[key] = value
+        if key == "priority_flag":
+            self.priority_flag = value
+
+    def get(self, key, default=None):
+        return self.materialize().get(key, default)
+
+    def field(self, key):
+        # Single field without materializing (used by indexes built at load time)
+        if self._order is not None:
+            return self._order[key]
+        if key in PARSED_FIELDS:
+            return getattr(self, key)
+        return self._record[FIELD_INDEX[key]]
+
+
+@timed("orders.load_entries")
+def load_entries(records, lazy=True):
+    # records: lists in FIELDNAMES order (storage.pending_records()).
+    # Returns ([(priority_tuple, order_id, order)], stats) ready for heapify.
+    started = time.perf_counter()
+    entries = []
+    append = entries.append
+    skipped = 0
+    with gc_paused():
+        for record in records:
+            try:
+                order_date = parse_date(record[ORDER_DATE])
+                total_amount = float(record[TOTAL])
+                advance_paid = float(record[ADVANCE])
+                priority_flag = int(record[FLAG])
+                order_id = int(record[ORDER_ID])
+            except Exception as e:
+                print("Skipping invalid row:", dict(zip(FIELDNAMES, record)), "Error:", e)
+                skipped += 1
+                continue
+            order = LazyOrder(record, order_date, total_amount, advance_paid, priority_flag, order_id)
+            if not lazy:
+                order = order.materialize()
+            append(((priority_flag, order_date, -total_amount, order_id), order_id, order))
+    elapsed = time.perf_counter() - started
+    count("orders.rows_loaded", len(entries))
+    count("orders.rows_skipped", skipped)
+    stats = {
+        "rows": len(entries),
+        "skipped": skipped,
+        "seconds": elapsed,
+        "rows_per_sec": len(entries) / elapsed if elapsed > 0 else float(len(entries))
+    }
+    return entries, stats
@@ -0,0 +1,125 @@
+# Indexed binary heap for pending orders, keyed by the persistent order ID.
+# Every entry's heap position is tracked so an order can be removed or have
+# its priority changed in O(log n) without scanning the queue. The app moved
+# to core/order_table.py; kept here as a baseline for run_memory.py.
+import heapq
+from core.instrumentation import timed
+
+
+class IndexedOrderHeap:
+    def __init__(self):
+        self._heap = []    # [priority_tuple, order_id]
+        self._pos = {}     # order_id -> index into self._heap
+        self._orders = {}  # order_id -> order dict
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, order_id):
+        return order_id in self._pos
+
+    def empty(self):
+        return not self._heap
+
+    @timed("queue.push")
+    def push(self, order_id, priority_tuple, order):
+        if order_id in self._pos:
+            raise KeyError(f"Order {order_id} is already queued")
+        self._heap.append([priority_tuple, order_id])
+        self._pos[order_id] = len(self._heap) - 1
+        self._orders[order_id] = order
+        self._sift_up(len(self._heap) - 1)
+
+    @timed("queue.bulk_load")
+    def bulk_load(self, entries):
+        # entries: iterable of (priority_tuple, order_id, order); one O(n) heapify
+        for priority_tuple, order_id, order in entries:
+            if order_id in self._orders:
+                continue
+            self._heap.append([priority_tuple, order_id])
+            self._orders[order_id] = order
+        heapq.heapify(self._heap)
+        self._pos = {entry[1]: index for index, entry in enumerate(self._heap)}
+
+    def peek(self):
+        if not self._heap:
+            raise IndexError("peek from an empty order heap")
+        priority_tuple, order_id = self._heap[0]
+        return priority_tuple, self._orders[order_id]
+
+    @timed("queue.pop")
+    def pop(self):
+        if not self._heap:
+            raise IndexError("pop from an empty order heap")
+        order_id = self._heap[0][1]
+        return self.remove(order_id)
+
+    def get(self, order_id):
+        return self._orders[order_id]
+
+    def priority(self, order_id):
+        return self._heap[self._pos[order_id]][0]
+
+    @timed("queue.remove")
+    def remove(self, order_id):
+        index = self._pos[order_id]
+        last = len(self._heap) - 1
+        if index != last:
+            self._swap(index, last)
+        priority_tuple, _ = self._heap.pop()
+        del self._pos[order_id]
+        order = self._orders.pop(order_id)
+        if index < len(self._heap):
+            self._sift_up(index)
+            self._sift_down(index)
+        return priority_tuple, order
+
+    @timed("queue.update_priority")
+    def update_priority(self, order_id, priority_tuple):
+        index = self._pos[order_id]
+        old_priority = self._heap[index][0]
+        self._heap[index][0] = priority_tuple
+        if priority_tuple < old_priority:
+            self._sift_up(index)
+        else:
+            self._sift_down(index)
+
+    def items(self):
+        # Unordered walk over (priority_tuple, order)
+        for priority_tuple, order_id in self._heap:
+            yield priority_tuple, self._orders[order_id]
+
+    def ordered(self):
+        return sorted(self.items(), key=lambda entry: entry[0])
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][1]] = i
+        self._pos[heap[j][1]] = j
+
+    def _sift_up(self, index):
+        heap = self._heap
+        while index > 0:
+            parent = (index - 1) >> 1
+            if heap[index][0] < heap[parent][0]:
+                self._swap(index, parent)
+                index = parent
+            else:
+                break
+
+    def _sift_down(self, index):
+        heap = self._heap
+        size = len(heap)
+        while True:
+            smallest = index
+            left = 2 * index + 1
+            right = left + 1
+            if left < size and heap[left][0] < heap[smallest][0]:
+                smallest = left
+            if right < size and heap[right][0] < heap[smallest][0]:
+                smallest = right
+            if smallest == index:
+                break
+            self._swap(index, smallest)
+            index = smallest
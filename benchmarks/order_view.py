@@ -0,0 +1,36 @@
+# Pending orders kept in display (priority) order. The list is maintained
+# with bisect on every add/remove instead of being re-sorted per refresh,
+# and the last element of each priority tuple is the order_id. Baseline for
+# run_memory.py only.
+from bisect import bisect_left, insort
+
+
+class SortedOrderView:
+    def __init__(self):
+        self._keys = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __getitem__(self, index):
+        return self._keys[index]
+
+    def build(self, priority_tuples):
+        self._keys = sorted(priority_tuples)
+
+    def add(self, priority_tuple):
+        insort(self._keys, priority_tuple)
+
+    def remove(self, priority_tuple):
+        index = bisect_left(self._keys, priority_tuple)
+        if index < len(self._keys) and self._keys[index] == priority_tuple:
+            del self._keys[index]
+
+    def position(self, priority_tuple):
+        index = bisect_left(self._keys, priority_tuple)
+        if index < len(self._keys) and self._keys[index] == priority_tuple:
+            return index
+        return None
+
+    def order_ids(self, start, stop):
+        return [key[-1] for key in self._keys[start:stop]]
@@ -0,0 +1,133 @@
+# Order intake throughput over HTTP: each client posts orders as fast as it
+# can on one keep-alive connection, one order per request (POST /orders) or
+# in batches (POST /orders/batch), against a fresh store.
+#   python benchmarks/run_api.py                      # 1, 4 and 16 clients
+#   python benchmarks/run_api.py --clients 1 8 --orders 500 --batch 200
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from core.storage import CsvStorage
+
+CLIENTS = [1, 4, 16]
+ORDERS = 500  # per client
+BATCH = 100
+PORT = 8799
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def make_order(n):
+    return {"order_date": "2025-06-01", "name": "Asha Kumar", "customer_id": f"CUST{n:07d}",
+            "address": "12, Anna Salai, Chennai", "phone_number": "9876543210", "product_id": "P0001",
+            "order": "3 Seater Sofa", "total_amount": "45000.0", "advance_paid": "5000.0",
+            "important": "1" if n % 10 == 0 else "0"}
+
+
+def client(port, orders, batch, errors):
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        headers = {"Content-Type": "application/json"}
+        if batch > 1:
+            requests = [("/orders/batch", [make_order(n) for n in range(start, min(start + batch, orders))])
+                        for start in range(0, orders, batch)]
+        else:
+            requests = [("/orders", make_order(n)) for n in range(orders)]
+        for path, body in requests:
+            conn.request("POST", path, json.dumps(body), headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status not in (200, 201):
+                raise RuntimeError(f"{path}: HTTP {response.status}")
+        conn.close()
+    except Exception as e:
+        errors.append(e)
+
+
+def start_api(workdir, port):
+    api = subprocess.Popen([sys.executable, os.path.join(ROOT, "cms.py"), "api", "--port", str(port)],
+                           cwd=workdir, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while True:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            conn.getresponse().read()
+            conn.close()
+            return api
+        except OSError:
+            if time.time() > deadline or api.poll() is not None:
+                api.kill()
+                raise RuntimeError("order intake did not start")
+            time.sleep(0.05)
+
+
+def run_case(clients, orders, batch, port):
+    workdir = tempfile.mkdtemp(prefix=f"cms-api-{clients}-{batch}-")
+    api = start_api(workdir, port)
+    errors = []
+    try:
+        threads = [threading.Thread(target=client, args=(port, orders, batch, errors)) for _ in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+    finally:
+        api.terminate()
+        api.wait()
+    for error in errors:
+        print("    client failed:", error)
+    rows = sum(1 for _ in CsvStorage(os.path.join(workdir, "pending.csv")).pending_records())
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {"clients": clients, "batch": batch, "orders": clients * orders, "rows": rows, "failed": len(errors),
+            "seconds": seconds, "orders_per_sec": clients * orders / seconds if seconds > 0 else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure HTTP order intake throughput")
+    parser.add_argument("--clients", type=int, nargs="+", default=CLIENTS)
+    parser.add_argument("--orders", type=int, default=ORDERS, help="orders posted per client")
+    parser.add_argument("--batch", type=int, default=BATCH, help="orders per POST /orders/batch request")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/api-<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {}
+    }
+    for clients in args.clients:
+        for batch in (1, args.batch):
+            result = run_case(clients, args.orders, batch, args.port)
+            report["results"][f"batch{batch}[{clients}]"] = result
+            lost = result["orders"] - result["rows"]
+            print(f"  batch {batch:4d} {clients:3d} clients  {result['orders_per_sec']:9.0f} orders/s"
+                  f"  {result['seconds']:6.2f}s" + (f"  ({lost} rows missing)" if lost else ""), flush=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, "api-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", output)
+
+
+if __name__ == "__main__":
+    main()
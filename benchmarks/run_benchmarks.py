@@ -0,0 +1,200 @@
+# Headless benchmarks for the hot paths of the three apps. Each case runs the
+# core (OrderBook, VendorBook, build_plan) call behind the app method it is
+# named after, against generated data in a scratch directory.
+#   python benchmarks/run_benchmarks.py                     # 10k, 100k, 1M rows
+#   python benchmarks/run_benchmarks.py --sizes 10000 --backend sqlite
+#   python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from generate_data import generate
+from core.orders import OrderBook
+from core.plan import build_plan
+from core.storage import CsvStorage, SqliteStorage, import_csv_files
+from core.vendor import VendorBook, NAME_INDEX, CUSTOMER_INDEX
+from core.vendor_store import STATUS_INDEX
+
+SIZES = [10000, 100000, 1000000]
+OPS = 1000  # operations per single-order case
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def per_op(seconds, ops):
+    return {"seconds": seconds, "ops": ops, "us_per_op": seconds / ops * 1e6 if ops else 0.0}
+
+
+def open_backend(backend):
+    if backend == "sqlite":
+        import_csv_files("orders.db")
+        return SqliteStorage("orders.db")
+    return CsvStorage()
+
+
+# ----- OrderApp -----
+def load_orders(storage):
+    book = OrderBook(storage)
+    return book, book.load()
+
+
+def add_orders(book, count, rng):
+    for i in range(count):
+        book.add({
+            "order_date": date.today().strftime("%Y-%m-%d"), "name": f"Bench Customer {i}",
+            "customer_id": f"BENCH{i:05d}", "address": "1, Anna Salai, Chennai",
+            "phone_number": "9876543210", "product_id": f"P{rng.randrange(500):04d}",
+            "order": "Recliner", "total_amount": str(rng.randrange(5000, 150000)),
+            "advance_paid": "1000", "important": "1" if rng.random() < 0.2 else "0"
+        })
+
+
+def deliver_orders(book, count):
+    for _ in range(min(count, len(book))):
+        book.deliver_next()
+
+
+def remove_orders(book, order_ids):
+    for order_id in order_ids:
+        book.cancel(order_id)
+
+
+# ----- VendorDeliveryApp -----
+def load_vendor_orders(storage):
+    book = VendorBook(storage)
+    book.load()
+    return book
+
+
+def save_vendor_orders(book, count, rng):
+    # A burst of status edits followed by the save (flush) they are coalesced into
+    for vendor_id in rng.sample(list(book.orders), min(count, len(book))):
+        status = "Delivered" if book.orders[vendor_id][STATUS_INDEX] != "Delivered" else "Not Delivered"
+        book.update_status(vendor_id, status)
+    return timed(book.flush)[0]
+
+
+def search_vendor_orders(book, queries):
+    return sum(len(book.search(query)) for query in queries)
+
+
+# ----- TodaysPlanApp -----
+def load_todays_plan(storage, days):
+    today = date.today()
+    start = (today - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    return build_plan(storage, start, today.strftime("%Y-%m-%d"))
+
+
+def run_size(rows, backend, seed):
+    rng = random.Random(seed)
+    workdir = tempfile.mkdtemp(prefix=f"cms-bench-{rows}-")
+    cwd = os.getcwd()
+    results = {}
+    try:
+        os.chdir(workdir)
+        results["generate"] = {"seconds": timed(generate, ".", rows, seed)[0]}
+        storage = open_backend(backend)
+
+        seconds, (book, stats) = timed(load_orders, storage)
+        results["OrderApp.load_orders"] = {"seconds": seconds, "rows": stats["rows"],
+                                           "rows_per_sec": stats["rows"] / seconds if seconds else 0.0}
+        results["OrderApp.add_order"] = per_op(timed(add_orders, book, OPS, rng)[0], OPS)
+        results["OrderApp.deliver_order"] = per_op(timed(deliver_orders, book, OPS)[0], OPS)
+        order_ids = rng.sample(book.order_ids(0, len(book)), min(OPS, len(book)))
+        results["OrderApp.remove_order_from_pending"] = per_op(
+            timed(remove_orders, book, order_ids)[0], len(order_ids))
+        if backend == "csv":
+            # Clean exit leaves the binary snapshot; the next start maps it
+            results["OrderApp.on_close[snapshot]"] = {"seconds": timed(storage.save_pending_table, book.orders)[0]}
+            seconds, (_, stats) = timed(load_orders, CsvStorage())
+            results["OrderApp.load_orders[warm]"] = {"seconds": seconds, "rows": stats["rows"],
+                                                     "rows_per_sec": stats["rows"] / seconds if seconds else 0.0}
+
+        seconds, vendor_book = timed(load_vendor_orders, storage)
+        results["VendorDeliveryApp.load_orders_from_csv"] = {
+            "seconds": seconds, "rows": len(vendor_book), "rows_per_sec": len(vendor_book) / seconds if seconds else 0.0}
+        results["VendorDeliveryApp.save_orders_to_csv"] = {
+            "seconds": save_vendor_orders(vendor_book, OPS, rng), "edits": min(OPS, len(vendor_book))}
+        samples = rng.sample(list(vendor_book.orders.values()), min(OPS, len(vendor_book)))
+        queries = [values[CUSTOMER_INDEX] if i % 3 == 0 else
+                   values[NAME_INDEX].split()[0][:4] if i % 3 == 1 else values[NAME_INDEX]
+                   for i, values in enumerate(samples)]
+        results["VendorDeliveryApp.search_orders"] = per_op(timed(search_vendor_orders, vendor_book, queries)[0],
+                                                            len(queries))
+
+        seconds, plan = timed(load_todays_plan, storage, 1)
+        results["TodaysPlanApp.load_todays_plan"] = {"seconds": seconds, "matched": len(plan)}
+        seconds, plan = timed(load_todays_plan, storage, 30)
+        results["TodaysPlanApp.load_todays_plan[30d]"] = {"seconds": seconds, "matched": len(plan)}
+        storage.close()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(previous, current):
+    # Prints seconds per case, old vs new, for sizes present in both runs
+    for size, cases in current["results"].items():
+        old_cases = previous.get("results", {}).get(size)
+        if not old_cases:
+            continue
+        print(f"\n{size} rows")
+        for case, result in cases.items():
+            old = old_cases.get(case)
+            if old and old.get("seconds"):
+                change = (result["seconds"] - old["seconds"]) / old["seconds"] * 100
+                print(f"  {case:45s} {old['seconds']:9.3f}s -> {result['seconds']:9.3f}s  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the headless benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "results": {}
+    }
+    for rows in args.sizes:
+        print(f"Running {rows} rows ...", flush=True)
+        report["results"][str(rows)] = run_size(rows, args.backend, args.seed)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + f"-{args.backend}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print("Results written to", output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# Memory benchmark for the in-memory order representations. Loads the same
+# generated data into the previous layouts and into the columnar tables and
+# reports traced bytes per order (tracemalloc), plus load time.
+#   python benchmarks/run_memory.py                  # 100k and 1M rows
+#   python benchmarks/run_memory.py --sizes 10000 --output mem.json
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from generate_data import generate
+from order_entries import load_entries
+from order_heap import IndexedOrderHeap
+from order_view import SortedOrderView
+from core.order_table import OrderTable
+from core.pending_store import PendingStore
+from core.vendor_store import VENDOR_HEADER
+from core.vendor_table import VendorTable
+
+SIZES = [100000, 1000000]
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+# ----- Pending orders -----
+def heap_layout(records, lazy):
+    # Layout before the order table: heap of [priority_tuple, order_id] plus
+    # the sorted display view, with LazyOrder (lazy) or dict orders
+    queue, view = IndexedOrderHeap(), SortedOrderView()
+    entries, _ = load_entries(records, lazy=lazy)
+    queue.bulk_load(entries)
+    view.build(priority_tuple for priority_tuple, _ in queue.items())
+    return queue, view
+
+
+def table_layout(records):
+    table = OrderTable()
+    table.load(records)
+    return table
+
+
+# ----- Vendor orders -----
+def vendor_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for vendor_id, row in enumerate(reader):
+            if len(row) == len(VENDOR_HEADER):
+                yield vendor_id, row[1:]
+
+
+def dict_layout(path):
+    return dict(vendor_rows(path))
+
+
+def vendor_table_layout(path):
+    return VendorTable(vendor_rows(path))
+
+
+def traced(fn, *args):
+    # (bytes still allocated by fn's result, seconds)
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return size, elapsed
+
+
+def run_size(rows, seed):
+    workdir = tempfile.mkdtemp(prefix=f"cms-mem-{rows}-")
+    results = {}
+    try:
+        generate(workdir, rows, seed)
+        pending = PendingStore(os.path.join(workdir, "pending.csv"), os.path.join(workdir, "order_counter.txt"))
+        cases = [
+            ("orders.dict", lambda: heap_layout(pending.scan(), False)),
+            ("orders.lazy", lambda: heap_layout(pending.scan(), True)),
+            ("orders.table", lambda: table_layout(pending.scan()))
+        ]
+        order_count = sum(1 for _ in pending.scan())
+        vendor_path = os.path.join(workdir, "orders_export.csv")
+        vendor_count = sum(1 for _ in vendor_rows(vendor_path))
+        cases += [
+            ("vendor.dict", lambda: dict_layout(vendor_path)),
+            ("vendor.table", lambda: vendor_table_layout(vendor_path))
+        ]
+        for name, fn in cases:
+            count = order_count if name.startswith("orders.") else vendor_count
+            size, seconds = traced(fn)
+            results[name] = {"rows": count, "bytes": size, "bytes_per_row": size / count if count else 0.0,
+                             "seconds": seconds}
+        for kind, baseline in (("orders", "orders.dict"), ("orders", "orders.lazy"), ("vendor", "vendor.dict")):
+            table = results[f"{kind}.table"]["bytes"]
+            results[f"{kind}.table"][f"reduction_vs_{baseline.split('.')[1]}"] = \
+                results[baseline]["bytes"] / table if table else 0.0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per order for each in-memory layout")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/mem-<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {}
+    }
+    for rows in args.sizes:
+        print(f"Running {rows} rows ...", flush=True)
+        report["results"][str(rows)] = results = run_size(rows, args.seed)
+        for name, result in results.items():
+            extra = "".join(f"  {key[len('reduction_'):]}: {value:.1f}x"
+                            for key, value in result.items() if key.startswith("reduction_"))
+            print(f"  {name:14s} {result['bytes_per_row']:8.0f} B/row  {result['seconds']:7.2f}s{extra}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, "mem-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", output)
+
+
+if __name__ == "__main__":
+    main()
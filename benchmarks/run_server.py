@@ -0,0 +1,135 @@
+# Write throughput with several operators at once: each operator adds orders
+# as fast as it can, either straight to the CSV store (every add is its own
+# journal append + fsync) or through the order-store server (group commit).
+#   python benchmarks/run_server.py                   # 1, 4 and 16 operators
+#   python benchmarks/run_server.py --clients 1 8 --adds 500
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from core.pending_store import FIELDNAMES
+from core.storage import CsvStorage
+from core.store_server import RemoteStorage, SERVER_FILE, DEFAULT_SOCKET, default_address
+
+CLIENTS = [1, 4, 16]
+ADDS = 200  # per operator
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def make_row(order_id):
+    values = ["2025-06-01", "Asha Kumar", "CUST0000001", "12, Anna Salai, Chennai", "9876543210",
+              "P0001", "3 Seater Sofa", "45000.0", "5000.0", "1", str(order_id)]
+    return dict(zip(FIELDNAMES, values))
+
+
+def operator(open_storage, adds, errors):
+    try:
+        storage = open_storage()
+        try:
+            for _ in range(adds):
+                storage.add_pending(make_row(storage.next_order_id()))
+        finally:
+            storage.close()
+    except Exception as e:
+        errors.append(e)
+
+
+def run_clients(open_storage, clients, adds):
+    errors = []
+    threads = [threading.Thread(target=operator, args=(open_storage, adds, errors)) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    for error in errors:
+        print("    operator failed:", error)
+    return elapsed, len(errors)
+
+
+def pending_count(workdir):
+    return sum(1 for _ in CsvStorage(os.path.join(workdir, "pending.csv")).pending_records())
+
+
+def start_server(workdir, address):
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "cms.py"), "serve", "--address", address],
+                              cwd=workdir, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while not os.path.exists(os.path.join(workdir, SERVER_FILE)):
+        if time.time() > deadline or server.poll() is not None:
+            server.kill()
+            raise RuntimeError("order-store server did not start")
+        time.sleep(0.05)
+    return server
+
+
+def run_case(mode, clients, adds):
+    workdir = tempfile.mkdtemp(prefix=f"cms-server-{mode}-{clients}-")
+    cwd = os.getcwd()
+    server = None
+    try:
+        if mode == "server":
+            address = os.path.join(workdir, DEFAULT_SOCKET) if hasattr(socket, "AF_UNIX") else default_address()
+            server = start_server(workdir, address)
+            open_storage = lambda: RemoteStorage(address)
+        else:
+            os.chdir(workdir)
+            open_storage = lambda: CsvStorage(os.path.join(workdir, "pending.csv"))
+        seconds, failed = run_clients(open_storage, clients, adds)
+    finally:
+        os.chdir(cwd)
+        if server is not None:
+            server.terminate()
+            server.wait()
+    rows = pending_count(workdir)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {"clients": clients, "adds": clients * adds, "rows": rows, "failed": failed, "seconds": seconds,
+            "adds_per_sec": clients * adds / seconds if seconds > 0 else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure add throughput for concurrent operators")
+    parser.add_argument("--clients", type=int, nargs="+", default=CLIENTS)
+    parser.add_argument("--adds", type=int, default=ADDS, help="orders added per operator")
+    parser.add_argument("--output", help="JSON file for the results (default: benchmarks/results/server-<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {}
+    }
+    for clients in args.clients:
+        for mode in ("direct", "server"):
+            result = run_case(mode, clients, args.adds)
+            report["results"][f"{mode}[{clients}]"] = result
+            lost = result["adds"] - result["rows"]
+            print(f"  {mode:6s} {clients:3d} operators  {result['adds_per_sec']:9.0f} adds/s"
+                  f"  {result['seconds']:6.2f}s" + (f"  ({lost} rows lost)" if lost else ""), flush=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, "server-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", output)
+
+
+if __name__ == "__main__":
+    main()
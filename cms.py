@@ -0,0 +1,378 @@
+# Command line for the Customer Management System, on top of the Tk-free core
+# package. GUI modules are only imported by the "gui" command.
+#   python cms.py add --name "Asha" --customer-id C001 --address "Chennai" --phone 9876543210 \
+#       --product-id P01 --order "Sofa" --total 45000 --advance 5000 [--date 2025-06-01] [--important]
+#   python cms.py deliver [--count 5 | --all] [--max-value 200000] [--until 2025-06-01] \
+#       [--manifest FILE] [--format text|csv]
+#   python cms.py plan [--days 7 | --from 2025-06-01 --to 2025-06-07] [--stops 12 --vehicles 2 --slots "09:00-13:00, 14:00-18:00"] \
+#       [--locality area|city]
+#   python cms.py search "asha"
+#   python cms.py export pending|delivered|vendor [--format csv|jsonl] [--out FILE]
+#   python cms.py delivered [--from 2025-01-01 --to 2025-03-31] [--customer C001] [--product P01] [--months]
+#   python cms.py archive [--compress]
+#   python cms.py import orders.csv [--workers 8]
+#   python cms.py dashboard [--top 10] [--days 14]
+#   python cms.py gui orders|vendor|plan
+#   python cms.py serve [--backend csv|sqlite] [--address cms.sock]
+#   python cms.py api [--host 127.0.0.1] [--port 8780]
+import argparse
+import sys
+from datetime import date
+
+
+def cmd_add(args):
+    from core.events import EventLog
+    from core.orders import OrderBook
+    from core.order_rules import OrderError
+    book = OrderBook(events=EventLog())
+    try:
+        order = book.add({
+            "order_date": args.date or date.today().strftime("%Y-%m-%d"),
+            "name": args.name,
+            "customer_id": args.customer_id,
+            "address": args.address,
+            "phone_number": args.phone,
+            "product_id": args.product_id,
+            "order": args.order,
+            "total_amount": args.total,
+            "advance_paid": args.advance,
+            "important": "1" if args.important else "0"
+        })
+    except OrderError as e:
+        print(f"{e.title}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        book.storage.close()
+    print(f"Order {order['order_id']} added for {order['name']}.")
+    return 0
+
+
+def cmd_deliver(args):
+    # One batch: a single delivered append and pending removal, and a manifest
+    # (stdout unless --manifest) instead of one printout per order
+    from core.events import EventLog
+    from core.orders import OrderBook, write_manifest
+    from core.order_rules import OrderError, parse_batch
+    try:
+        limit, max_value, until = parse_batch(args.count or "", args.max_value or "", args.until or "")
+    except OrderError as e:
+        print(f"{e.title}: {e}", file=sys.stderr)
+        return 1
+    if limit is None and max_value is None and until is None and not args.all:
+        limit = 1
+    book = OrderBook(events=EventLog())
+    try:
+        book.load()
+        orders = book.deliver_batch(limit, max_value, until)
+    finally:
+        book.close()
+    if not orders:
+        print("No orders to deliver.")
+        return 0
+    out = open(args.manifest, 'w', newline='', encoding='utf-8') if args.manifest else sys.stdout
+    try:
+        delivered, total, balance = write_manifest(orders, out, args.format)
+    finally:
+        if args.manifest:
+            out.close()
+    if args.manifest:
+        print(f"Delivered {delivered} orders (total ₹{total:.2f}, balance due ₹{balance:.2f}); "
+              f"manifest written to {args.manifest}")
+    return 0
+
+
+def cmd_plan(args):
+    from datetime import datetime
+    from core.events import EventLog
+    from core.order_rules import OrderError
+    from core.plan import PLAN_COLUMNS, plan_window, build_plan, plan_values
+    from core.scheduler import RUN_COLUMNS, parse_capacity, schedule, run_sheet_rows
+    from core.storage import open_storage
+    try:
+        capacity = parse_capacity(args.stops, args.vehicles, args.slots)
+    except OrderError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.start or args.end:
+        try:
+            start = datetime.strptime(args.start or args.end, "%Y-%m-%d").date()
+            end = datetime.strptime(args.end or args.start, "%Y-%m-%d").date()
+        except ValueError:
+            print("Dates must be YYYY-MM-DD.", file=sys.stderr)
+            return 1
+        window = plan_window("Custom range", start=start, end=end)
+    elif args.days:
+        window = plan_window("Last N days", args.days)
+    else:
+        window = plan_window("Today")
+    if window is None:
+        print("Check the date window.", file=sys.stderr)
+        return 1
+
+    storage = open_storage()
+    try:
+        plan = build_plan(storage, *window, events=EventLog())
+    finally:
+        storage.close()
+    if not plan:
+        print("No new vendor-delivered orders in this window.")
+        return 0
+    print(" | ".join(RUN_COLUMNS + PLAN_COLUMNS))
+    for values in run_sheet_rows(schedule(plan, *capacity, level=args.locality), plan_values):
+        print(" | ".join(str(v) for v in values))
+    return 0
+
+
+def cmd_search(args):
+    from core.orders import OrderBook, format_customer
+    from core.vendor import VendorBook
+    book = OrderBook()
+    book.load()
+    vendor_book = VendorBook(book.storage)
+    vendor_book.load()
+    book.lookup_customer(args.text, lambda summary: print(format_customer(summary)))
+    matches = vendor_book.search(args.text)
+    print(f"\nVendor Name Matches ({len(matches)})")
+    for vendor_id in matches:
+        print("  " + " | ".join(vendor_book.orders[vendor_id]))
+    book.close()
+    return 0
+
+
+def cmd_dashboard(args):
+    from core.ledger import format_dashboard
+    from core.orders import OrderBook
+    book = OrderBook()
+    try:
+        book.load()
+        book.finance_summary(lambda summary: print(format_dashboard(summary)), args.top, args.days)
+    finally:
+        book.close()
+    return 0
+
+
+def cmd_export(args):
+    import csv
+    import json
+    from core.pending_store import FIELDNAMES
+    from core.storage import open_storage
+    from core.vendor_store import VENDOR_HEADER
+    storage = open_storage()
+    try:
+        if args.what == "pending":
+            header = FIELDNAMES
+            rows = (list(record) for record in storage.pending_records())
+        elif args.what == "delivered":
+            header = FIELDNAMES
+            rows = ([row[field] for field in FIELDNAMES] for row in storage.delivered_rows())
+        else:
+            header = VENDOR_HEADER
+            rows = ([s_no] + values for s_no, (_, values) in enumerate(storage.vendor_orders(), 1))
+
+        out = open(args.out, 'w', newline='', encoding='utf-8') if args.out else sys.stdout
+        try:
+            written = 0
+            if args.format == "jsonl":
+                for values in rows:
+                    out.write(json.dumps(dict(zip(header, values)), ensure_ascii=False) + "\n")
+                    written += 1
+            else:
+                writer = csv.writer(out)
+                writer.writerow(header)
+                for values in rows:
+                    writer.writerow(values)
+                    written += 1
+        finally:
+            if args.out:
+                out.close()
+    finally:
+        storage.close()
+    if args.out:
+        print(f"Exported {written} {args.what} records to {args.out}")
+    return 0
+
+
+def iso_date(text):
+    # argparse type for YYYY-MM-DD options; kept as the string
+    try:
+        date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {text}")
+    return text
+
+
+def cmd_delivered(args):
+    # Range query over the delivered archive: the rows as CSV, or per-month
+    # totals with --months. Only the months in the range are read
+    import csv
+    from core.pending_store import FIELDNAMES
+    from core.storage import open_storage
+    storage = open_storage()
+    try:
+        if args.months:
+            report = storage.delivered_months(args.start, args.end)
+            print(f"{'Month':8} {'Orders':>8} {'Total':>16} {'Advance':>16} {'Balance Due':>16}")
+            for month in report:
+                print(f"{month['month']:8} {month['rows']:>8} {month['total_amount']:>16,.2f} "
+                      f"{month['advance_paid']:>16,.2f} {month['balance_due']:>16,.2f}")
+            print(f"{'Total':8} {sum(m['rows'] for m in report):>8} "
+                  f"{sum(m['total_amount'] for m in report):>16,.2f} "
+                  f"{sum(m['advance_paid'] for m in report):>16,.2f} "
+                  f"{sum(m['balance_due'] for m in report):>16,.2f}")
+        else:
+            writer = csv.writer(sys.stdout)
+            writer.writerow(FIELDNAMES)
+            for row in storage.delivered_range(args.start, args.end, args.customer, args.product):
+                writer.writerow([row[field] for field in FIELDNAMES])
+    finally:
+        storage.close()
+    return 0
+
+
+def cmd_archive(args):
+    # Lists the monthly partitions of the delivered archive (CSV backend);
+    # --compress gzips the closed months
+    from core.storage import CsvStorage
+    storage = CsvStorage()
+    if args.compress:
+        months = storage.delivered.compress_closed()
+        print(f"Compressed {len(months)} closed month(s): {', '.join(months) or '-'}")
+    print(f"{'Month':8} {'File':18} {'Orders':>8} {'First':10} {'Last':10} {'Total':>16}")
+    for info in storage.delivered.months():
+        print(f"{info['month']:8} {info['file']:18} {info['rows']:>8} {info['min_date'] or '-':10} "
+              f"{info['max_date'] or '-':10} {info['total_amount']:>16,.2f}")
+    storage.close()
+    return 0
+
+
+def cmd_import(args):
+    from core.events import EventLog
+    from core.order_import import import_orders
+    stats = import_orders(args.path, args.format, args.workers, args.rejects, events=EventLog())
+    print(f"Imported {stats['accepted']} of {stats['records']} orders in {stats['seconds']:.2f}s "
+          f"({stats['orders_per_min']:,.0f} orders/min), {stats['rejected']} rejected")
+    if stats["rejects_path"]:
+        print("Rejects written to", stats["rejects_path"])
+    return 0
+
+
+def cmd_gui(args):
+    import tkinter as tk
+    if args.window == "plan":
+        from app3 import show_login_window
+        show_login_window()
+        return 0
+    if args.window == "vendor":
+        from app2 import VendorDeliveryApp as App
+    else:
+        from app import OrderApp as App
+    root = tk.Tk()
+    app = App(root)
+    root.mainloop()
+    app.shutdown()  # queued writes, as in the apps' own __main__
+    return 0
+
+
+def cmd_serve(args):
+    from core.store_server import serve
+    serve(args.address, args.backend)
+    return 0
+
+
+def cmd_api(args):
+    from core.http_api import serve
+    serve(args.host, args.port)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cms", description="Customer Management System")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add a pending order")
+    add.add_argument("--date", help="order date, YYYY-MM-DD (default: today)")
+    add.add_argument("--name", default="")
+    add.add_argument("--customer-id", default="")
+    add.add_argument("--address", default="")
+    add.add_argument("--phone", default="")
+    add.add_argument("--product-id", default="")
+    add.add_argument("--order", default="")
+    add.add_argument("--total", default="")
+    add.add_argument("--advance", default="")
+    add.add_argument("--important", action="store_true")
+    add.set_defaults(func=cmd_add)
+
+    deliver = commands.add_parser("deliver", help="deliver the next order(s) in priority order")
+    deliver.add_argument("--count", help="number of orders (default: 1 unless another limit is given)")
+    deliver.add_argument("--all", action="store_true", help="every pending order within the other limits")
+    deliver.add_argument("--max-value", help="stop before the batch total passes this amount")
+    deliver.add_argument("--until", help="only orders dated on or before YYYY-MM-DD")
+    deliver.add_argument("--manifest", help="dispatch manifest file (default: stdout)")
+    deliver.add_argument("--format", choices=["text", "csv"], default="text")
+    deliver.set_defaults(func=cmd_deliver)
+
+    plan = commands.add_parser("plan", help="build Today's Plan (removes matched orders from pending)")
+    plan.add_argument("--days", type=int, help="last N days instead of today")
+    plan.add_argument("--from", dest="start", help="custom range start, YYYY-MM-DD")
+    plan.add_argument("--to", dest="end", help="custom range end, YYYY-MM-DD")
+    plan.add_argument("--stops", help="orders per vehicle run (default: 12)")
+    plan.add_argument("--vehicles", help="runs going out per slot (default: 2)")
+    plan.add_argument("--slots", help='comma-separated delivery slots (default: "09:00-13:00, 14:00-18:00")')
+    plan.add_argument("--locality", choices=["area", "city"],
+                      help="group stops by the area before the city, or by city (default: CMS_LOCALITY or area)")
+    plan.set_defaults(func=cmd_plan)
+
+    search = commands.add_parser("search", help="customer lookup by ID or phone, plus vendor name search")
+    search.add_argument("text")
+    search.set_defaults(func=cmd_search)
+
+    dashboard = commands.add_parser("dashboard", help="balances, revenue by day and vendor totals")
+    dashboard.add_argument("--top", type=int, default=10, help="customers with the largest balance due")
+    dashboard.add_argument("--days", type=int, default=14, help="latest order dates in revenue by day")
+    dashboard.set_defaults(func=cmd_dashboard)
+
+    export = commands.add_parser("export", help="export pending, delivered or vendor orders")
+    export.add_argument("what", choices=["pending", "delivered", "vendor"])
+    export.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    export.add_argument("--out", help="output file (default: stdout)")
+    export.set_defaults(func=cmd_export)
+
+    delivered = commands.add_parser("delivered", help="delivered orders in a date range, or monthly totals")
+    delivered.add_argument("--from", dest="start", type=iso_date, help="first order date, YYYY-MM-DD")
+    delivered.add_argument("--to", dest="end", type=iso_date, help="last order date, YYYY-MM-DD")
+    delivered.add_argument("--customer", help="only this customer ID")
+    delivered.add_argument("--product", help="only this product ID")
+    delivered.add_argument("--months", action="store_true", help="per-month order count and totals instead of rows")
+    delivered.set_defaults(func=cmd_delivered)
+
+    archive = commands.add_parser("archive", help="list the monthly delivered partitions")
+    archive.add_argument("--compress", action="store_true", help="gzip the months before the current one")
+    archive.set_defaults(func=cmd_archive)
+
+    bulk = commands.add_parser("import", help="bulk import pending orders from CSV or JSONL")
+    bulk.add_argument("path")
+    bulk.add_argument("--format", choices=["csv", "jsonl"])
+    bulk.add_argument("--workers", type=int)
+    bulk.add_argument("--rejects")
+    bulk.set_defaults(func=cmd_import)
+
+    gui = commands.add_parser("gui", help="open one of the desktop windows")
+    gui.add_argument("window", choices=["orders", "vendor", "plan"])
+    gui.set_defaults(func=cmd_gui)
+
+    server = commands.add_parser("serve", help="run the local order-store server the apps connect to")
+    server.add_argument("--backend", choices=["csv", "sqlite"], help="default: CMS_STORAGE, else csv")
+    server.add_argument("--address", help="Unix socket path or host:port (default: CMS_SERVER, else cms.sock)")
+    server.set_defaults(func=cmd_serve)
+
+    api = commands.add_parser("api", help="run the HTTP/JSON order intake for the storefront and vendor portal")
+    api.add_argument("--host", help="default: 127.0.0.1 (local only)")
+    api.add_argument("--port", type=int, help="default: 8780")
+    api.set_defaults(func=cmd_api)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+# Tk-free core of the Customer Management System: storage backends, the
+# pending order book, the vendor table, Today's Plan and the change events.
+# Importing it pulls in no GUI modules, so scripts and the CLI (cms.py) start
+# quickly.
+from .events import EventLog
+from .orders import OrderBook
+from .plan import LivePlan, build_plan, plan_window
+from .storage import open_storage
+from .vendor import VendorBook
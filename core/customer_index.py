@@ -0,0 +1,253 @@
+# Customer 360 index: one inverted index from customer ID and normalized phone
+# number to every pending order, delivered order and vendor record of that
+# customer. Built once from storage and kept current by the app on each
+# write, and by the events of the other windows and processes, so a lookup
+# never rescans pending.csv, the delivered archive or orders_export.csv.
+# Pending orders are indexed by ID only; the caller reads them from its own
+# queue, so the index can live on the I/O worker. Orders another process
+# added are kept as their event rows, since that queue does not have them.
+import re
+from collections import defaultdict
+from functools import lru_cache
+from .events import (ORDER_ADDED, ORDER_DELIVERED, ORDER_CANCELLED, ORDER_PLANNED,
+                     VENDOR_ADDED, VENDOR_STATUS, VENDOR_DELETED)
+from .vendor_store import VENDOR_FIELDS, STATUS_INDEX
+from .vendor_table import VendorTable
+from .instrumentation import count, timed
+
+VENDOR_CUSTOMER = VENDOR_FIELDS.index('Customer ID')
+PHONE_DIGITS = 10  # country code and leading zeros are dropped
+PHONE_MIN_DIGITS = 7  # fewer digits in a query and it is not taken for a phone number
+NON_DIGITS = re.compile(r"\D")
+PHONE_TEXT = re.compile(r"[\d\s+().-]+")
+
+
+@lru_cache(maxsize=65536)
+def normalize_customer_id(customer_id):
+    return str(customer_id).strip().lower()
+
+
+@lru_cache(maxsize=65536)
+def normalize_phone(phone):
+    digits = NON_DIGITS.sub("", str(phone))
+    return digits[-PHONE_DIGITS:]
+
+
+def query_phone(query):
+    # The phone key for a lookup query, or "" when the query does not look
+    # like a phone number (a customer ID such as "C1" has digits too)
+    query = str(query).strip()
+    if not PHONE_TEXT.fullmatch(query) or len(NON_DIGITS.sub("", query)) < PHONE_MIN_DIGITS:
+        return ""
+    return normalize_phone(query)
+
+
+class CustomerIndex:
+    def __init__(self):
+        self._pending_keys = {}  # order_id -> (customer_id, phone), normalized
+        self._foreign = {}  # order_id -> order, for pending orders added by other processes
+        self._delivered = []  # delivered rows, append only
+        self._vendor = VendorTable()  # vendor_id -> values
+        self._vendor_next = 0  # local ID for a record added by vendor_changed()
+        self._by_id = defaultdict(lambda: (set(), [], set()))     # customer_id -> (pending, delivered, vendor)
+        self._by_phone = defaultdict(lambda: (set(), [], set()))  # phone -> (pending, delivered, vendor)
+
+    # ----- Building -----
+    @timed("customer.build")
+    def build(self, pending_orders, delivered_rows, vendor_orders):
+        self.__init__()
+        self.add_pending_many(pending_orders)
+        for row in delivered_rows:
+            self.add_delivered(row)
+        for vendor_id, values in vendor_orders:
+            self.add_vendor(vendor_id, values)
+
+    # ----- Updates -----
+    def _postings(self, customer_id, phone):
+        postings = [self._by_id[normalize_customer_id(customer_id)]]
+        phone = normalize_phone(phone)
+        if phone:
+            postings.append(self._by_phone[phone])
+        return postings
+
+    def add_pending(self, order):
+        self.add_pending_many([order])
+
+    def add_pending_many(self, orders):
+        # Startup path for the whole pending queue, so kept free of per-row helper calls
+        pending_keys, by_id, by_phone = self._pending_keys, self._by_id, self._by_phone
+        for order in orders:
+            getter = getattr(order, "field", order.__getitem__)
+            order_id = getter("order_id")
+            customer_id = normalize_customer_id(getter("customer_id"))
+            phone = normalize_phone(getter("phone_number"))
+            pending_keys[order_id] = (customer_id, phone)
+            by_id[customer_id][0].add(order_id)
+            if phone:
+                by_phone[phone][0].add(order_id)
+
+    def remove_pending(self, order_id):
+        self._foreign.pop(order_id, None)
+        keys = self._pending_keys.pop(order_id, None)
+        if keys is None:
+            return
+        customer_id, phone = keys
+        self._by_id[customer_id][0].discard(order_id)
+        if phone:
+            self._by_phone[phone][0].discard(order_id)
+
+    def add_delivered(self, row):
+        position = len(self._delivered)
+        self._delivered.append(row)
+        for postings in self._postings(row["customer_id"], row["phone_number"]):
+            postings[1].append(position)
+
+    def deliver(self, order_id, row):
+        self.remove_pending(order_id)
+        self.add_delivered(row)
+
+    def deliver_many(self, order_ids, rows):
+        for order_id, row in zip(order_ids, rows):
+            self.deliver(order_id, row)
+
+    def apply_event(self, event, own=False, held=False):
+        # A change event (core/events.py). own: published by this process,
+        # whose order changes already came in directly; its vendor changes did
+        # not. held: already in the store read the index was just built from,
+        # so only an added order's row is kept for with_pending()
+        kind = event.get("type")
+        if own and kind not in (VENDOR_ADDED, VENDOR_STATUS, VENDOR_DELETED):
+            return
+        if kind == ORDER_ADDED:
+            for row in event["rows"]:
+                order = _event_order(row)
+                if not held:
+                    self.add_pending(order)
+                if order["order_id"] in self._pending_keys:
+                    self._foreign[order["order_id"]] = order
+        elif held:
+            return
+        elif kind in (VENDOR_ADDED, VENDOR_STATUS, VENDOR_DELETED):
+            self.vendor_changed(event.get("old"), event.get("new"))
+        elif kind == ORDER_DELIVERED:
+            for row in event.get("rows", ()):
+                self.deliver(int(row["order_id"]), row)
+        elif kind in (ORDER_CANCELLED, ORDER_PLANNED):
+            for order_id in event["order_ids"]:
+                self.remove_pending(int(order_id))
+
+    def add_vendor(self, vendor_id, values):
+        self._vendor[vendor_id] = values
+        self._by_id[normalize_customer_id(values[VENDOR_CUSTOMER])][2].add(vendor_id)
+        self._vendor_next = max(self._vendor_next, vendor_id + 1)
+
+    def update_vendor(self, vendor_id, values):
+        self.remove_vendor(vendor_id)
+        self.add_vendor(vendor_id, values)
+
+    def remove_vendor(self, vendor_id):
+        values = self._vendor.pop(vendor_id, None)
+        if values is not None:
+            self._by_id[normalize_customer_id(values[VENDOR_CUSTOMER])][2].discard(vendor_id)
+
+    def _find_vendor(self, values):
+        # Vendor IDs are local to each process, so a record named by an event
+        # is found by its values among that customer's records
+        values = list(values)
+        postings = self._by_id.get(normalize_customer_id(values[VENDOR_CUSTOMER]))
+        for vendor_id in sorted(postings[2]) if postings else ():
+            if self._vendor[vendor_id] == values:
+                return vendor_id
+        return None
+
+    def vendor_changed(self, old_values, new_values):
+        # A VENDOR_ADDED / STATUS / DELETED event: old / new values, None for
+        # an add / delete. A record not found is added (or ignored on delete)
+        vendor_id = None if old_values is None else self._find_vendor(old_values)
+        if old_values is not None and vendor_id is None:
+            count("customer.vendor_unmatched")
+        if new_values is None:
+            if vendor_id is not None:
+                self.remove_vendor(vendor_id)
+        elif vendor_id is None:
+            self.add_vendor(self._vendor_next, list(new_values))
+        else:
+            self.update_vendor(vendor_id, list(new_values))
+
+    # ----- Lookup -----
+    def _matches(self, query):
+        # Postings for the query as a customer ID and as a phone number, widened
+        # by the IDs/phones found on those records so one call returns everything
+        ids, phones = set(), set()
+        customer_id, phone = normalize_customer_id(query), query_phone(query)
+        if customer_id in self._by_id:
+            ids.add(customer_id)
+        if phone and phone in self._by_phone:
+            phones.add(phone)
+        for order_id in self._collect(ids, phones)[0]:
+            customer_id, phone = self._pending_keys[order_id]
+            ids.add(customer_id)
+            phones.add(phone)
+        for position in self._collect(ids, phones)[1]:
+            row = self._delivered[position]
+            ids.add(normalize_customer_id(row["customer_id"]))
+            phones.add(normalize_phone(row["phone_number"]))
+        phones.discard("")
+        return ids, phones
+
+    def _collect(self, ids, phones):
+        pending, delivered, vendor = set(), set(), set()
+        for index, keys in ((self._by_id, ids), (self._by_phone, phones)):
+            for key in keys:
+                postings = index.get(key)
+                if postings is not None:
+                    pending |= postings[0]
+                    delivered.update(postings[1])
+                    vendor |= postings[2]
+        return pending, delivered, vendor
+
+    @timed("customer.lookup")
+    def lookup(self, query):
+        # pending_ids are filled in by with_pending() from the caller's queue;
+        # foreign_pending: the ones added by other processes
+        ids, phones = self._matches(query)
+        pending_ids, delivered_positions, vendor_ids = self._collect(ids, phones)
+        delivered = [self._delivered[position] for position in sorted(delivered_positions)]
+        vendor = [(vendor_id, self._vendor[vendor_id]) for vendor_id in sorted(vendor_ids)]
+        vendor_status = defaultdict(int)
+        for _, values in vendor:
+            vendor_status[values[STATUS_INDEX]] += 1
+        return {
+            "customer_ids": sorted(ids),
+            "phones": sorted(phones),
+            "pending_ids": sorted(pending_ids),
+            "foreign_pending": [self._foreign[order_id] for order_id in pending_ids if order_id in self._foreign],
+            "delivered": delivered,
+            "vendor": vendor,
+            "vendor_status": dict(vendor_status)
+        }
+
+
+def _event_order(row):
+    # A pending row from an ORDER_ADDED event (FIELDNAMES strings) with the
+    # ID and amounts as numbers, as an OrderTable row reads
+    order = dict(row, order_id=int(row["order_id"]))
+    for field in ("total_amount", "advance_paid"):
+        try:
+            order[field] = float(row[field])
+        except (TypeError, ValueError):
+            order[field] = 0.0
+    return order
+
+
+def with_pending(summary, orders):
+    # Completes a lookup() summary with the pending orders (and their balance)
+    # read from orders, an OrderTable, or from the event rows of orders other
+    # processes added; IDs no longer queued in orders are left out
+    foreign = summary.pop("foreign_pending")
+    pending = [orders.get(order_id) for order_id in summary.pop("pending_ids") if order_id in orders]
+    pending += [order for order in foreign if order["order_id"] not in orders]
+    pending.sort(key=lambda order: (str(order["order_date"]), order["order_id"]))
+    summary["pending"] = pending
+    summary["outstanding"] = sum(order["total_amount"] - order["advance_paid"] for order in pending)
+    return summary
@@ -0,0 +1,275 @@
+# Delivered order archive: one CSV partition per month of order date
+# (delivered/2025-06.csv) with a small JSON sidecar next to it holding the row
+# count, first and last order date and the value totals. Deliveries append to
+# the partition of their month; range queries open only the partitions whose
+# sidecar overlaps the range, and monthly totals come from the sidecars alone.
+# Closed months (before the current one) can be gzip-compressed: gzip files
+# take appends as extra members, so late deliveries still land in them.
+# A sidecar records the partition size it describes and is rebuilt from the
+# partition when that no longer matches (a crash between the two writes).
+# The old single DELIVERED.csv is split into partitions on first use.
+import csv
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+from datetime import date
+from itertools import islice
+from .pending_store import FIELDNAMES
+from .instrumentation import count, timed
+
+ARCHIVE_DIR = "delivered"
+UNDATED = "undated"  # partition for rows without a valid order date
+MIGRATE_BATCH = 4096  # legacy rows per grouped append
+MONTH = re.compile(r"\d{4}-\d{2}$")
+
+
+def month_of(order_date):
+    month = (order_date or '').strip()[:7]
+    return month if MONTH.match(month) else UNDATED
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return -1
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + 't', newline='', encoding='utf-8')
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def _empty(month, name):
+    return {"month": month, "file": name, "size": 0, "rows": 0, "min_date": None, "max_date": None,
+            "total_amount": 0.0, "advance_paid": 0.0}
+
+
+def _add_rows(info, rows):
+    # Folds rows (dicts) into a sidecar
+    for row in rows:
+        order_date = (row.get('order_date') or '').strip()
+        if order_date:
+            info["min_date"] = min(order_date, info["min_date"] or order_date)
+            info["max_date"] = max(order_date, info["max_date"] or order_date)
+        info["total_amount"] += _number(row.get('total_amount'))
+        info["advance_paid"] += _number(row.get('advance_paid'))
+        info["rows"] += 1
+
+
+class DeliveredArchive:
+    def __init__(self, directory=ARCHIVE_DIR, legacy_csv=None, compress=False):
+        self.directory = directory
+        self.legacy_csv = legacy_csv  # single-file DELIVERED.csv, split up on first use
+        self.compress = compress  # gzip closed months when the archive is opened
+        self.lock = threading.RLock()
+        self._partitions = None  # month -> sidecar dict, read on first use
+
+    # ----- Partitions -----
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _sidecar_path(self, month):
+        return self._path(month + ".json")
+
+    def _ensure(self):
+        # Caller holds self.lock
+        if self._partitions is None:
+            self._partitions = {}
+            self._refresh()
+            if self.legacy_csv and os.path.isfile(self.legacy_csv):
+                self._migrate()
+            if self.compress:
+                self.compress_closed()
+        return self._partitions
+
+    def _refresh(self):
+        # Caller holds self.lock. Picks up partitions created, appended to or
+        # compressed by other processes since the last look
+        if not os.path.isdir(self.directory):
+            return
+        names = set(os.listdir(self.directory))
+        for name in sorted(names):
+            month, _, suffix = name.partition(".")
+            if suffix == "csv.gz" or (suffix == "csv" and month + ".csv.gz" not in names):
+                info = self._partitions.get(month)
+                if info is None or info["file"] != name or info["size"] != _size(self._path(name)):
+                    self._partitions[month] = self._load_sidecar(month, name)
+
+    def _load_sidecar(self, month, name):
+        try:
+            with open(self._sidecar_path(month), encoding='utf-8') as f:
+                info = json.load(f)
+            if info.get("file") == name and info.get("size") == os.path.getsize(self._path(name)):
+                return info
+        except (OSError, ValueError):
+            pass
+        # Missing or out of date: recount the partition
+        info = _empty(month, name)
+        _add_rows(info, self._read(name))
+        info["size"] = os.path.getsize(self._path(name))
+        self._save_sidecar(info)
+        count("delivered.sidecars_rebuilt")
+        return info
+
+    def _save_sidecar(self, info):
+        path = self._sidecar_path(info["month"])
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(path + ".tmp", path)
+
+    def _read(self, name):
+        path = self._path(name)
+        count("delivered.partitions_read")
+        count("delivered.bytes_read", os.path.getsize(path))
+        with _open(path, 'r') as f:
+            for row in csv.DictReader(f):
+                yield {k: row.get(k) or '' for k in FIELDNAMES}
+
+    @timed("delivered.migrate")
+    def _migrate(self):
+        # Splits the legacy file into a scratch directory that is renamed into
+        # place, so a crash leaves either no archive or a complete one. The
+        # legacy file is kept as DELIVERED.csv.migrated
+        target = self.directory
+        if not os.path.isdir(target):
+            self.directory = target + ".tmp"
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory)
+        with open(self.legacy_csv, newline='', encoding='utf-8') as f:
+            rows = ({k: row.get(k) or '' for k in FIELDNAMES} for row in csv.DictReader(f))
+            while True:
+                batch = list(islice(rows, MIGRATE_BATCH))
+                if not batch:
+                    break
+                self.append_many(batch)
+        if self.directory != target:
+            os.replace(self.directory, target)
+            self.directory = target
+        os.replace(self.legacy_csv, self.legacy_csv + ".migrated")
+        print(f"Split {self.legacy_csv} into {len(self._partitions)} monthly partitions in {target}/")
+
+    # ----- Writes -----
+    @timed("delivered.append")
+    def append_many(self, rows):
+        # rows: dicts with FIELDNAMES keys; one append per month touched
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(month_of(row.get('order_date')), []).append(row)
+        with self.lock:
+            partitions = self._ensure()
+            if by_month and not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            for month, month_rows in by_month.items():
+                info = partitions.get(month)
+                if info is None or _size(self._path(info["file"])) != info["size"]:
+                    self._refresh()  # another process wrote this month
+                    info = partitions.get(month)
+                if info is None:
+                    info = partitions[month] = _empty(month, month + ".csv")
+                path = self._path(info["file"])
+                new_file = not os.path.exists(path)
+                with _open(path, 'a') as f:
+                    writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
+                    if new_file:
+                        writer.writeheader()
+                    writer.writerows(month_rows)
+                size = os.path.getsize(path)
+                count("delivered.bytes_written", size - info["size"])
+                info["size"] = size
+                _add_rows(info, month_rows)
+                self._save_sidecar(info)
+
+    @timed("delivered.compress")
+    def compress_closed(self, today=None):
+        # gzips every plain partition older than the current month; returns the months compressed
+        current = (today or date.today()).strftime("%Y-%m")
+        done = []
+        with self.lock:
+            partitions = self._ensure()
+            for month, info in sorted(partitions.items()):
+                if month == UNDATED or month >= current or info["file"].endswith(".gz"):
+                    continue
+                name = month + ".csv.gz"
+                with open(self._path(info["file"]), 'rb') as src, gzip.open(self._path(name + ".tmp"), 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(self._path(name + ".tmp"), self._path(name))
+                plain = info["file"]
+                info.update(file=name, size=os.path.getsize(self._path(name)))
+                self._save_sidecar(info)
+                os.remove(self._path(plain))
+                done.append(month)
+        return done
+
+    # ----- Queries -----
+    def months(self, start=None, end=None):
+        # Sidecars of the partitions that can hold order dates in [start, end]
+        # (YYYY-MM-DD strings, either may be None), in month order. The undated
+        # partition is only included when there are no bounds
+        with self.lock:
+            self._ensure()
+            self._refresh()
+            partitions = dict(self._partitions)
+        chosen = []
+        for month, info in sorted(partitions.items()):
+            if month == UNDATED:
+                if start is None and end is None:
+                    chosen.append(dict(info))
+                continue
+            if not info["rows"] or (start is not None and info["max_date"] < start) \
+                    or (end is not None and info["min_date"] > end):
+                continue
+            chosen.append(dict(info))
+        return chosen
+
+    @timed("delivered.query")
+    def rows(self, start=None, end=None, customer_id=None, product_id=None):
+        # Delivered rows with order dates in [start, end] and the given
+        # customer / product (None = any), reading only the partitions needed
+        for info in self.months(start, end):
+            for row in self._rows_in(info, start, end):
+                if customer_id is not None and row['customer_id'].strip() != customer_id:
+                    continue
+                if product_id is not None and row['product_id'].strip() != product_id:
+                    continue
+                yield row
+
+    def totals(self, start=None, end=None):
+        # Per month: rows, total_amount, advance_paid and balance due for order
+        # dates in [start, end]. Months wholly inside come from the sidecars;
+        # only the partitions cut by the range bounds are read
+        report = []
+        for info in self.months(start, end):
+            if not _inside(info, start, end):
+                rows = self._rows_in(info, start, end)
+                info = _empty(info["month"], info["file"])
+                _add_rows(info, rows)
+            report.append({"month": info["month"], "rows": info["rows"], "total_amount": info["total_amount"],
+                           "advance_paid": info["advance_paid"],
+                           "balance_due": info["total_amount"] - info["advance_paid"]})
+        return report
+
+    def _rows_in(self, info, start, end):
+        rows = self._read(info["file"])
+        if _inside(info, start, end):
+            return rows
+        return (row for row in rows if (start is None or start <= row['order_date'].strip())
+                and (end is None or row['order_date'].strip() <= end))
+
+
+def _inside(info, start, end):
+    # Every row of the partition is in [start, end]
+    if info["month"] == UNDATED:
+        return start is None and end is None
+    return (start is None or start <= info["min_date"]) and (end is None or info["max_date"] <= end)
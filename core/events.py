@@ -0,0 +1,142 @@
+# Change events shared between the windows: an append-only JSON-lines log
+# (events.jsonl) that OrderBook and VendorBook publish to after each storage
+# write, and that any process can follow from where it joined. A follower
+# keeps the log open at its read position, so catching up costs one stat plus
+# the new lines, however large the stores are. Past ROTATE_BYTES the log is
+# renamed to events.jsonl.1 and a new one started; followers drain the old
+# file before moving on. No GUI imports.
+import json
+import os
+import threading
+import time
+from collections import Counter
+from .instrumentation import count, timed
+
+EVENTS_FILE = "events.jsonl"
+ROTATE_BYTES = 4 * 1024 * 1024
+
+# Event types and their fields
+ORDER_ADDED = "order_added"            # rows: pending rows (FIELDNAMES strings)
+ORDER_DELIVERED = "order_delivered"    # order_ids, rows: the pending rows they left as
+ORDER_CANCELLED = "order_cancelled"    # order_ids, rows
+ORDER_PLANNED = "order_planned"        # order_ids, rows: taken out of pending by a Today's Plan join
+ORDER_PRIORITY = "order_priority"      # order_id, priority_flag (the new one), total_amount
+VENDOR_ADDED = "vendor_added"          # old: None, new: vendor values
+VENDOR_STATUS = "vendor_status_changed"  # old / new: vendor values
+VENDOR_DELETED = "vendor_deleted"      # old: vendor values, new: None
+
+
+class EventLog:
+    def __init__(self, path=EVENTS_FILE, rotate_bytes=ROTATE_BYTES):
+        self.path = path
+        self.rotate_bytes = rotate_bytes
+        self.lock = threading.Lock()
+
+    @timed("events.publish")
+    def publish(self, kind, **fields):
+        # One line per event, written with a single append so lines from
+        # several processes do not interleave
+        event = dict(fields, type=kind, time=time.time(), pid=os.getpid())
+        line = json.dumps(event) + "\n"
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                size = f.tell()
+            if size >= self.rotate_bytes:
+                self._rotate()
+        count("events.published")
+
+    def _rotate(self):
+        try:
+            os.replace(self.path, self.path + ".1")
+        except OSError:
+            pass  # held open by a follower on Windows; retried on the next publish
+
+    def follow(self):
+        return EventFollower(self.path)
+
+
+class StoreRead:
+    # What a rebuild read from the stores: pending (an OrderTable) and vendor
+    # (a VendorTable). The follower is opened before the read, so events
+    # published while it ran come again afterwards; holds() tells which of
+    # them the read already reflects, so they are not counted twice
+    def __init__(self, pending, vendor):
+        self.pending = pending
+        self.vendor = vendor
+        self._vendor_rows = None  # Counter of vendor value tuples, on first use
+
+    def _has_vendor(self, values):
+        if self._vendor_rows is None:
+            self._vendor_rows = Counter(map(tuple, self.vendor.values()))
+        return values is not None and self._vendor_rows[tuple(values)] > 0
+
+    def holds(self, event):
+        kind = event.get("type")
+        if kind == ORDER_ADDED:
+            return all(int(row["order_id"]) in self.pending for row in event["rows"])
+        if kind in (ORDER_DELIVERED, ORDER_CANCELLED, ORDER_PLANNED):
+            return all(order_id not in self.pending for order_id in event["order_ids"])
+        if kind == ORDER_PRIORITY:
+            order_id = event["order_id"]
+            return order_id in self.pending and self.pending.get(order_id)["priority_flag"] == event["priority_flag"]
+        if kind in (VENDOR_ADDED, VENDOR_STATUS):
+            return self._has_vendor(event.get("new"))
+        if kind == VENDOR_DELETED:
+            return not self._has_vendor(event.get("old"))
+        return False
+
+
+class EventFollower:
+    # Reads the events published after it was created, oldest first
+    def __init__(self, path=EVENTS_FILE):
+        self.path = path
+        self._file = None
+        self._inode = None
+        self._partial = b""  # a line still being written
+        self._open(at_end=True)
+
+    def _open(self, at_end):
+        try:
+            f = open(self.path, 'rb')
+        except OSError:
+            return False
+        if at_end:
+            f.seek(0, os.SEEK_END)
+        self._file, self._inode, self._partial = f, os.fstat(f.fileno()).st_ino, b""
+        return True
+
+    def _read(self):
+        data = self._partial + self._file.read()
+        lines = data.split(b"\n")
+        self._partial = lines.pop()
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                count("events.bad_lines")
+        return events
+
+    def poll(self):
+        # New events since the last call. The path is checked before reading,
+        # so a rotation seen here has already finished writing the old file
+        if self._file is None and not self._open(at_end=False):
+            return []
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            inode = self._inode
+        events = self._read()
+        if inode != self._inode:
+            self._file.close()
+            self._file = None
+            if self._open(at_end=False):
+                events += self._read()
+        count("events.received", len(events))
+        return events
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,331 @@
+# Local HTTP/JSON intake for the web storefront and the vendor portal, so
+# orders no longer have to be retyped into the forms. Plain asyncio streams,
+# no web framework. One process owns an OrderBook and a VendorBook; every
+# change goes through a single queue, and the committer takes everything that
+# queued up while the previous group was being applied and runs it on the
+# store thread as one group. Consecutive order adds in a group are merged into
+# one OrderBook.add_many: one block of order IDs, one storage write. Delivery
+# order is the OrderBook's: (priority flag, order date, -total amount, order ID).
+#   python cms.py api [--host 127.0.0.1] [--port 8780]
+#
+#   POST /orders                      one order: {"name": ..., "customer_id": ..., ...}
+#   POST /orders/batch                a list of orders
+#   POST /orders/deliver              deliver the next order in priority order
+#   POST /vendor-orders               add a vendor order: {"Order Date": ..., "Status": ..., ...}
+#   PUT  /vendor-orders/<id>/status   {"status": "Delivered"}
+#   POST /plan                        Today's Plan as a run sheet: {}, {"days": N} or {"from": ..., "to": ...},
+#                                     plus optional "stops", "vehicles" and "slots" (list) for the capacity
+#   GET  /health
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import urlsplit
+from .events import EventLog
+from .instrumentation import count, timed, STATS
+from .order_rules import OrderError
+from .orders import OrderBook
+from .plan import plan_window
+from .scheduler import parse_capacity, schedule
+from .vendor import VendorBook, VENDOR_STATUSES, vendor_values
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8780
+MAX_GROUP = 4096              # requests per group
+MAX_BODY = 64 * 1024 * 1024   # largest request body (batch adds)
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json(body, kind):
+    try:
+        value = json.loads(body or b"{}")
+    except ValueError:
+        raise ApiError(400, "Request body is not valid JSON.")
+    if not isinstance(value, kind):
+        raise ApiError(400, f"Request body must be a JSON {'object' if kind is dict else 'array'}.")
+    return value
+
+
+def _window(fields):
+    # Plan window from {"days": N} or {"from": ..., "to": ...}; today otherwise
+    try:
+        if fields.get("from") or fields.get("to"):
+            start = datetime.strptime(fields.get("from") or fields["to"], "%Y-%m-%d").date()
+            end = datetime.strptime(fields.get("to") or fields["from"], "%Y-%m-%d").date()
+            window = plan_window("Custom range", start=start, end=end)
+        elif fields.get("days"):
+            window = plan_window("Last N days", fields["days"])
+        else:
+            window = plan_window("Today")
+    except (TypeError, ValueError):
+        window = None
+    if window is None:
+        raise ApiError(400, "Check the date window.")
+    return window
+
+
+def _error(e):
+    return {"error": e.title, "message": str(e)}
+
+
+async def _read_request(reader):
+    # (method, path, headers, body, keep_alive) or None at end of stream
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise ApiError(400, "Malformed request line.")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise ApiError(411, "Send a Content-Length; chunked bodies are not accepted.")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise ApiError(400, "Bad Content-Length.")
+    if length > MAX_BODY:
+        raise ApiError(413, "Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+    return method.upper(), urlsplit(target).path.rstrip("/") or "/", headers, body, keep_alive
+
+
+def _response(status, result, keep_alive):
+    body = json.dumps(result, default=str).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+class IntakeServer:
+    def __init__(self, book, vendor, max_group=MAX_GROUP):
+        self.book = book      # OrderBook, loaded; only touched on the store thread
+        self.vendor = vendor  # VendorBook on the same storage, loaded
+        self.max_group = max_group
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="intake")
+        self._queue = None
+        self._server = None
+        self.routes = {
+            "/health": {"GET": self.health},
+            "/orders": {"POST": self.add_order},
+            "/orders/batch": {"POST": self.add_orders},
+            "/orders/deliver": {"POST": self.deliver_next},
+            "/vendor-orders": {"POST": self.add_vendor_order},
+            "/plan": {"POST": self.take_plan}
+        }
+
+    # ----- Store thread -----
+    def _apply(self, op, payload):
+        if op == "add_many":
+            return self.book.add_many(payload)
+        if op == "deliver":
+            return self.book.deliver_next()
+        if op == "add_vendor":
+            return self.vendor.add(payload)
+        if op == "vendor_status":
+            return self.vendor.update_status(*payload)
+        if op == "plan":
+            return self.book.take_plan(*payload)
+        raise ValueError(f"Unknown operation: {op}")
+
+    @timed("api.commit")
+    def _commit(self, group):
+        # group: [(op, payload)] -> [(ok, result)], applied in arrival order.
+        # A run of single adds becomes one add_many
+        results = []
+        position = 0
+        while position < len(group):
+            op, payload = group[position]
+            if op == "add":
+                end = position
+                while end < len(group) and group[end][0] == "add":
+                    end += 1
+                try:
+                    orders = self.book.add_many([fields for _, fields in group[position:end]])
+                    results += [(True, order) for order in orders]
+                except Exception as e:
+                    results += [(False, e)] * (end - position)
+                position = end
+                continue
+            try:
+                results.append((True, self._apply(op, payload)))
+            except Exception as e:
+                results.append((False, e))
+            position += 1
+        return results
+
+    async def _commit_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            group = [await self._queue.get()]
+            while len(group) < self.max_group and not self._queue.empty():
+                group.append(self._queue.get_nowait())
+            results = await loop.run_in_executor(self._executor, self._commit,
+                                                 [(op, payload) for op, payload, _ in group])
+            count("api.commits")
+            count("api.requests", len(group))
+            for (_, _, future), result in zip(group, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _submit(self, op, payload=None):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, payload, future))
+        ok, result = await future
+        if not ok:
+            raise result
+        return result
+
+    # ----- Endpoints: (status, JSON result) -----
+    async def health(self, body):
+        return 200, {"pending": len(self.book), "vendor_orders": len(self.vendor)}
+
+    async def add_order(self, body):
+        order = await self._submit("add", _json(body, dict))
+        if isinstance(order, OrderError):
+            return 422, _error(order)
+        return 201, {"order": order}
+
+    async def add_orders(self, body):
+        records = _json(body, list)
+        if not all(isinstance(fields, dict) for fields in records):
+            raise ApiError(400, "Each order must be a JSON object.")
+        accepted, rejected = [], []
+        for index, order in enumerate(await self._submit("add_many", records)):
+            if isinstance(order, OrderError):
+                rejected.append(dict(index=index, **_error(order)))
+            else:
+                accepted.append({"index": index, "order_id": order["order_id"]})
+        return 200, {"accepted": accepted, "rejected": rejected}
+
+    async def deliver_next(self, body):
+        order = await self._submit("deliver")
+        if order is None:
+            return 404, {"error": "No Orders", "message": "No orders to deliver."}
+        return 200, {"order": order}
+
+    async def add_vendor_order(self, body):
+        try:
+            values = vendor_values(_json(body, dict))
+        except OrderError as e:
+            return 422, _error(e)
+        return 201, {"vendor_id": await self._submit("add_vendor", values)}
+
+    async def set_vendor_status(self, vendor_id, body):
+        status = str(_json(body, dict).get("status") or "").strip()
+        if status not in VENDOR_STATUSES:
+            return 422, {"error": "Input Error", "message": f"Status must be one of: {', '.join(VENDOR_STATUSES)}"}
+        try:
+            await self._submit("vendor_status", (vendor_id, status))
+        except KeyError:
+            raise ApiError(404, f"No vendor order {vendor_id}.")
+        return 200, {"vendor_id": vendor_id, "status": status}
+
+    async def take_plan(self, body):
+        # Matched orders leave pending, as in the Today's Plan window
+        fields = _json(body, dict)
+        try:
+            capacity = parse_capacity(fields.get("stops"), fields.get("vehicles"), fields.get("slots") or "")
+        except OrderError as e:
+            return 422, _error(e)
+        plan = await self._submit("plan", _window(fields))
+        return 200, {"runs": schedule(plan, *capacity)}
+
+    def _route(self, method, path):
+        parts = path.split("/")
+        if len(parts) == 4 and parts[1] == "vendor-orders" and parts[3] == "status":
+            if not parts[2].isdigit():
+                raise ApiError(404, f"No vendor order {parts[2]}.")
+            methods = {"PUT": lambda body: self.set_vendor_status(int(parts[2]), body)}
+        else:
+            methods = self.routes.get(path)
+        if methods is None:
+            raise ApiError(404, f"No endpoint {path}.")
+        if method not in methods:
+            raise ApiError(405, f"{path} accepts {', '.join(methods)}.")
+        return methods[method]
+
+    # ----- Connections -----
+    async def _handle(self, reader, writer):
+        count("api.connections")
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ApiError as e:
+                    writer.write(_response(e.status, {"error": HTTPStatus(e.status).phrase, "message": str(e)}, False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, _, body, keep_alive = request
+                try:
+                    status, result = await self._route(method, path)(body)
+                except ApiError as e:
+                    status, result = e.status, {"error": HTTPStatus(e.status).phrase, "message": str(e)}
+                except Exception as e:
+                    print("Intake request failed:", method, path, repr(e))
+                    status, result = 500, {"error": type(e).__name__, "message": str(e)}
+                count(f"api.status_{status}")
+                writer.write(_response(status, result, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            print("Client connection closed:", e)
+        finally:
+            writer.close()
+
+    # ----- Lifecycle -----
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self._queue = asyncio.Queue()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return asyncio.ensure_future(self._commit_loop())
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        committer = await self.start(host, port)
+        print(f"Order intake listening on http://{host}:{port}")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            committer.cancel()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.book.close()
+
+
+def serve(host=None, port=None):
+    # Blocks until interrupted (Ctrl+C)
+    events = EventLog()  # intake changes reach a running Today's Plan too
+    book = OrderBook(events=events)
+    book.load()
+    vendor = VendorBook(storage=book.storage, events=events)  # one store: the plan join sees vendor edits at once
+    vendor.load()
+    server = IntakeServer(book, vendor)
+    if STATS.enabled:
+        STATS.start_dump("stats_api.json")
+    try:
+        asyncio.run(server.serve(host or DEFAULT_HOST, port or DEFAULT_PORT))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        print("Order intake stopped")
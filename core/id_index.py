@@ -0,0 +1,150 @@
+# Map from integer IDs (order / vendor IDs) to integers (table slots, file
+# positions) kept as two parallel sorted arrays: 12 bytes per entry instead of
+# a dict entry and two int objects. IDs are handed out by counters, so new
+# entries nearly always go on the end; lookups are a bisect. Deletes only mark
+# the entry (value DEAD), and the arrays are compacted once half of them are
+# marked, so a delete is O(log n) amortized instead of a memmove.
+from array import array
+from bisect import bisect_left
+from itertools import chain, compress
+from operator import itemgetter, ne
+
+DEAD = -1  # value of a deleted entry; stored values are slots / positions, never negative
+COMPACT_MIN = 1024  # dead entries tolerated before compacting is considered
+
+
+class IdIndex:
+    def __init__(self, pairs=()):
+        self._ids = array('q')
+        self._values = array('q')
+        self._dead = 0
+        self.build(pairs)
+
+    @classmethod
+    def from_arrays(cls, ids, values):
+        # ids ascending, values in step (a snapshot's columns); taken as they are
+        index = cls()
+        index._ids, index._values = ids, values
+        return index
+
+    def __len__(self):
+        return len(self._ids) - self._dead
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __getitem__(self, key):
+        index = self._find(key)
+        if index is None:
+            raise KeyError(key)
+        return self._values[index]
+
+    def get(self, key, default=None):
+        index = self._find(key)
+        return default if index is None else self._values[index]
+
+    def _find(self, key):
+        ids = self._ids
+        index = bisect_left(ids, key)
+        if index < len(ids) and ids[index] == key and self._values[index] != DEAD:
+            return index
+        return None
+
+    def __setitem__(self, key, value):
+        ids = self._ids
+        if not ids or key > ids[-1]:
+            ids.append(key)
+            self._values.append(value)
+            return
+        index = bisect_left(ids, key)
+        if index < len(ids) and ids[index] == key:
+            if self._values[index] == DEAD:
+                self._dead -= 1
+            self._values[index] = value
+        else:
+            ids.insert(index, key)
+            self._values.insert(index, value)
+
+    def __delitem__(self, key):
+        self.pop(key)
+
+    def pop(self, key, *default):
+        index = self._find(key)
+        if index is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self._values[index]
+        self._values[index] = DEAD
+        self._dead += 1
+        self._maybe_compact()
+        return value
+
+    def remove_many(self, keys):
+        # Missing keys are ignored
+        for key in keys:
+            index = self._find(key)
+            if index is not None:
+                self._values[index] = DEAD
+                self._dead += 1
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._dead > COMPACT_MIN and self._dead * 2 > len(self._ids):
+            self._compact()
+
+    def _compact(self):
+        if self._dead:
+            keep = list(map(ne, self._values, [DEAD] * len(self._values)))
+            self._ids = array('q', compress(self._ids, keep))
+            self._values = array('q', compress(self._values, keep))
+            self._dead = 0
+
+    @property
+    def ids(self):
+        # Live IDs, ascending (compacts first)
+        self._compact()
+        return self._ids
+
+    @property
+    def values(self):
+        # Values in step with ids
+        self._compact()
+        return self._values
+
+    def last(self):
+        # Highest ID stored, deleted ones included (append_sorted keys go above it), or None
+        return self._ids[-1] if self._ids else None
+
+    def build(self, pairs):
+        # Replaces the contents with (key, value) pairs. Input already in
+        # ascending key order (the usual case) is appended as it streams;
+        # anything else is sorted, and on duplicate keys the first pair wins
+        self._ids, self._values, self._dead = array('q'), array('q'), 0
+        pairs = iter(pairs)
+        for key, value in pairs:
+            if self._ids and key <= self._ids[-1]:
+                ordered = sorted(chain(zip(self._ids, self._values), [(key, value)], pairs), key=itemgetter(0))
+                self._ids, self._values = array('q'), array('q')
+                for key, value in ordered:
+                    if not self._ids or key != self._ids[-1]:
+                        self._ids.append(key)
+                        self._values.append(value)
+                return
+            self._ids.append(key)
+            self._values.append(value)
+
+    def append_sorted(self, keys, values):
+        # keys must be ascending and above last()
+        self._ids.extend(keys)
+        self._values.extend(values)
+
+    def copy(self):
+        self._compact()
+        return IdIndex.from_arrays(array('q', self._ids), array('q', self._values))
+
+    def items(self):
+        return zip(self.ids, self.values)
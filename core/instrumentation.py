@@ -0,0 +1,169 @@
+# Lightweight instrumentation shared by all three apps: timers (latency
+# histograms), counters (rows, bytes) and a periodic JSON dump. Collection is
+# off unless CMS_STATS=1 or the Stats window switches it on; while off, timer()
+# hands back one shared no-op context manager and @timed costs a flag check.
+import json
+import math
+import os
+import threading
+import time
+from functools import wraps
+
+DUMP_INTERVAL = float(os.environ.get("CMS_STATS_INTERVAL", "30"))  # seconds
+BUCKETS_PER_OCTAVE = 4  # histogram resolution: ~19% per bucket
+BUCKET_COUNT = 128      # 1 microsecond .. ~4.5 hours
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        micros = seconds * 1e6
+        bucket = int(math.log2(micros) * BUCKETS_PER_OCTAVE) + 1 if micros >= 1 else 0
+        self.counts[min(bucket, BUCKET_COUNT - 1)] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        # Upper edge of the bucket holding the requested rank, in seconds
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                upper = 2 ** (bucket / BUCKETS_PER_OCTAVE) / 1e6
+                return min(upper, self.max)
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("stats", "name", "started")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Stats:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+        self._dumper = None
+
+    def timer(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            timers = {
+                name: {
+                    "count": h.count,
+                    "p50_ms": h.percentile(0.50) * 1000,
+                    "p99_ms": h.percentile(0.99) * 1000,
+                    "max_ms": h.max * 1000,
+                    "total_ms": h.total * 1000
+                }
+                for name, h in sorted(self.histograms.items())
+            }
+            return {
+                "timestamp": time.time(),
+                "since": self.started,
+                "enabled": self.enabled,
+                "timers": timers,
+                "counters": dict(sorted(self.counters.items()))
+            }
+
+    def dump(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def start_dump(self, path, interval=DUMP_INTERVAL):
+        # Writes the snapshot every interval seconds while collection is on
+        def loop():
+            while True:
+                time.sleep(interval)
+                if self.enabled:
+                    try:
+                        self.dump(path)
+                    except OSError as e:
+                        print("Stats dump error:", e)
+
+        if self._dumper is None:
+            self._dumper = threading.Thread(target=loop, daemon=True)
+            self._dumper.start()
+
+
+STATS = Stats(enabled=os.environ.get("CMS_STATS", "") == "1")
+timer = STATS.timer
+count = STATS.count
+
+
+def timed(name):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not STATS.enabled:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STATS.observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
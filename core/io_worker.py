@@ -0,0 +1,137 @@
+# Background I/O for the windows: one worker thread takes jobs (CSV reads,
+# appends, rewrites, the Today's Plan join) from a FIFO queue, so the Tk event
+# loop never waits on the disk. Jobs run and complete in submission order, and
+# their callbacks are run back on the UI thread by poll(), which attach()
+# schedules with root.after every frame. Tk-free: anything with an after()
+# method can drive it.
+import queue
+import threading
+import time
+import traceback
+from .instrumentation import count, timed
+
+FRAME_MS = 16  # poll interval, ~60 fps
+SPINNER = "|/-\\"
+
+
+class Job:
+    __slots__ = ("fn", "args", "label", "on_done", "on_error", "started", "result", "error")
+
+    def __init__(self, fn, args, label, on_done, on_error):
+        self.fn = fn
+        self.args = args
+        self.label = label
+        self.on_done = on_done
+        self.on_error = on_error
+        self.started = None
+        self.result = None
+        self.error = None
+
+
+class IOWorker:
+    def __init__(self, name="io"):
+        self.on_error = None   # default error callback: fn(job, exception)
+        self.on_status = None  # fn(text), called when the status line changes ("" when idle)
+        self._requests = queue.Queue()
+        self._finished = queue.Queue()
+        self._pending = 0      # submitted and not yet delivered by poll()
+        self._current = None   # job running on the worker thread
+        self._status = ""
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, label=None, on_done=None, on_error=None):
+        # Runs fn(*args) on the worker. on_done(result) / on_error(job, exception)
+        # run on the UI thread
+        job = Job(fn, args, label, on_done, on_error)
+        self._pending += 1
+        self._requests.put(job)
+        count("io.jobs_submitted")
+        return job
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def _run(self):
+        while True:
+            job = self._requests.get()
+            if job is None:
+                break
+            job.started = time.perf_counter()
+            self._current = job
+            try:
+                job.result = self._call(job)
+            except Exception as e:
+                job.error = e
+                traceback.print_exc()
+            self._current = None
+            self._finished.put(job)
+
+    @timed("io.job")
+    def _call(self, job):
+        return job.fn(*job.args)
+
+    def poll(self):
+        # UI thread: run the callbacks of finished jobs, oldest first
+        delivered = 0
+        while True:
+            try:
+                job = self._finished.get_nowait()
+            except queue.Empty:
+                break
+            delivered += 1
+            self._deliver(job)
+        self._update_status()
+        return delivered
+
+    def _deliver(self, job):
+        self._pending -= 1
+        if job.error is None:
+            if job.on_done is not None:
+                job.on_done(job.result)
+            return
+        count("io.jobs_failed")
+        handler = job.on_error or self.on_error
+        if handler is not None:
+            handler(job, job.error)
+
+    def status(self):
+        # Status line for the running job: label, spinner and elapsed time
+        job = self._current
+        if job is None or job.label is None:
+            return f"{self._pending} operations queued" if self._pending > 1 else ""
+        elapsed = time.perf_counter() - job.started
+        return f"{job.label}... {SPINNER[int(elapsed * 8) % len(SPINNER)]} ({elapsed:.1f}s)"
+
+    def _update_status(self):
+        status = self.status()
+        if status != self._status:
+            self._status = status
+            if self.on_status is not None:
+                self.on_status(status)
+
+    def attach(self, root, on_status=None, on_error=None, interval=FRAME_MS):
+        # Poll from root's event loop every interval ms until root is destroyed
+        self.on_status = on_status
+        self.on_error = on_error
+
+        def pump():
+            # Rescheduled first, so a failing callback does not stop the polling
+            root.after(interval, pump)
+            self.poll()
+        root.after(interval, pump)
+
+    def wait(self):
+        # Blocks until every submitted job has finished, then runs their callbacks
+        while self._pending:
+            self._deliver(self._finished.get())
+        self._update_status()
+
+    def close(self, callbacks=True):
+        # Runs every submitted job before returning. callbacks=False skips
+        # their callbacks (the window they would update is already gone)
+        if callbacks:
+            self.wait()
+        self._requests.put(None)
+        self._thread.join()
@@ -0,0 +1,232 @@
+# Running financial aggregates for the dashboard: balance due per customer,
+# advance collected, revenue by order date, delivered value per vendor and
+# pending value per priority. Built once by a column-wise pass over the order
+# table, the delivered history and the vendor table (vectorized with NumPy
+# when it is installed), then kept current from the change events
+# (core/events.py) of every window and the command line: each add, delivery,
+# cancel, plan join, priority change and vendor change, so reading it never
+# rescans the CSV files.
+import heapq
+from array import array
+from collections import defaultdict
+from itertools import compress
+from operator import sub
+from .events import (ORDER_ADDED, ORDER_DELIVERED, ORDER_CANCELLED, ORDER_PLANNED, ORDER_PRIORITY,
+                     VENDOR_ADDED, VENDOR_STATUS, VENDOR_DELETED)
+from .vendor_store import STATUS_INDEX
+from .vendor_table import TOTAL_INDEX, VENDOR_FIELDS
+from .instrumentation import timed
+
+try:
+    import numpy as np
+except ImportError:  # optional; rebuild() falls back to plain loops
+    np = None
+
+VENDOR_NAME_INDEX = VENDOR_FIELDS.index('Vendor Name')
+PRIORITY_NAMES = {0: "High", 1: "Normal"}
+EPSILON = 0.005  # balances below half a paisa are treated as settled
+
+
+def _amount(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _row_order(row):
+    # The fields the ledger reads, from a pending row (FIELDNAMES strings) as
+    # carried by the order events
+    return {
+        "customer_id": row["customer_id"],
+        "order_date": str(row["order_date"]).strip(),
+        "total_amount": _amount(row["total_amount"]),
+        "advance_paid": _amount(row["advance_paid"]),
+        "priority_flag": int(_amount(row["priority_flag"]))
+    }
+
+
+def _is_delivered(status):
+    return str(status).strip().lower() == 'delivered'
+
+
+def _take(column, slots):
+    # Column values at slots: a NumPy array for typed columns when NumPy is
+    # there, a list otherwise
+    if np is not None and isinstance(column, array):
+        return np.asarray(column)[np.asarray(slots, dtype=np.int64)]
+    return list(map(column.__getitem__, slots))
+
+
+def _sum_by(keys, values):
+    # {key: sum of the values with that key}
+    if np is not None and len(keys):
+        uniques, inverse = np.unique(np.array(keys), return_inverse=True)
+        sums = np.bincount(inverse, weights=np.asarray(values, dtype=np.float64), minlength=len(uniques))
+        return defaultdict(float, zip(uniques.tolist(), sums.tolist()))
+    sums = defaultdict(float)
+    for key, value in zip(keys, values):
+        sums[key] += value
+    return sums
+
+
+def _total(values):
+    return float(np.sum(values)) if np is not None and len(values) else float(sum(values))
+
+
+class Ledger:
+    def __init__(self):
+        self.outstanding = defaultdict(float)          # customer_id -> balance due on pending orders
+        self.pending_by_priority = defaultdict(float)  # priority_flag -> pending order value
+        self.revenue_by_date = defaultdict(float)      # order date -> delivered order value
+        self.vendor_delivered = defaultdict(float)     # vendor name -> Total Price of Delivered rows
+        self.advance_collected = 0.0                   # advances on pending and delivered orders
+        self.pending_count = 0
+        self.delivered_count = 0
+
+    # ----- Full recompute -----
+    @timed("ledger.rebuild")
+    def rebuild(self, orders, delivered_rows, vendor_table):
+        # orders: OrderTable, delivered_rows: dicts as from storage.delivered_rows(),
+        # vendor_table: VendorTable
+        self.__init__()
+        slots = orders.slots()
+        customers = [customer_id.strip() for customer_id in _take(orders.column("customer_id"), slots)]
+        totals = _take(orders.column("total_amount"), slots)
+        advances = _take(orders.column("advance_paid"), slots)
+        balances = totals - advances if np is not None else list(map(sub, totals, advances))
+        self.outstanding = _sum_by(customers, balances)
+        flags = _take(orders.column("priority_flag"), slots)
+        self.pending_by_priority = _sum_by(flags.tolist() if np is not None else flags, totals)
+        self.pending_count = len(slots)
+
+        dates, delivered_totals, delivered_advances = [], array('d'), array('d')
+        for row in delivered_rows:
+            dates.append(str(row['order_date']).strip())
+            delivered_totals.append(_amount(row['total_amount']))
+            delivered_advances.append(_amount(row['advance_paid']))
+        self.revenue_by_date = _sum_by(dates, delivered_totals)
+        self.delivered_count = len(dates)
+        self.advance_collected = _total(advances) + _total(delivered_advances)
+
+        slots = vendor_table.slots()
+        statuses = _take(vendor_table.column(STATUS_INDEX), slots)
+        delivered = {status: _is_delivered(status) for status in set(statuses)}
+        mask = list(map(delivered.__getitem__, statuses))
+        names = list(compress(_take(vendor_table.column(VENDOR_NAME_INDEX), slots), mask))
+        vendor_totals = _take(vendor_table.numbers(TOTAL_INDEX), slots)
+        if np is not None:
+            vendor_totals = vendor_totals[np.array(mask, dtype=bool)]
+        else:
+            vendor_totals = list(compress(vendor_totals, mask))
+        self.vendor_delivered = _sum_by([name.strip() for name in names], vendor_totals)
+
+    # ----- Pending orders -----
+    def _settle(self, customer_id, amount):
+        customer_id = str(customer_id).strip()
+        balance = self.outstanding[customer_id] + amount
+        if abs(balance) < EPSILON:
+            del self.outstanding[customer_id]
+        else:
+            self.outstanding[customer_id] = balance
+
+    def add_pending(self, order):
+        total, advance = order["total_amount"], order["advance_paid"]
+        self._settle(order["customer_id"], total - advance)
+        self.pending_by_priority[order["priority_flag"]] += total
+        self.advance_collected += advance
+        self.pending_count += 1
+
+    def remove_pending(self, order):
+        # Cancelled: the order and its advance leave the books
+        total, advance = order["total_amount"], order["advance_paid"]
+        self._settle(order["customer_id"], advance - total)
+        self.pending_by_priority[order["priority_flag"]] -= total
+        self.advance_collected -= advance
+        self.pending_count -= 1
+
+    def deliver(self, order):
+        # Balance is collected on delivery; the advance stays collected
+        total = order["total_amount"]
+        self._settle(order["customer_id"], order["advance_paid"] - total)
+        self.pending_by_priority[order["priority_flag"]] -= total
+        self.pending_count -= 1
+        self.revenue_by_date[str(order["order_date"])] += total
+        self.delivered_count += 1
+
+    def deliver_many(self, orders):
+        for order in orders:
+            self.deliver(order)
+
+    def set_priority(self, total, old_flag, new_flag):
+        self.pending_by_priority[old_flag] -= total
+        self.pending_by_priority[new_flag] += total
+
+    # ----- Vendor orders -----
+    def vendor_changed(self, old_values, new_values):
+        # old_values / new_values: the row before and after (None when added / deleted)
+        for values, sign in ((old_values, -1), (new_values, 1)):
+            if values is not None and _is_delivered(values[STATUS_INDEX]):
+                name = values[VENDOR_NAME_INDEX].strip()
+                self.vendor_delivered[name] += sign * _amount(values[TOTAL_INDEX])
+                if abs(self.vendor_delivered[name]) < EPSILON:
+                    del self.vendor_delivered[name]
+
+    # ----- Events -----
+    def apply_event(self, event):
+        # One change event, from this process or another one. Events written
+        # before the removals carried their rows have nothing to apply
+        kind = event.get("type")
+        if kind == ORDER_ADDED:
+            for row in event["rows"]:
+                self.add_pending(_row_order(row))
+        elif kind == ORDER_DELIVERED:
+            self.deliver_many(map(_row_order, event.get("rows", ())))
+        elif kind in (ORDER_CANCELLED, ORDER_PLANNED):
+            for row in event.get("rows", ()):
+                self.remove_pending(_row_order(row))
+        elif kind == ORDER_PRIORITY and "total_amount" in event:
+            self.set_priority(event["total_amount"], 1 - event["priority_flag"], event["priority_flag"])
+        elif kind in (VENDOR_ADDED, VENDOR_STATUS, VENDOR_DELETED):
+            self.vendor_changed(event.get("old"), event.get("new"))
+
+    # ----- Reading -----
+    def summary(self, top=10, days=14):
+        return {
+            "outstanding_total": sum(self.outstanding.values()),
+            "advance_collected": self.advance_collected,
+            "revenue_total": sum(self.revenue_by_date.values()),
+            "vendor_delivered_total": sum(self.vendor_delivered.values()),
+            "pending_count": self.pending_count,
+            "delivered_count": self.delivered_count,
+            "pending_by_priority": {PRIORITY_NAMES.get(flag, str(flag)): value
+                                    for flag, value in sorted(self.pending_by_priority.items())},
+            "top_outstanding": heapq.nlargest(top, self.outstanding.items(), key=lambda item: item[1]),
+            "revenue_by_date": heapq.nlargest(days, self.revenue_by_date.items()),
+            "vendor_delivered": sorted(self.vendor_delivered.items(), key=lambda item: -item[1])
+        }
+
+
+def format_dashboard(summary):
+    lines = [
+        f"Pending Orders       : {summary['pending_count']}",
+        f"Outstanding Balance  : ₹{summary['outstanding_total']:,.2f}",
+        f"Advance Collected    : ₹{summary['advance_collected']:,.2f}",
+        f"Delivered Orders     : {summary['delivered_count']}",
+        f"Delivered Revenue    : ₹{summary['revenue_total']:,.2f}",
+        f"Vendor Delivered     : ₹{summary['vendor_delivered_total']:,.2f}",
+        "",
+        "Pending Value by Priority"
+    ]
+    for name, value in summary["pending_by_priority"].items():
+        lines.append(f"  {name:<20} ₹{value:>15,.2f}")
+    lines += ["", "Top Outstanding Balances"]
+    for customer_id, value in summary["top_outstanding"]:
+        lines.append(f"  {customer_id:<20} ₹{value:>15,.2f}")
+    lines += ["", "Revenue by Order Date (latest)"]
+    for order_date, value in summary["revenue_by_date"]:
+        lines.append(f"  {order_date:<20} ₹{value:>15,.2f}")
+    lines += ["", "Delivered Value by Vendor"]
+    for vendor_name, value in summary["vendor_delivered"]:
+        lines.append(f"  {vendor_name:<20} ₹{value:>15,.2f}")
+    return "\n".join(lines)
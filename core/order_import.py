@@ -0,0 +1,152 @@
+# Headless bulk import of pending orders from CSV or JSONL.
+#   python -m core.order_import orders.csv
+#   python -m core.order_import orders.jsonl --workers 8 --rejects bad.csv
+# The input is split into chunks (never inside a quoted CSV field) that are
+# parsed and validated in a process pool with the same rules as the Add Order
+# form. Accepted orders get a block of IDs and are written to the store in one
+# buffered append, then published as ORDER_ADDED events so running windows
+# see them; rejected records go to a reject file with the reason.
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .events import EventLog, ORDER_ADDED
+from .order_rules import parse_order, OrderError
+from .pending_store import FIELDNAMES
+from .storage import open_storage
+
+CHUNK_LINES = 20000
+EVENT_ROWS = 1000  # rows per ORDER_ADDED event, so no log line gets huge
+
+
+def read_chunks(path, fmt, chunk_lines=CHUNK_LINES):
+    # Yields (header, lines); header is the CSV header row, None for JSONL
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        header = None
+        if fmt == "csv":
+            header = next(csv.reader([f.readline()]), [])
+        lines = []
+        in_quotes = False
+        for line in f:
+            lines.append(line)
+            if line.count('"') % 2:
+                in_quotes = not in_quotes
+            if len(lines) >= chunk_lines and not in_quotes:
+                yield header, lines
+                lines = []
+        if lines:
+            yield header, lines
+
+
+def _records(header, lines):
+    # (fields dict or None, raw text) per record
+    if header is None:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                fields = json.loads(line)
+            except ValueError:
+                fields = None
+            yield (fields if isinstance(fields, dict) else None), line.rstrip("\r\n")
+    else:
+        for values in csv.reader(lines):
+            if values:
+                yield dict(zip(header, values)), ",".join(values)
+
+
+def validate_chunk(chunk):
+    # Runs in a worker. Returns (record count, accepted rows as lists in
+    # FIELDNAMES order without order_id, [(record index, reason, raw)])
+    header, lines = chunk
+    accepted, rejects = [], []
+    count = 0
+    for index, (fields, raw) in enumerate(_records(header, lines)):
+        count += 1
+        if fields is None:
+            rejects.append((index, "Invalid JSON object.", raw))
+            continue
+        try:
+            order = parse_order(fields)
+        except OrderError as e:
+            rejects.append((index, str(e), raw))
+            continue
+        accepted.append([
+            order["order_date"].strftime("%Y-%m-%d"), order["name"], order["customer_id"],
+            order["address"], order["phone_number"], order["product_id"], order["order"],
+            str(order["total_amount"]), str(order["advance_paid"]), str(order["priority_flag"])
+        ])
+    return count, accepted, rejects
+
+
+def import_orders(path, fmt=None, workers=None, rejects_path=None, storage=None, chunk_lines=CHUNK_LINES,
+                  events=None):
+    # events: EventLog the accepted orders are published to; None = not published
+    fmt = fmt or ("jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv")
+    rejects_path = rejects_path or path + ".rejects.csv"
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    chunks = read_chunks(path, fmt, chunk_lines)
+    accepted, rejects = [], []
+    offset = 0
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(validate_chunk, chunks))
+    else:
+        results = map(validate_chunk, chunks)
+    for count, chunk_accepted, chunk_rejects in results:
+        accepted.extend(chunk_accepted)
+        rejects.extend((offset + index + 1, reason, raw) for index, reason, raw in chunk_rejects)
+        offset += count
+
+    own_storage = storage is None
+    if own_storage:
+        storage = open_storage()
+    try:
+        if accepted:
+            order_ids = storage.reserve_order_ids(len(accepted))
+            rows = [dict(zip(FIELDNAMES, values + [str(order_id)])) for values, order_id in zip(accepted, order_ids)]
+            storage.add_pending_many(rows)
+            if events is not None:
+                for start in range(0, len(rows), EVENT_ROWS):
+                    events.publish(ORDER_ADDED, rows=rows[start:start + EVENT_ROWS])
+    finally:
+        if own_storage:
+            storage.close()
+
+    if rejects:
+        with open(rejects_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["record", "reason", "data"])
+            writer.writerows(rejects)
+    elif os.path.exists(rejects_path):
+        os.remove(rejects_path)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "records": offset,
+        "accepted": len(accepted),
+        "rejected": len(rejects),
+        "rejects_path": rejects_path if rejects else None,
+        "seconds": elapsed,
+        "orders_per_min": offset / elapsed * 60 if elapsed > 0 else float(offset)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import pending orders from CSV or JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--rejects")
+    parser.add_argument("--chunk-lines", type=int, default=CHUNK_LINES)
+    args = parser.parse_args()
+    stats = import_orders(args.path, args.format, args.workers, args.rejects, chunk_lines=args.chunk_lines,
+                          events=EventLog())
+    print(f"Imported {stats['accepted']} of {stats['records']} orders in {stats['seconds']:.2f}s "
+          f"({stats['orders_per_min']:,.0f} orders/min), {stats['rejected']} rejected")
+    if stats["rejects_path"]:
+        print("Rejects written to", stats["rejects_path"])
@@ -0,0 +1,28 @@
+# Load helpers for pending orders: dates are parsed through a memo (most rows
+# share a handful of order dates) and the cyclic GC is paused while a large
+# table is built.
+import gc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def parse_date(date_str):
+    return datetime.strptime(date_str, "%Y-%m-%d").date()
+
+
+@contextmanager
+def gc_paused(freeze=True):
+    # The cyclic GC would otherwise rescan the growing pile of new objects many
+    # times over during a million-row load. Everything loaded is long-lived, so
+    # it is frozen out of future collections as well (unless freeze=False).
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if freeze:
+            gc.freeze()
+        if was_enabled:
+            gc.enable()
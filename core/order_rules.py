@@ -0,0 +1,68 @@
+# Field rules for a new pending order, shared by the Add Order form (app.py)
+# and the bulk importer (order_import.py) so both accept exactly the same rows.
+from .order_loader import parse_date
+
+REQUIRED_FIELDS = ["name", "customer_id", "address", "product_id", "phone_number",
+                   "order", "total_amount", "advance_paid"]
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+class OrderError(ValueError):
+    def __init__(self, title, message):
+        super().__init__(message)
+        self.title = title
+
+
+def parse_batch(limit="", max_value="", until=""):
+    # Limits for a batch delivery (Deliver Batch dialog, cms.py deliver): raw
+    # strings, blank = no limit. Returns (limit, max_value, until date)
+    limit, max_value, until = _text(limit), _text(max_value), _text(until)
+    try:
+        limit = int(limit) if limit else None
+        max_value = float(max_value) if max_value else None
+        until = parse_date(until) if until else None
+    except ValueError:
+        raise OrderError("Format Error", "Check the number of orders, value and date formats.")
+    if (limit is not None and limit < 1) or (max_value is not None and max_value <= 0):
+        raise OrderError("Format Error", "Number of orders and value must be positive.")
+    return limit, max_value, until
+
+
+def parse_order(fields):
+    # fields: raw strings keyed like FIELDNAMES (order_id excluded); "important"
+    # (form checkbox) or "priority_flag" (0 = high) sets the priority.
+    # Returns the order dict without an order_id, or raises OrderError.
+    values = {k: _text(fields.get(k)) for k in REQUIRED_FIELDS}
+    if not all(values.values()):
+        raise OrderError("Input Error", "Please fill all fields.")
+    try:
+        order_date = parse_date(_text(fields.get("order_date")))
+        total_amount = float(values["total_amount"])
+        advance_paid = float(values["advance_paid"])
+    except ValueError:
+        raise OrderError("Format Error", "Check date and amount formats.")
+
+    priority_flag = _text(fields.get("priority_flag"))
+    if priority_flag in ("0", "1"):
+        importance_flag = int(priority_flag)
+    elif priority_flag:
+        raise OrderError("Format Error", "Priority flag must be 0 or 1.")
+    else:
+        importance_flag = 0 if _text(fields.get("important")).lower() in TRUE_VALUES else 1
+
+    return {
+        "order_date": order_date,
+        "name": values["name"],
+        "customer_id": values["customer_id"],
+        "address": values["address"],
+        "phone_number": values["phone_number"],
+        "product_id": values["product_id"],
+        "order": values["order"],
+        "total_amount": total_amount,
+        "advance_paid": advance_paid,
+        "priority_flag": importance_flag
+    }
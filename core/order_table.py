@@ -0,0 +1,411 @@
+# Columnar store for the pending queue. Each order is a slot in a set of
+# parallel columns: dates as ordinals and amounts, flags and IDs in typed
+# arrays, text fields in lists of interned strings (names, addresses and
+# products repeat across orders). Delivery order is kept as packed integer
+# keys in a blocked sorted list (SortedKeys: adding or delivering an order
+# shifts one block, not the queue) and order IDs map to slots through an
+# IdIndex, so an order costs one int and a few machine words instead of a
+# dict, a priority tuple and heap bookkeeping. OrderRow is a view over one
+# slot; a dict is only built by materialize() or when an order leaves the
+# table.
+import sys
+import time
+from array import array
+from datetime import date
+from functools import lru_cache
+from itertools import chain, islice
+from operator import itemgetter, lt
+from .id_index import IdIndex
+from .order_loader import parse_date, gc_paused
+from .pending_store import FIELDNAMES, FIELD_INDEX
+from .snapshot import SnapshotError, pack_ints, write_snapshot
+from .sorted_keys import SortedKeys
+from .instrumentation import count, timed
+
+TEXT_FIELDS = ("name", "customer_id", "address", "phone_number", "product_id", "order")
+TEXT_INDEXES = tuple(FIELD_INDEX[f] for f in TEXT_FIELDS)
+LOAD_BATCH = 4096  # records per column-wise batch in load()
+ORDER_DATE, TOTAL, ADVANCE, FLAG, ORDER_ID = (
+    FIELD_INDEX[f] for f in ("order_date", "total_amount", "advance_paid", "priority_flag", "order_id"))
+
+# Priority key, most significant first: priority_flag | order date ordinal |
+# amount (paise, inverted so larger totals come first) | order_id | slot.
+# Sorting the ints sorts orders exactly like the old
+# (priority_flag, order_date, -total_amount, order_id) tuples, to the paisa.
+SLOT_BITS = 32
+ID_BITS = 40
+AMOUNT_BITS = 64
+DATE_BITS = 22
+SLOT_MASK = (1 << SLOT_BITS) - 1
+ID_MASK = (1 << ID_BITS) - 1
+AMOUNT_BIAS = 1 << (AMOUNT_BITS - 1)
+KEY_BYTES = 21  # a packed key with a signed 8-bit priority_flag on top
+NUMBER_COLUMNS = ("order_date", "total_amount", "advance_paid", "priority_flag", "order_id")
+
+
+def priority_key(priority_flag, ordinal, total_amount, order_id, slot):
+    try:
+        paise = round(total_amount * 100)
+    except (OverflowError, ValueError):  # inf / nan
+        paise = 0
+    if not -AMOUNT_BIAS < paise <= AMOUNT_BIAS:
+        paise = AMOUNT_BIAS if paise > 0 else 1 - AMOUNT_BIAS
+    key = (((priority_flag << DATE_BITS) | ordinal) << AMOUNT_BITS) | (AMOUNT_BIAS - paise)
+    return (((key << ID_BITS) | order_id) << SLOT_BITS) | slot
+
+
+def key_order_id(key):
+    return (key >> SLOT_BITS) & ID_MASK
+
+
+def _text(value):
+    # Interned, so repeated names/addresses/products share one string object
+    return sys.intern(value) if value.__class__ is str else ('' if value is None else str(value))
+
+
+def _texts(values):
+    try:
+        return list(map(sys.intern, values))
+    except TypeError:
+        return [_text(value) for value in values]
+
+
+@lru_cache(maxsize=4096)
+def ordinal_date(ordinal):
+    return date.fromordinal(ordinal)
+
+
+@lru_cache(maxsize=4096)
+def date_ordinal(date_str):
+    return parse_date(date_str).toordinal()
+
+
+def _parse_row(record):
+    ordinal = date_ordinal(record[ORDER_DATE])
+    total_amount = float(record[TOTAL])
+    advance_paid = float(record[ADVANCE])
+    priority_flag = int(record[FLAG])
+    order_id = int(record[ORDER_ID])
+    if not (0 <= order_id <= ID_MASK and -128 <= priority_flag <= 127):
+        raise ValueError("priority_flag or order_id out of range")
+    return ordinal, total_amount, advance_paid, priority_flag, order_id
+
+
+def _parse_batch(batch):
+    # (valid records, [ordinals, totals, advances, flags, order_ids], skipped).
+    # Each column is converted with one map() over the batch; a batch with a
+    # bad row is redone row by row so only that row is skipped
+    try:
+        columns = [list(map(convert, map(itemgetter(index), batch))) for index, convert in (
+            (ORDER_DATE, date_ordinal), (TOTAL, float), (ADVANCE, float), (FLAG, int), (ORDER_ID, int))]
+        flags, order_ids = columns[3], columns[4]
+        if batch and not (0 <= min(order_ids) and max(order_ids) <= ID_MASK
+                          and -128 <= min(flags) and max(flags) <= 127):
+            raise ValueError("priority_flag or order_id out of range")
+        return batch, columns, 0
+    except Exception:
+        pass
+    valid, rows = [], []
+    for record in batch:
+        try:
+            rows.append(_parse_row(record))
+        except Exception as e:
+            print("Skipping invalid row:", dict(zip(FIELDNAMES, record)), "Error:", e)
+            continue
+        valid.append(record)
+    columns = [list(column) for column in zip(*rows)] or [[] for _ in NUMBER_COLUMNS]
+    return valid, columns, len(batch) - len(valid)
+
+
+class OrderRow:
+    # Read-only view of one pending order; valid while the order is in the table
+    __slots__ = ("_table", "_slot")
+
+    def __init__(self, table, slot):
+        self._table = table
+        self._slot = slot
+
+    def __getitem__(self, key):
+        return self._table.value(self._slot, key)
+
+    def get(self, key, default=None):
+        try:
+            return self._table.value(self._slot, key)
+        except KeyError:
+            return default
+
+    field = __getitem__
+
+    def materialize(self):
+        return self._table.materialize(self._slot)
+
+
+class OrderTable:
+    def __init__(self):
+        self._keys = SortedKeys()  # packed priority keys, ascending = delivery order
+        self._index = IdIndex()  # order_id -> slot
+        self._free = []    # slots of orders that left the table
+        self._text = {field: [] for field in TEXT_FIELDS}
+        self._dates = array('i')
+        self._totals = array('d')
+        self._advances = array('d')
+        self._flags = array('b')
+        self._ids = array('q')
+        self._bind()
+
+    def _bind(self):
+        # Field name -> column and slot getter, rebuilt when the columns are replaced
+        self._columns = dict(self._text, order_date=self._dates, total_amount=self._totals,
+                             advance_paid=self._advances, priority_flag=self._flags, order_id=self._ids)
+        self._getters = {field: column.__getitem__ for field, column in self._text.items()}
+        self._getters.update({
+            "order_date": lambda slot: ordinal_date(self._dates[slot]),
+            "total_amount": self._totals.__getitem__,
+            "advance_paid": self._advances.__getitem__,
+            "priority_flag": self._flags.__getitem__,
+            "order_id": self._ids.__getitem__
+        })
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, order_id):
+        return order_id in self._index
+
+    def empty(self):
+        return not self._keys
+
+    # ----- Slots -----
+    def _store(self, text_values, ordinal, total_amount, advance_paid, priority_flag, order_id):
+        if self._free:
+            slot = self._free.pop()
+            for field, value in zip(TEXT_FIELDS, text_values):
+                self._text[field][slot] = _text(value)
+            self._dates[slot] = ordinal
+            self._totals[slot] = total_amount
+            self._advances[slot] = advance_paid
+            self._flags[slot] = priority_flag
+            self._ids[slot] = order_id
+        else:
+            slot = len(self._ids)
+            for field, value in zip(TEXT_FIELDS, text_values):
+                self._text[field].append(_text(value))
+            self._dates.append(ordinal)
+            self._totals.append(total_amount)
+            self._advances.append(advance_paid)
+            self._flags.append(priority_flag)
+            self._ids.append(order_id)
+        return slot
+
+    def _release(self, slot):
+        for column in self._text.values():
+            column[slot] = None
+        self._free.append(slot)
+
+    def _key(self, slot):
+        return priority_key(self._flags[slot], self._dates[slot], self._totals[slot], self._ids[slot], slot)
+
+    def value(self, slot, key):
+        return self._getters[key](slot)
+
+    def materialize(self, slot):
+        # Same keys, order and types as parse_order / FIELDNAMES
+        return {field: self._getters[field](slot) for field in FIELDNAMES}
+
+    # ----- Queue -----
+    @timed("orders.load_table")
+    def load(self, records, freeze=True):
+        # records: lists in FIELDNAMES order (storage.pending_records()). Rows
+        # go into fresh slots at the end and are converted a batch and a
+        # column at a time; the keys are sorted once at the end. freeze=False
+        # leaves the loaded objects collectable (a table built only to be
+        # written out). Returns load stats
+        started = time.perf_counter()
+        keys = list(self._keys)
+        number_columns = [self._dates, self._totals, self._advances, self._flags, self._ids]
+        ids = self._ids
+        text_columns = [self._text[field] for field in TEXT_FIELDS]
+        first_slot = len(ids)
+        new_ids = array('q')
+        skipped = 0
+        records = iter(records)
+        with gc_paused(freeze):
+            while True:
+                batch = list(islice(records, LOAD_BATCH))
+                if not batch:
+                    break
+                valid, columns, bad = _parse_batch(batch)
+                skipped += bad
+                ordinals, totals, _, flags, order_ids = columns
+                slot = len(ids)
+                keys.extend(map(priority_key, flags, ordinals, totals, order_ids, range(slot, slot + len(valid))))
+                for column, values in zip(number_columns, columns):
+                    column.extend(values)
+                new_ids.extend(order_ids)
+                for index, column in zip(TEXT_INDEXES, text_columns):
+                    column.extend(_texts(list(map(itemgetter(index), valid))))
+            last = self._index.last()
+            if (last is None or not new_ids or new_ids[0] > last) and all(map(lt, new_ids, new_ids[1:])):
+                # Rows stored in order ID order (the usual case) go straight on the end
+                self._index.append_sorted(new_ids, array('q', range(first_slot, len(ids))))
+            else:
+                expected = len(self._index) + len(new_ids)
+                self._index.build(chain(self._index.items(), zip(new_ids, range(first_slot, len(ids)))))
+                if len(self._index) != expected:
+                    # Duplicate order IDs: the first row wins, later copies are dropped
+                    live = set(self._index.values)
+                    for slot in set(range(first_slot, len(ids))) - live:
+                        self._release(slot)
+                    keys = [key for key in keys if key & SLOT_MASK in live]
+            keys.sort()
+            self._keys = SortedKeys(keys)
+        elapsed = time.perf_counter() - started
+        count("orders.rows_loaded", len(keys))
+        count("orders.rows_skipped", skipped)
+        return {
+            "rows": len(keys),
+            "skipped": skipped,
+            "seconds": elapsed,
+            "rows_per_sec": len(keys) / elapsed if elapsed > 0 else float(len(keys))
+        }
+
+    # ----- Warm-start snapshot -----
+    @timed("orders.save_snapshot")
+    def save_snapshot(self, path, meta):
+        # Writes the queued orders to a snapshot file (core/snapshot.py) in
+        # delivery order, renumbered to slots 0..n-1, so the file has no free
+        # slots and its keys are already sorted
+        slots = self.slots()
+        keys = [(key & ~SLOT_MASK) | slot for slot, key in enumerate(self._keys)]
+        ids = array('q', map(self._ids.__getitem__, slots))
+        by_id = sorted(range(len(ids)), key=ids.__getitem__)
+        arrays = {field: array(self._columns[field].typecode, map(self._columns[field].__getitem__, slots))
+                  for field in NUMBER_COLUMNS}
+        arrays["index_ids"] = array('q', map(ids.__getitem__, by_id))
+        arrays["index_slots"] = array('q', by_id)
+        texts = {field: map(self._text[field].__getitem__, slots) for field in TEXT_FIELDS}
+        return write_snapshot(path, meta, arrays, texts, {"keys": (pack_ints(keys, KEY_BYTES), KEY_BYTES)})
+
+    @timed("orders.load_snapshot")
+    def load_snapshot(self, snapshot):
+        # Replaces the contents with a snapshot written by save_snapshot. The
+        # numeric columns are copied out of the mapping; text cells and blocks
+        # of keys are decoded when first read. Returns load stats like load()
+        started = time.perf_counter()
+        self._dates, self._totals, self._advances, self._flags, self._ids = (
+            snapshot.array(field) for field in NUMBER_COLUMNS)
+        self._text = {field: snapshot.text(field) for field in TEXT_FIELDS}
+        self._index = IdIndex.from_arrays(snapshot.array("index_ids"), snapshot.array("index_slots"))
+        self._keys = SortedKeys.from_packed(snapshot.packed("keys"))
+        self._free = []
+        self._bind()
+        if not len(self._keys) == len(self._ids) == len(self._index):
+            raise SnapshotError(f"{snapshot.path}: column lengths differ")
+        elapsed = time.perf_counter() - started
+        count("orders.rows_loaded", len(self._keys))
+        return {
+            "rows": len(self._keys),
+            "skipped": 0,
+            "seconds": elapsed,
+            "rows_per_sec": len(self._keys) / elapsed if elapsed > 0 else float(len(self._keys))
+        }
+
+    @timed("queue.push")
+    def add(self, order):
+        # order: dict as built by parse_order, with order_id set
+        order_id = order["order_id"]
+        if order_id in self._index:
+            raise KeyError(f"Order {order_id} is already queued")
+        if not 0 <= order_id <= ID_MASK:
+            raise ValueError(f"order_id {order_id} out of range")
+        slot = self._store([order[field] for field in TEXT_FIELDS], order["order_date"].toordinal(),
+                           order["total_amount"], order["advance_paid"], order["priority_flag"], order_id)
+        self._keys.add(self._key(slot))
+        self._index[order_id] = slot
+        return OrderRow(self, slot)
+
+    def get(self, order_id):
+        return OrderRow(self, self._index[order_id])
+
+    def peek(self):
+        if not self._keys:
+            raise IndexError("peek from an empty order table")
+        return OrderRow(self, self._keys.first() & SLOT_MASK)
+
+    @timed("queue.pop")
+    def pop(self):
+        if not self._keys:
+            raise IndexError("pop from an empty order table")
+        return self.remove(key_order_id(self._keys.first()))
+
+    @timed("queue.remove")
+    def remove(self, order_id):
+        # Takes the order out of the queue and returns it as a dict
+        slot = self._index.pop(order_id)
+        self._keys.remove(self._key(slot))
+        order = self.materialize(slot)
+        self._release(slot)
+        return order
+
+    @timed("queue.remove_many")
+    def remove_many(self, order_ids):
+        # Several orders out, O(log n) each; returned as dicts in the given order
+        slots = [self._index[order_id] for order_id in order_ids]
+        orders = [self.materialize(slot) for slot in slots]
+        taken = set(slots)
+        for slot in taken:
+            self._keys.remove(self._key(slot))
+        self._index.remove_many(order_ids)
+        for slot in taken:
+            self._release(slot)
+        return orders
+
+    def select(self, limit=None, max_value=None, until=None):
+        # Order IDs in delivery order: at most limit orders, dated on or before
+        # until (a date), stopping before the running total passes max_value
+        chosen, value = [], 0.0
+        until = until.toordinal() if until is not None else None
+        for key in self._keys:
+            if limit is not None and len(chosen) >= limit:
+                break
+            slot = key & SLOT_MASK
+            if until is not None and self._dates[slot] > until:
+                continue
+            if max_value is not None:
+                if value + self._totals[slot] > max_value:
+                    break
+                value += self._totals[slot]
+            chosen.append(self._ids[slot])
+        return chosen
+
+    @timed("queue.update_priority")
+    def set_priority(self, order_id, priority_flag):
+        slot = self._index[order_id]
+        self._keys.remove(self._key(slot))
+        self._flags[slot] = priority_flag
+        self._keys.add(self._key(slot))
+        return OrderRow(self, slot)
+
+    def max_order_id(self):
+        last = self._index.last()
+        return -1 if last is None else last
+
+    def position(self, order_id):
+        # Index of the order in delivery order
+        return self._keys.index(self._key(self._index[order_id]))
+
+    def order_ids(self, start, stop):
+        return [key_order_id(key) for key in self._keys[start:stop]]
+
+    def slots(self):
+        # Slots of the queued orders in delivery order, for column-wise passes
+        return array('q', [key & SLOT_MASK for key in self._keys])
+
+    def column(self, field):
+        # The whole column (typed array, dates as ordinals; list for text), indexed by slot
+        return self._columns[field]
+
+    def rows(self):
+        # OrderRow views in delivery order
+        for key in self._keys:
+            yield OrderRow(self, key & SLOT_MASK)
@@ -0,0 +1,363 @@
+# Pending order book: the columnar order queue, the customer 360 index and
+# the storage writes behind add / deliver / cancel / toggle priority. Used by
+# OrderApp and by the command line, no GUI imports.
+import csv
+import os
+from datetime import datetime
+from functools import partial
+from .customer_index import CustomerIndex, with_pending
+from .events import ORDER_ADDED, ORDER_DELIVERED, ORDER_CANCELLED, ORDER_PRIORITY, StoreRead
+from .ledger import Ledger
+from .order_loader import gc_paused
+from .order_rules import OrderError, parse_order
+from .order_table import OrderTable
+from .pending_store import order_to_row
+from .plan import build_plan
+from .storage import open_storage
+from .instrumentation import count, timed
+
+MANIFEST_COLUMNS = ["#", "Order ID", "Order Date", "Customer Name", "Customer ID", "Phone", "Address",
+                    "Product ID", "Order", "Total", "Advance", "Balance Due", "Priority"]
+MANIFEST_LINE = "{:>4} {:>8} {:10} {:20.20} {:12.12} {:12.12} {:30.30} {:10.10} {:20.20} {:>10} {:>10} {:>11} {:8}\n"
+
+
+def format_order(idx, order):
+    return (
+        f"{idx}. [#{order['order_id']}] {order['name']} | ID: {order['customer_id']} | Address: {order['address']} | Phone: {order['phone_number']} | "
+        f"Prod ID: {order['product_id']} | Date: {order['order_date']} | "
+        f"Total: ₹{order['total_amount']} | Advance: ₹{order['advance_paid']} | "
+        f"Priority: {'High' if order['priority_flag'] == 0 else 'Normal'}"
+    )
+
+
+def format_delivery(order):
+    return (
+        f"Delivering Order:\n\n"
+        f"Order ID      : {order['order_id']}\n"
+        f"Order Date    : {order['order_date']}\n"
+        f"Customer Name : {order['name']}\n"
+        f"Customer ID   : {order['customer_id']}\n"
+        f"Address       : {order['address']}\n"
+        f"Phone Number  : {order['phone_number']}\n"
+        f"Product ID    : {order['product_id']}\n"
+        f"Order Details : {order['order']}\n"
+        f"Total Amount  : ₹{order['total_amount']}\n"
+        f"Advance Paid  : ₹{order['advance_paid']}\n"
+        f"Balance Due   : ₹{order['total_amount'] - order['advance_paid']}\n"
+        f"Priority      : {'High' if order['priority_flag'] == 0 else 'Normal'}"
+    )
+
+
+def manifest_values(idx, order):
+    balance = order['total_amount'] - order['advance_paid']
+    return [idx, order['order_id'], str(order['order_date']), order['name'], order['customer_id'],
+            order['phone_number'], order['address'], order['product_id'], order['order'],
+            f"{order['total_amount']:.2f}", f"{order['advance_paid']:.2f}", f"{balance:.2f}",
+            'High' if order['priority_flag'] == 0 else 'Normal']
+
+
+@timed("orders.write_manifest")
+def save_manifest(path, orders, fmt="text"):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        return write_manifest(orders, f, fmt)
+
+
+def write_manifest(orders, out, fmt="text"):
+    # Dispatch manifest for a batch delivery, written to out (file or stdout)
+    # one line per order as it goes. "text" is fixed-width for printing with a
+    # totals line; "csv" has a header row. Returns (orders, total, balance due)
+    total = balance = 0.0
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(MANIFEST_COLUMNS)
+        write = writer.writerow
+    else:
+        out.write(f"Dispatch Manifest - {datetime.now():%Y-%m-%d %H:%M}\n\n")
+        out.write(MANIFEST_LINE.format(*MANIFEST_COLUMNS))
+        write = lambda values: out.write(MANIFEST_LINE.format(*values))
+    idx = 0
+    for idx, order in enumerate(orders, 1):
+        write(manifest_values(idx, order))
+        total += order['total_amount']
+        balance += order['total_amount'] - order['advance_paid']
+    if fmt != "csv":
+        out.write(f"\n{idx} orders | Total: ₹{total:.2f} | Balance due: ₹{balance:.2f}\n")
+    return idx, total, balance
+
+
+def format_customer(summary):
+    if not summary["customer_ids"] and not summary["phones"]:
+        return "No records for this customer."
+    lines = [
+        f"Customer ID(s)      : {', '.join(summary['customer_ids'])}",
+        f"Phone(s)            : {', '.join(summary['phones'])}",
+        f"Outstanding Balance : ₹{summary['outstanding']:.2f}",
+        f"Vendor Status       : {', '.join(f'{k}: {v}' for k, v in summary['vendor_status'].items()) or '-'}",
+        "",
+        f"Pending Orders ({len(summary['pending'])})"
+    ]
+    for order in summary["pending"]:
+        lines.append(f"  [#{order['order_id']}] {order['order_date']} | {order['name']} | Prod ID: {order['product_id']} | "
+                     f"Total: ₹{order['total_amount']} | Advance: ₹{order['advance_paid']}")
+    lines += ["", f"Delivered Orders ({len(summary['delivered'])})"]
+    for row in summary["delivered"]:
+        lines.append(f"  [#{row['order_id']}] {row['order_date']} | {row['name']} | Prod ID: {row['product_id']} | "
+                     f"Total: ₹{row['total_amount']}")
+    lines += ["", f"Vendor Records ({len(summary['vendor'])})"]
+    for _, values in summary["vendor"]:
+        lines.append(f"  {values[0]} | Prod ID: {values[2]} | {values[3]} | Status: {values[8]} | "
+                     f"Vendor: {values[9]} | Delivered: {values[10]}")
+    return "\n".join(lines)
+
+
+class OrderBook:
+    def __init__(self, storage=None, io=None, events=None):
+        self.storage = storage or open_storage()
+        self.io = io  # IOWorker for the storage writes; None writes inline
+        self.events = events  # EventLog the changes are published to (core/events.py); None = not published
+        self.orders = OrderTable()  # delivery order; get() returns OrderRow views
+        # Built from the store on first use and then owned by the I/O worker:
+        # updates and reads are queued there like the writes
+        self.customer_index = None  # CustomerIndex, built by customers() (at startup in the app)
+        self.ledger = None  # Ledger, built the first time the dashboard is opened
+        self._follower = None  # EventFollower feeding both views (core/events.py)
+        self.load_stats = None
+        self._adds_in_flight = 0  # adds written (or queued) whose order has not joined self.orders yet
+
+    def __len__(self):
+        return len(self.orders)
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def _persist(self, fn, *args, label=None, on_done=None):
+        # The in-memory queue is already updated; the write can trail behind.
+        # on_done(result) runs on the UI thread, or at once when run inline
+        if self.io is None:
+            result = fn(*args)
+            if on_done is not None:
+                on_done(result)
+        else:
+            self.io.submit(fn, *args, label=label, on_done=on_done)
+
+    def _publish(self, kind, **fields):
+        # Queued behind the write it describes, so subscribers find it in the store
+        if self.events is not None:
+            self._persist(partial(self.events.publish, kind, **fields))
+
+    def order_ids(self, start, stop):
+        return self.orders.order_ids(start, stop)
+
+    @timed("orders.load")
+    def load(self):
+        self.orders, self.load_stats = self.storage.pending_table()
+        return self.load_stats
+
+    def close(self):
+        # Leaves a warm-start snapshot for the next launch, unless this one
+        # started from a current snapshot: the next start replays the journal
+        # written since onto it, and the compactor writes a fresh one. Not
+        # written either when adds are in the journal but not in self.orders
+        # (the worker was closed without their callbacks): the snapshot would
+        # claim them, and they are only found by replaying the journal
+        if (self.load_stats is not None and self.load_stats.get("source") != "snapshot"
+                and not self._adds_in_flight):
+            self.storage.save_pending_table(self.orders)
+        if self._follower is not None:
+            self._follower.close()
+        self.storage.close()
+
+    def add(self, fields, on_done=None):
+        # fields as accepted by parse_order; raises OrderError. The order ID
+        # comes from the counter file, so the ID and the write are one job and
+        # the order joins the queue when it is done; on_done(order) follows.
+        # Returns the order when written inline (no I/O worker)
+        order = parse_order(fields)
+
+        def written(order):
+            self._adds_in_flight -= 1
+            self.orders.add(order)
+            if on_done is not None:
+                on_done(order)
+        self._adds_in_flight += 1
+        self._persist(self._write_added, order, label="Adding order", on_done=written)
+        return order if self.io is None else None
+
+    def _write_added(self, order):
+        # Worker side of add(). The index is updated here rather than in the
+        # callback, so a build queued in between cannot count the order twice
+        # (a build starts from scratch, so an update before it is harmless)
+        order["order_id"] = self.storage.next_order_id()
+        row = order_to_row(order)
+        self.storage.add_pending(row)
+        if self.customer_index is not None:
+            self.customer_index.add_pending(order)
+        if self.events is not None:
+            self.events.publish(ORDER_ADDED, rows=[row])
+        return order
+
+    def _queue(self, view, method, *args):
+        # An update for the customer index, queued behind the writes like the
+        # reads; nothing to do until it has been built
+        if view is not None:
+            self._persist(getattr(view, method), *args)
+
+    @timed("orders.add_many")
+    def add_many(self, records):
+        # Batch add (HTTP intake): each record validated as in add(), one block
+        # of IDs in input order and one storage write for the accepted ones.
+        # Returns the order dict or the OrderError for each record
+        results = []
+        for fields in records:
+            try:
+                results.append(parse_order(fields))
+            except OrderError as e:
+                results.append(e)
+        orders = [order for order in results if not isinstance(order, OrderError)]
+        if not orders:
+            return results
+        for order, order_id in zip(orders, self.storage.reserve_order_ids(len(orders))):
+            order["order_id"] = order_id
+            self.orders.add(order)
+            self._queue(self.customer_index, "add_pending", order)
+        rows = [order_to_row(order) for order in orders]
+        self._persist(self.storage.add_pending_many, rows)
+        self._publish(ORDER_ADDED, rows=rows)
+        count("orders.batch_added", len(orders))
+        return results
+
+    def deliver_next(self):
+        if self.orders.empty():
+            return None
+        order = self.orders.pop()
+        delivered_row = order_to_row(order)
+        self._persist(self.storage.append_delivered, delivered_row)
+        self._persist(self.storage.remove_pending, order["order_id"])
+        self._publish(ORDER_DELIVERED, order_ids=[order["order_id"]], rows=[delivered_row])
+        self._queue(self.customer_index, "deliver", order["order_id"], delivered_row)
+        return order
+
+    @timed("orders.deliver_batch")
+    def deliver_batch(self, limit=None, max_value=None, until=None):
+        # Deliver next N: the orders OrderTable.select picks (no limits = all),
+        # taken out of the queue in one pass, appended to the delivered store in
+        # one write and removed from pending with one journal append
+        order_ids = self.orders.select(limit, max_value, until)
+        if not order_ids:
+            return []
+        orders = self.orders.remove_many(order_ids)
+        delivered_rows = [order_to_row(order) for order in orders]
+        self._persist(self.storage.append_delivered_many, delivered_rows)
+        self._persist(self.storage.remove_pending_many, order_ids)
+        self._publish(ORDER_DELIVERED, order_ids=order_ids, rows=delivered_rows)
+        self._queue(self.customer_index, "deliver_many", order_ids, delivered_rows)
+        count("orders.batch_delivered", len(orders))
+        return orders
+
+    def cancel(self, order_id):
+        order = self.orders.remove(order_id)
+        self._persist(self.storage.remove_pending, order_id)
+        self._publish(ORDER_CANCELLED, order_ids=[order_id], rows=[order_to_row(order)])
+        self._queue(self.customer_index, "remove_pending", order_id)
+        return order
+
+    def take_plan(self, start_str, end_str):
+        # Today's Plan against this book's store (HTTP intake). The join takes
+        # the matched orders out of pending, so they leave the queue here too,
+        # as a cancel would; build_plan publishes ORDER_PLANNED
+        plan = build_plan(self.storage, start_str, end_str, events=self.events)
+        for item in plan:
+            order_id = item['Order ID']
+            if order_id in self.orders:
+                self.orders.remove(order_id)
+                self._queue(self.customer_index, "remove_pending", order_id)
+        return plan
+
+    def toggle_priority(self, order_id):
+        priority_flag = 1 - self.orders.get(order_id)["priority_flag"]
+        order = self.orders.set_priority(order_id, priority_flag)
+        self._persist(self.storage.update_pending, order_id, {"priority_flag": priority_flag})
+        self._publish(ORDER_PRIORITY, order_id=order_id, priority_flag=priority_flag,
+                      total_amount=order["total_amount"])
+        return order
+
+    def customers(self):
+        # One pass over pending, the delivered archive and the vendor orders,
+        # queued on first use; add/deliver/cancel queue their updates behind it,
+        # and other processes' changes are applied from the event log before each lookup
+        if self.customer_index is None:
+            self.customer_index = CustomerIndex()
+            self._persist(self._build_customers, self.customer_index, label="Indexing customers")
+        return self.customer_index
+
+    def _pending_copy(self):
+        # Pending orders for a build on the worker: read from the store, since
+        # the UI thread keeps changing self.orders meanwhile. Inline, the queue is used as it is
+        if self.io is None:
+            return self.orders
+        return self.storage.pending_table(track=False)[0]
+
+    def _build_customers(self, index):
+        # Events published before the store is read are already in it; the
+        # ones published during the read are sorted out by _apply_events
+        self._apply_events()
+        read = StoreRead(self._pending_copy(), self.storage.vendor_table())
+        with gc_paused():
+            index.build(read.pending.rows(), self.storage.delivered_rows(), read.vendor.items())
+        self._apply_events(index, read)
+
+    def finances(self):
+        # Full recompute queued on first use, then kept current from the event
+        # log, this book's own changes included (without an EventLog it stays
+        # as built). Read it through finance_summary()
+        if self.ledger is None:
+            self.ledger = Ledger()
+            self._persist(self._build_ledger, self.ledger, label="Building dashboard")
+        return self.ledger
+
+    def _build_ledger(self, ledger):
+        self._apply_events()
+        read = StoreRead(self._pending_copy(), self.storage.vendor_table())
+        with gc_paused():
+            ledger.rebuild(read.pending, self.storage.delivered_rows(), read.vendor)
+        self._apply_events(ledger, read)
+
+    def _summary(self, top, days):
+        self._apply_events()
+        return self.ledger.summary(top, days)
+
+    def finance_summary(self, on_done, top=10, days=14):
+        # on_done(Ledger.summary()) on the UI thread
+        self.finances()
+        self._persist(self._summary, top, days, on_done=on_done)
+
+    def _apply_events(self, built=None, read=None):
+        # Worker side: the events published since the last call, by any
+        # process. The ledger takes them all; the index takes the vendor
+        # changes and the order changes of other processes (this book updates
+        # it directly). The follower is opened by the first call, which a
+        # build makes before reading the store. built: the view just rebuilt
+        # from read (a StoreRead), which skips the events that read holds
+        if self.events is None:
+            return
+        if self._follower is None:
+            self._follower = self.events.follow()
+            return
+        pid = os.getpid()
+        for event in self._follower.poll():
+            held = built is not None and read.holds(event)
+            if self.ledger is not None and not (held and built is self.ledger):
+                self.ledger.apply_event(event)
+            if self.customer_index is not None:
+                self.customer_index.apply_event(event, own=event.get("pid") == pid,
+                                                held=held and built is self.customer_index)
+
+    def _lookup(self, query):
+        self._apply_events()
+        return self.customer_index.lookup(query)
+
+    def lookup_customer(self, query, on_done):
+        # on_done(summary) on the UI thread, pending orders read from self.orders
+        self.customers()
+        self._persist(self._lookup, query,
+                      on_done=lambda summary: on_done(with_pending(summary, self.orders)))
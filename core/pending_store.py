@@ -0,0 +1,424 @@
+# Pending order store: pending.csv is a snapshot and every add/remove/update
+# is appended to a journal next to it. Readers replay snapshot + journal, and
+# a compactor folds the journal back into a fresh snapshot once it grows past
+# a threshold. The snapshot is only ever replaced with os.replace, so a crash
+# at any point leaves either the old or the new snapshot plus its journal.
+# pending.csv.snap is a binary copy of the loaded table (core/snapshot.py) for
+# warm starts, written on clean exit and by the background compactor; it
+# records which pending.csv and journal it mirrors and is ignored otherwise.
+import csv
+import json
+import os
+import threading
+from contextlib import contextmanager
+from .snapshot import file_stamp, open_snapshot
+from .instrumentation import STATS, count, timed
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+COUNTER_FILE = "order_counter.txt"
+FIELDNAMES = ["order_date", "name", "customer_id", "address", "phone_number",
+              "product_id", "order", "total_amount", "advance_paid", "priority_flag", "order_id"]
+FIELD_COUNT = len(FIELDNAMES)
+FIELD_INDEX = {field: index for index, field in enumerate(FIELDNAMES)}
+ID_INDEX = FIELD_INDEX["order_id"]
+COMPACT_THRESHOLD = 256 * 1024  # journal bytes
+
+
+def order_to_row(order):
+    row = {field: str(order[field]) for field in FIELDNAMES}
+    row["order_date"] = order["order_date"].strftime("%Y-%m-%d")
+    return row
+
+
+@contextmanager
+def _file_lock(f):
+    # Exclusive lock on an open file, held against other processes too
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PendingStore:
+    def __init__(self, snapshot_path, counter_path=COUNTER_FILE, compact_threshold=COMPACT_THRESHOLD):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal"
+        self.compacting_path = snapshot_path + ".journal.compacting"
+        self.warm_path = snapshot_path + ".snap"
+        self.counter_path = counter_path
+        self.compact_threshold = compact_threshold
+        self.lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+        self._seen = None  # file stamps as of this process's last load or write
+        self._foreign = False  # another process wrote since the table was loaded
+        self._counter = self._load_counter()  # this process's last known value; the file is the authority
+        self._migrate_ids()
+
+    # ----- Order IDs -----
+    def _load_counter(self):
+        try:
+            with open(self.counter_path, encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _advance(self, count, floor=0):
+        # Takes count IDs from the counter file, reread and written back under
+        # a lock on the file, so processes sharing the store (the windows,
+        # cms.py, the HTTP intake) never hand out the same ID. The counter is
+        # first moved up to floor. Returns the first ID taken
+        with self.lock, open(self.counter_path, 'a+', encoding='utf-8') as f:
+            with _file_lock(f):
+                f.seek(0)
+                try:
+                    stored = int(f.read().strip() or 0)
+                except ValueError:
+                    stored = 0
+                first = max(stored, self._counter, floor)
+                self._counter = first + count
+                if self._counter != stored:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(str(self._counter))
+                    f.flush()
+        return first
+
+    @property
+    def counter(self):
+        return max(self._load_counter(), self._counter)
+
+    def next_id(self):
+        return self._advance(1)
+
+    def reserve_ids(self, count):
+        # A block of consecutive IDs with one counter write (bulk import)
+        first = self._advance(count)
+        return range(first, first + count)
+
+    def _seen_ids(self, max_id):
+        # Keep the counter ahead of IDs written by other processes
+        if max_id >= self._counter:
+            self._advance(0, max_id + 1)
+
+    def _migrate_ids(self):
+        # Older pending.csv files have no order_id column; assign IDs once
+        if not os.path.isfile(self.snapshot_path):
+            return
+        with open(self.snapshot_path, newline='', encoding='utf-8') as f:
+            header = next(csv.reader(f), [])
+        if not header or "order_id" in header:
+            return
+        rows = list(self.rows())
+        for row in rows:
+            if not row.get("order_id"):
+                row["order_id"] = str(self._counter)
+                self._counter += 1
+        self._advance(0)
+        self.rewrite(rows)
+
+    # ----- Writes -----
+    @timed("pending.journal_append")
+    def _append(self, records):
+        with self.lock:
+            self._check_seen()
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._update_seen()
+            size = os.path.getsize(self.journal_path)
+        count("pending.journal_records", len(records))
+        if size >= self.compact_threshold:
+            self.compact_in_background()
+
+    def add(self, row):
+        self.add_many([row])
+
+    def add_many(self, rows):
+        self._append([{"op": "add", "row": row} for row in rows])
+
+    def remove(self, order_id):
+        self.remove_many([order_id])
+
+    def remove_many(self, order_ids):
+        self._append([{"op": "del", "id": str(order_id)} for order_id in order_ids])
+
+    def update(self, order_id, fields):
+        self._append([{"op": "upd", "id": str(order_id),
+                       "fields": {k: str(v) for k, v in fields.items()}}])
+
+    # ----- Replay -----
+    def _read_journal(self, path, added, removed, updates, offset=0):
+        if not os.path.isfile(path):
+            return
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash mid-append
+                op = record.get("op")
+                if op == "add":
+                    row = record["row"]
+                    added[row["order_id"]] = row
+                    removed.discard(row["order_id"])
+                elif op == "del":
+                    order_id = record["id"]
+                    if added.pop(order_id, None) is None:
+                        removed.add(order_id)
+                    updates.pop(order_id, None)
+                elif op == "upd":
+                    order_id = record["id"]
+                    if order_id in added:
+                        added[order_id].update(record["fields"])
+                    else:
+                        updates.setdefault(order_id, {}).update(record["fields"])
+
+    def scan(self, include_active=True):
+        # Yields every live order as a list in FIELDNAMES order. Journals are
+        # read first (they are small); the snapshot is streamed
+        if STATS.enabled:
+            count("pending.bytes_read", sum(os.path.getsize(path) for path in
+                                            (self.snapshot_path, self.compacting_path, self.journal_path)
+                                            if os.path.isfile(path)))
+        added, removed, updates = {}, set(), {}
+        self._read_journal(self.compacting_path, added, removed, updates)
+        if include_active:
+            self._read_journal(self.journal_path, added, removed, updates)
+        # A snapshot row that is also in the journal was folded in by a
+        # compaction that crashed before clearing its journal; the journal wins
+        skip = removed | added.keys()
+        last_id = ""
+        if os.path.isfile(self.snapshot_path):
+            with open(self.snapshot_path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                header = next(reader, [])
+                remap = None
+                if header != FIELDNAMES:
+                    remap = [header.index(field) if field in header else None for field in FIELDNAMES]
+                for values in reader:
+                    if remap is not None:
+                        values = [values[i] if i is not None and i < len(values) else '' for i in remap]
+                    elif len(values) != FIELD_COUNT:
+                        if not values:
+                            continue
+                        values = (values + [''] * FIELD_COUNT)[:FIELD_COUNT]
+                    if skip or updates:
+                        order_id = values[ID_INDEX]
+                        if order_id in skip:
+                            continue
+                        if order_id in updates:
+                            for field, value in updates[order_id].items():
+                                if field in FIELD_INDEX:
+                                    values[FIELD_INDEX[field]] = value
+                    last_id = values[ID_INDEX]
+                    yield values
+                count("pending.rows_read", reader.line_num - 1)
+        max_id = int(last_id) if last_id.isdigit() else -1
+        for order_id, row in added.items():
+            if order_id.isdigit():
+                max_id = max(max_id, int(order_id))
+            yield [row.get(field, '') for field in FIELDNAMES]
+        # IDs are appended in counter order, so the last snapshot row carries the max
+        self._seen_ids(max_id)
+
+    def rows(self, include_active=True):
+        for values in self.scan(include_active):
+            yield dict(zip(FIELDNAMES, values))
+
+    # ----- Compaction -----
+    @timed("pending.write_snapshot")
+    def _write_snapshot(self, records, table=None):
+        # records: lists in FIELDNAMES order. Written to a temp file, whose path
+        # is returned for the caller to rename into place. With table, the
+        # records are loaded into it in the same pass
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDNAMES)
+            if table is None:
+                writer.writerows(records)
+            else:
+                table.load(_written(writer, records), freeze=False)
+            f.flush()
+            os.fsync(f.fileno())
+            count("pending.bytes_written", f.tell())
+        return tmp_path
+
+    def rewrite(self, rows):
+        # Replace the whole store with rows and drop both journals
+        with self._compact_lock, self.lock:
+            self._check_seen()
+            os.replace(self._write_snapshot([row.get(field, '') for field in FIELDNAMES] for row in rows),
+                       self.snapshot_path)
+            for path in (self.compacting_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._update_seen()
+
+    @timed("pending.compact")
+    def compact(self, keep=None, warm=False):
+        # keep(row) -> bool lets callers drop rows in the same streaming pass.
+        # warm=True also writes the warm-start snapshot, from a table filled
+        # while the CSV is written (memory for every pending order, so the
+        # streaming plan join leaves it off)
+        table = None
+        if warm:
+            from .order_table import OrderTable  # order_table imports this module
+            table = OrderTable()
+        with self._compact_lock:
+            with self.lock:
+                self._check_seen()
+                if os.path.exists(self.journal_path):
+                    if os.path.exists(self.compacting_path):
+                        # Leftover from an interrupted compaction: fold both
+                        with open(self.journal_path, encoding='utf-8') as src, \
+                                open(self.compacting_path, 'a', encoding='utf-8') as dst:
+                            dst.write(src.read())
+                        os.remove(self.journal_path)
+                    else:
+                        os.replace(self.journal_path, self.compacting_path)
+                self._update_seen()
+            records = self.scan(include_active=False)
+            if keep is not None:
+                records = (values for values in records if keep(dict(zip(FIELDNAMES, values))))
+            tmp_path = self._write_snapshot(records, table)
+            with self.lock:
+                self._check_seen()
+                os.replace(tmp_path, self.snapshot_path)
+                if os.path.exists(self.compacting_path):
+                    os.remove(self.compacting_path)
+                self._update_seen()
+                stamp = file_stamp(self.snapshot_path)
+            if table is not None:
+                # The journal started by this compaction holds everything since
+                table.save_snapshot(self.warm_path, {"csv": stamp, "compacting": None, "journal": None})
+
+    def compact_in_background(self):
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, kwargs={"warm": True}, daemon=True)
+        self._compactor.start()
+
+    def wait_for_compaction(self):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    # ----- Warm start -----
+    def _stamps(self):
+        return {"csv": file_stamp(self.snapshot_path), "compacting": file_stamp(self.compacting_path),
+                "journal": file_stamp(self.journal_path)}
+
+    def _check_seen(self):
+        # Caller holds self.lock, before writing: any change since this
+        # process last loaded or wrote came from another process
+        if self._seen is not None and self._stamps() != self._seen:
+            self._foreign = True
+
+    def _update_seen(self):
+        # Caller holds self.lock, after writing
+        if self._seen is not None:
+            self._seen = self._stamps()
+
+    def _journal_offset(self, meta, stamps):
+        # Where the journal records not yet in the warm snapshot start, or None
+        # if the snapshot does not mirror the current pending.csv
+        if meta.get("csv") is None or meta.get("csv") != stamps["csv"] \
+                or meta.get("compacting") != stamps["compacting"]:
+            return None
+        journal = meta.get("journal")
+        if journal is None:
+            return 0
+        current = stamps["journal"]
+        if current is None or current[:2] != journal[:2] or current[2] < journal[2]:
+            return None
+        return journal[2]
+
+    @timed("pending.load_table")
+    def load_table(self, track=True):
+        # The pending orders as an OrderTable plus load stats: the warm snapshot
+        # and the journal written since when they match the files, otherwise a
+        # full read of pending.csv and its journals. track=False for a copy
+        # that save_table() will never be asked to write (a dashboard rebuild)
+        from .order_table import OrderTable  # order_table imports this module
+        with self.lock:
+            stamps = self._stamps()
+        table = OrderTable()
+        stats = self._load_warm(table, stamps)
+        if stats is None:
+            table = OrderTable()
+            stats = table.load(self.scan())
+            stats["source"] = "csv"
+        if track:
+            with self.lock:
+                self._seen, self._foreign = stamps, False
+        return table, stats
+
+    def _load_warm(self, table, stamps):
+        # Fills table from the warm snapshot plus the journal tail and returns
+        # the load stats, or None if the snapshot cannot be used
+        snapshot = open_snapshot(self.warm_path)
+        if snapshot is None:
+            return None
+        offset = self._journal_offset(snapshot.meta, stamps)
+        if offset is None:
+            count("pending.warm_stale")
+            return None
+        added, removed, updates = {}, set(), {}
+        self._read_journal(self.journal_path, added, removed, updates, offset)
+        if any(field != "priority_flag" for fields in updates.values() for field in fields):
+            return None  # only priority changes are replayed onto the table
+        try:
+            stats = table.load_snapshot(snapshot)
+        except (KeyError, ValueError) as e:
+            print("Ignoring snapshot:", self.warm_path, e)
+            return None
+        ids = [int(order_id) for order_id in removed.union(added) if order_id.isdigit()]
+        table.remove_many([order_id for order_id in ids if order_id in table])
+        for order_id, fields in updates.items():
+            if order_id.isdigit() and int(order_id) in table:
+                table.set_priority(int(order_id), int(fields["priority_flag"]))
+        if added:
+            table.load([row.get(field, '') for field in FIELDNAMES] for row in added.values())
+        self._seen_ids(table.max_order_id())
+        count("pending.journal_replayed", len(added) + len(removed) + len(updates))
+        stats.update(rows=len(table), source="snapshot")
+        return stats
+
+    @timed("pending.save_warm")
+    def save_table(self, table):
+        # Warm snapshot of table, which holds what this process loaded plus its
+        # own writes. Skipped (False) if another process has written since
+        with self.lock:
+            stamps = self._stamps()
+            if self._seen is None or self._foreign or stamps != self._seen:
+                return False
+            journal = stamps["journal"]
+            return table.save_snapshot(self.warm_path, {"csv": stamps["csv"], "compacting": stamps["compacting"],
+                                                        "journal": journal and journal[:3]})
+
+
+def _written(writer, records):
+    # records, each written to the CSV as it passes
+    for values in records:
+        writer.writerow(values)
+        yield values
@@ -0,0 +1,204 @@
+# Today's Plan: date windows and the dispatch list built from the streaming
+# join in storage.take_dispatch_ready, and LivePlan, which keeps it current
+# from the change events. Used by TodaysPlanApp and by the command line, no
+# GUI imports.
+from datetime import date, timedelta
+from .events import (ORDER_ADDED, ORDER_DELIVERED, ORDER_CANCELLED, ORDER_PLANNED, ORDER_PRIORITY,
+                     VENDOR_ADDED, VENDOR_STATUS, VENDOR_DELETED)
+from .vendor_store import VENDOR_FIELDS, STATUS_INDEX
+from .instrumentation import count, timed
+
+PLAN_WINDOWS = ["Today", "Last N days", "Custom range"]
+PLAN_COLUMNS = ['Customer ID', 'Product ID', 'Customer Name', 'Phone Number', 'Address',
+                'Order Date', 'Product Name', 'Quantity', 'Total Amount', 'Vendor Delivered Date']
+CUSTOMER_INDEX = VENDOR_FIELDS.index('Customer ID')
+PRODUCT_INDEX = VENDOR_FIELDS.index('Product ID')
+DELIVERED_DATE_INDEX = VENDOR_FIELDS.index('Vendor Delivered Date')
+
+
+def plan_window(mode, days=1, start=None, end=None, today=None):
+    # (start_str, end_str) for a window mode, or None if the window is invalid
+    today = today or date.today()
+    if mode == "Last N days":
+        try:
+            days = int(days)
+        except (TypeError, ValueError):
+            return None
+        if days < 1:
+            return None
+        start, end = today - timedelta(days=days - 1), today
+    elif mode == "Custom range":
+        if start is None or end is None or start > end:
+            return None
+    else:
+        start = end = today
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def plan_item(row, delivered_date):
+    # One Today's Plan entry from a pending row (FIELDNAMES strings)
+    return {
+        'Order ID': int(row['order_id']),
+        'Customer ID': row['customer_id'].strip(),
+        'Product ID': row['product_id'].strip(),
+        'Customer Name': row['name'].strip(),
+        'Phone Number': row['phone_number'].strip(),
+        'Address': row['address'].strip(),
+        'Order Date': row['order_date'].strip(),
+        'Product Name': row['order'].strip(),
+        'Quantity': '1',
+        'Total Amount': float(row['total_amount']) if row['total_amount'] else 0,
+        'Vendor Delivered Date': delivered_date,
+        'Priority': 'High' if str(row['priority_flag']).strip() == '0' else 'Normal'
+    }
+
+
+def publish_planned(events, rows):
+    # ORDER_PLANNED for pending rows taken out by a join
+    if events is not None and rows:
+        events.publish(ORDER_PLANNED, order_ids=[int(row['order_id']) for row in rows], rows=rows)
+
+
+def build_plan(storage, start_str, end_str, existing=(), events=None, kept=None):
+    # Dispatch-ready orders in the window, highest Total Amount first. Matched
+    # orders leave the pending store in the same streaming pass, including the
+    # ones already shown (existing: (Customer ID, Product ID) pairs), and are
+    # published to events (an EventLog) when given. kept(row) sees the rest
+    plan = []
+    matched = storage.take_dispatch_ready(start_str, end_str, kept)
+    for row, delivered_date in matched:
+        if (row['customer_id'].strip(), row['product_id'].strip()) in existing:
+            continue
+        plan.append(plan_item(row, delivered_date))
+    publish_planned(events, [row for row, _ in matched])
+    plan.sort(key=lambda x: x['Total Amount'], reverse=True)
+    return plan
+
+
+def plan_values(plan):
+    # Row values in PLAN_COLUMNS order, as shown in the Treeview
+    return tuple(f"{plan[c]:.2f}" if c == 'Total Amount' else plan[c] for c in PLAN_COLUMNS)
+
+
+class LivePlan:
+    # Today's Plan for one window, kept current from the change events after
+    # the first join: a vendor row turning Delivered in the window takes the
+    # pending orders of its (Customer ID, Product ID) pair, and an order added
+    # for a pair that is already delivered is taken as it arrives. The stores
+    # are read once, in load(); each event after that is a few dict updates.
+    # Runs on the I/O worker: load() and poll() both write to pending
+    def __init__(self, storage, events, start_str, end_str):
+        self.storage = storage
+        self.events = events  # EventLog: followed for changes, and told which orders were taken
+        self.start_str = start_str
+        self.end_str = end_str
+        self.follower = events.follow()  # opened before load(), so nothing published meanwhile is missed
+        self.pending = {}    # (customer_id, product_id) -> {order_id: pending row}
+        self.key_of = {}     # order_id -> (customer_id, product_id), for the pending orders
+        self.delivered = {}  # pair -> [Delivered vendor rows in the window, latest delivered date]
+        self.shown = set()   # pairs in the plan
+        self.planned = set()  # order IDs in the plan
+
+    @timed("plan.live_load")
+    def load(self, existing=()):
+        # The streaming join, which indexes the pending orders it leaves by
+        # pair as it goes, then the vendor rows delivered in the window.
+        # Returns the plan
+        plan = build_plan(self.storage, self.start_str, self.end_str, existing, self.events,
+                          kept=self._add_pending)
+        self.shown = set(existing)
+        for item in plan:
+            self.shown.add((item['Customer ID'], item['Product ID']))
+            self.planned.add(item['Order ID'])
+        for _, values in self.storage.vendor_orders():
+            self._vendor_changed(None, values)
+        return plan
+
+    def close(self):
+        self.follower.close()
+
+    def _add_pending(self, row):
+        key = (row['customer_id'].strip(), row['product_id'].strip())
+        order_id = int(row['order_id'])
+        self.pending.setdefault(key, {})[order_id] = row
+        self.key_of[order_id] = key
+        return key
+
+    def _drop_pending(self, order_id):
+        key = self.key_of.pop(order_id, None)
+        if key is not None:
+            rows = self.pending[key]
+            del rows[order_id]
+            if not rows:
+                del self.pending[key]
+
+    def _vendor_changed(self, old_values, new_values):
+        # Counts the Delivered vendor rows in the window per pair (old / new:
+        # the row before and after, None when added / deleted). Returns the
+        # pair when the new row is one of them
+        key = None
+        for values, sign in ((old_values, -1), (new_values, 1)):
+            if values is None or values[STATUS_INDEX].strip().lower() != 'delivered':
+                continue
+            delivered_date = values[DELIVERED_DATE_INDEX].strip()
+            if not self.start_str <= delivered_date <= self.end_str:
+                continue
+            pair = (values[CUSTOMER_INDEX].strip(), values[PRODUCT_INDEX].strip())
+            entry = self.delivered.setdefault(pair, [0, ''])
+            entry[0] += sign
+            if sign > 0:
+                entry[1] = max(entry[1], delivered_date)
+                key = pair
+            elif entry[0] <= 0:
+                del self.delivered[pair]
+        return key
+
+    def _take(self, key):
+        rows = self.pending.pop(key, {})
+        for order_id in rows:
+            del self.key_of[order_id]
+        delivered_date = self.delivered[key][1]
+        return [(row, delivered_date) for row in rows.values()]
+
+    @timed("plan.live_poll")
+    def poll(self):
+        # Applies the events published since the last call. Returns (new plan
+        # items, IDs of planned orders delivered or cancelled elsewhere)
+        taken, removed = [], []
+        for event in self.follower.poll():
+            kind = event.get("type")
+            if kind == ORDER_ADDED:
+                for row in event["rows"]:
+                    key = self._add_pending(row)
+                    if key in self.delivered:
+                        taken += self._take(key)
+            elif kind in (ORDER_DELIVERED, ORDER_CANCELLED, ORDER_PLANNED):
+                for order_id in event["order_ids"]:
+                    self._drop_pending(order_id)
+                    if kind != ORDER_PLANNED and order_id in self.planned:
+                        self.planned.discard(order_id)
+                        removed.append(order_id)
+            elif kind == ORDER_PRIORITY:
+                key = self.key_of.get(event["order_id"])
+                if key is not None:
+                    self.pending[key][event["order_id"]]['priority_flag'] = str(event["priority_flag"])
+            elif kind in (VENDOR_ADDED, VENDOR_STATUS, VENDOR_DELETED):
+                key = self._vendor_changed(event.get("old"), event.get("new"))
+                if key is not None:
+                    taken += self._take(key)
+        if not taken:
+            return [], removed
+
+        # Taken orders leave pending as in the join, the ones for pairs already
+        # shown included
+        order_ids = [int(row['order_id']) for row, _ in taken]
+        self.storage.remove_pending_many(order_ids)
+        publish_planned(self.events, [row for row, _ in taken])
+        items = [plan_item(row, delivered_date) for row, delivered_date in taken]
+        items = [item for item in items if (item['Customer ID'], item['Product ID']) not in self.shown]
+        for item in items:
+            self.shown.add((item['Customer ID'], item['Product ID']))
+            self.planned.add(item['Order ID'])
+        items.sort(key=lambda x: x['Total Amount'], reverse=True)
+        count("plan.live_taken", len(order_ids))
+        return items, removed
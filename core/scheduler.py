@@ -0,0 +1,160 @@
+# Dispatch scheduler: turns Today's Plan into a run sheet. Orders are grouped
+# by locality (the area part of the address, or the city with
+# CMS_LOCALITY=city), each locality is cut into
+# vehicle runs of at most `stops` orders, and localities too small to fill a
+# run share a vehicle (first-fit, largest first). Runs carrying High-priority
+# orders are sent out first; runs are then given to the day's slots, `vehicles`
+# at a time, and whatever does not fit in the day is deferred. A live plan is
+# kept current between full schedules with add_to_runs / remove_from_run. Used
+# by TodaysPlanApp, the command line and the HTTP intake, no GUI imports.
+import os
+import re
+from collections import defaultdict
+from .order_rules import OrderError
+from .instrumentation import timed
+
+DEFAULT_STOPS = 12      # orders one vehicle / crew delivers per run
+DEFAULT_VEHICLES = 2    # runs going out in each slot
+DEFAULT_SLOTS = ["09:00-13:00", "14:00-18:00"]
+DEFERRED_SLOT = "Next day"
+RUN_COLUMNS = ['Run', 'Slot', 'Vehicle', 'Locality', 'Stop', 'Priority']
+LOCALITY_LEVEL = os.environ.get("CMS_LOCALITY", "area").lower()
+
+_NOISE = re.compile(r"[^a-z ]+")
+
+
+def _tokens(address):
+    # Comma-separated address parts, lower case, without door numbers and PIN codes
+    parts = (" ".join(_NOISE.sub(" ", part.lower()).split()) for part in str(address).split(","))
+    return [part for part in parts if part]
+
+
+def locality(address, level=None):
+    # The part before the city ("12, Anna Salai, T Nagar, Chennai 600017" ->
+    # "T Nagar"), or the city itself for level "city" and one-part addresses
+    parts = _tokens(address)
+    if not parts:
+        return "Unknown"
+    if (level or LOCALITY_LEVEL) == "city" or len(parts) == 1:
+        return parts[-1].title()
+    return parts[-2].title()
+
+
+def _street(address):
+    # The part before the area, if the address has one
+    parts = _tokens(address)
+    return parts[-3] if len(parts) > 2 else ""
+
+
+def parse_capacity(stops="", vehicles="", slots=""):
+    # Capacity from raw strings (Today's Plan window, cms.py plan); blank = default.
+    # slots: comma-separated slot names. Returns (stops, vehicles, slots)
+    stops, vehicles = str(stops or "").strip(), str(vehicles or "").strip()
+    try:
+        stops = int(stops) if stops else DEFAULT_STOPS
+        vehicles = int(vehicles) if vehicles else DEFAULT_VEHICLES
+    except ValueError:
+        raise OrderError("Format Error", "Stops per run and vehicles must be whole numbers.")
+    if stops < 1 or vehicles < 1:
+        raise OrderError("Format Error", "Stops per run and vehicles must be positive.")
+    if slots is None or isinstance(slots, str):
+        slots = (slots or "").split(",")
+    slots = [str(slot).strip() for slot in slots if str(slot).strip()] or list(DEFAULT_SLOTS)
+    return stops, vehicles, slots
+
+
+def _stop_order(item):
+    # High first, then street by street, larger orders first
+    return item['Priority'] != 'High', _street(item['Address']), -item['Total Amount']
+
+
+@timed("scheduler.schedule")
+def schedule(plan, stops=DEFAULT_STOPS, vehicles=DEFAULT_VEHICLES, slots=DEFAULT_SLOTS, level=None):
+    # plan: items from build_plan. Returns the run sheet: runs in dispatch order,
+    # each {"run", "slot", "vehicle", "localities", "stops": [plan items], "value",
+    # "high"}; runs past the day's capacity get slot DEFERRED_SLOT and vehicle None.
+    # level: "area" or "city" (default LOCALITY_LEVEL)
+    by_area = defaultdict(list)
+    for item in plan:
+        by_area[locality(item['Address'], level)].append(item)
+
+    loads = []      # (localities, items) per run
+    leftovers = []  # (area, items) smaller than one run
+    for area, items in by_area.items():
+        items.sort(key=_stop_order)
+        full = len(items) - len(items) % stops
+        for start in range(0, full, stops):
+            loads.append(([area], items[start:start + stops]))
+        if full < len(items):
+            leftovers.append((area, items[full:]))
+
+    # First-fit decreasing: small localities fill shared vehicles whole
+    shared = []
+    leftovers.sort(key=lambda leftover: -len(leftover[1]))
+    for area, items in leftovers:
+        for areas, load in shared:
+            if len(load) + len(items) <= stops:
+                areas.append(area)
+                load.extend(items)
+                break
+        else:
+            shared.append(([area], list(items)))
+    for areas, load in shared:
+        load.sort(key=_stop_order)
+    loads += shared
+
+    runs = []
+    for areas, load in loads:
+        run = {"localities": areas, "stops": load}
+        _run_totals(run)
+        runs.append(run)
+    runs.sort(key=lambda run: (run["high"] == 0, -run["high"], -run["value"]))
+    for number, run in enumerate(runs):
+        _assign(run, number, vehicles, slots)
+    return runs
+
+
+def _run_totals(run):
+    run["high"] = sum(1 for item in run["stops"] if item['Priority'] == 'High')
+    run["value"] = sum(item['Total Amount'] for item in run["stops"])
+
+
+def _assign(run, number, vehicles, slots):
+    # Run number, slot and vehicle for the run in dispatch position `number`
+    run["run"] = number + 1
+    if number < vehicles * len(slots):
+        run["slot"], run["vehicle"] = slots[number // vehicles], number % vehicles + 1
+    else:
+        run["slot"], run["vehicle"] = DEFERRED_SLOT, None
+
+
+def add_to_runs(runs, item, stops=DEFAULT_STOPS, vehicles=DEFAULT_VEHICLES, slots=DEFAULT_SLOTS, level=None):
+    # One plan item into runs from schedule(), without moving the others: it
+    # joins the first run of its locality with a stop to spare, or starts a
+    # run after the last one. Returns the run it is in
+    area = locality(item['Address'], level)
+    for run in runs:
+        if area in run["localities"] and len(run["stops"]) < stops:
+            run["stops"].append(item)
+            run["stops"].sort(key=_stop_order)
+            _run_totals(run)
+            return run
+    run = {"localities": [area], "stops": [item]}
+    _run_totals(run)
+    _assign(run, len(runs), vehicles, slots)
+    runs.append(run)
+    return run
+
+
+def remove_from_run(run, item):
+    # An emptied run keeps its number, so the runs after it do not move
+    run["stops"].remove(item)
+    _run_totals(run)
+
+
+def run_sheet_rows(runs, plan_values):
+    # (RUN_COLUMNS values + plan_values(item)) per stop, in dispatch order
+    for run in runs:
+        area = " / ".join(run["localities"])
+        for stop, item in enumerate(run["stops"], 1):
+            yield (run["run"], run["slot"], run["vehicle"] or "-", area, stop, item['Priority']) + plan_values(item)
@@ -0,0 +1,129 @@
+# In-memory customer search index shared by the vendor table (app2) and the
+# Today's Plan table (app3). Kept up to date on add/update/delete so a search
+# never walks the Treeview:
+#   exact     - hash maps on customer ID and on name
+#   prefix    - sorted (term, key) list searched with bisect
+#   substring - NGRAM-char gram postings intersected, then verified; shorter
+#               queries are left to the prefix list
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import lru_cache
+from .instrumentation import timed
+
+NGRAM = 3
+
+
+@lru_cache(maxsize=65536)
+def normalize(text):
+    return " ".join(str(text).lower().split())
+
+
+@lru_cache(maxsize=65536)
+def ngrams(term, size):
+    # Shared frozensets: names repeat across rows
+    return frozenset(term[i:i + size] for i in range(len(term) - size + 1))
+
+
+class SearchIndex:
+    def __init__(self):
+        self._docs = {}                   # key -> (name, customer_id), normalized
+        self._exact = defaultdict(set)    # name or customer_id -> keys
+        self._terms = []                  # sorted [(term, key)] for prefix queries
+        self._grams = defaultdict(set)    # n-gram of a name -> keys
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _insert(self, key, name, customer_id, sorted_insert):
+        name, customer_id = normalize(name), normalize(customer_id)
+        self._docs[key] = (name, customer_id)
+        for term in {name, customer_id}:
+            if term:
+                self._exact[term].add(key)
+                if sorted_insert:
+                    insort(self._terms, (term, key))
+                else:
+                    self._terms.append((term, key))
+        for gram in ngrams(name, NGRAM):
+            self._grams[gram].add(key)
+
+    def add(self, key, name, customer_id):
+        if key in self._docs:
+            self.remove(key)
+        self._insert(key, name, customer_id, sorted_insert=True)
+
+    @timed("search.build")
+    def build(self, items):
+        # items: iterable of (key, name, customer_id); one sort instead of n insorts
+        self.clear()
+        for key, name, customer_id in items:
+            self._insert(key, name, customer_id, sorted_insert=False)
+        self._terms.sort()
+
+    def update(self, key, name, customer_id):
+        self.add(key, name, customer_id)
+
+    def remove(self, key):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        name, customer_id = doc
+        for term in {name, customer_id}:
+            if not term:
+                continue
+            keys = self._exact[term]
+            keys.discard(key)
+            if not keys:
+                del self._exact[term]
+            index = bisect_left(self._terms, (term, key))
+            if index < len(self._terms) and self._terms[index] == (term, key):
+                del self._terms[index]
+        for gram in ngrams(name, NGRAM):
+            keys = self._grams[gram]
+            keys.discard(key)
+            if not keys:
+                del self._grams[gram]
+
+    def clear(self):
+        self.__init__()
+
+    def exact(self, text):
+        return set(self._exact.get(normalize(text), ()))
+
+    def prefix(self, text):
+        text = normalize(text)
+        if not text:
+            return []
+        keys = []
+        index = bisect_left(self._terms, (text,))
+        while index < len(self._terms) and self._terms[index][0].startswith(text):
+            keys.append(self._terms[index][1])
+            index += 1
+        return keys
+
+    def substring(self, text):
+        text = normalize(text)
+        if len(text) < NGRAM:
+            return set()
+        if len(text) == NGRAM:
+            return set(self._grams.get(text, ()))
+        postings = sorted((self._grams.get(g, set()) for g in ngrams(text, NGRAM)), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                break
+        return {key for key in candidates if text in self._docs[key][0]}
+
+    @timed("search.query")
+    def search(self, text):
+        # All matches, best first: exact, then prefix, then substring
+        results = []
+        seen = set()
+        # Keys sort natively: vendor IDs are ints, Treeview iids strings
+        for keys in (sorted(self.exact(text)), self.prefix(text), sorted(self.substring(text))):
+            for key in keys:
+                if key not in seen:
+                    seen.add(key)
+                    results.append(key)
+        return results
@@ -0,0 +1,262 @@
+# Binary snapshot files for warm starts (pending.csv.snap, orders_export.csv.snap).
+# A snapshot holds one table column by column: numeric columns as raw typed
+# arrays, text columns as 4-byte IDs into one shared string table, and sort
+# keys as fixed-width big-endian integers. The file is opened with mmap, so
+# startup copies the numeric columns out with one memcpy each and text is only
+# decoded when a cell is read. The CSV files stay the format of record; a
+# snapshot says which CSV state it mirrors (meta) and is ignored when that no
+# longer matches.
+#   MAGIC | header length (8 bytes) | header JSON | sections, 8-byte aligned
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from .instrumentation import count, timed
+
+MAGIC = b"CMSSNAP1"
+ALIGN = 8
+_MISSING = object()
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def file_stamp(path):
+    # Identifies one version of a file: replaced files get a new inode,
+    # appended ones a new size and mtime. None when the file does not exist
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+class StringTable:
+    # Strings decoded from the mapping on first use, then shared
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+        self._strings = [None] * (len(offsets) - 1)
+
+    def __len__(self):
+        return len(self._strings)
+
+    def __getitem__(self, index):
+        text = self._strings[index]
+        if text is None:
+            text = self._strings[index] = sys.intern(
+                str(self._blob[self._offsets[index]:self._offsets[index + 1]], "utf-8"))
+        return text
+
+
+class TextColumn:
+    # A text column read from a snapshot. Cells are decoded on access; writes
+    # and appended cells are kept beside the mapped IDs, so the column behaves
+    # like the list of strings it replaces
+    __slots__ = ("_ids", "_strings", "_changed", "_tail")
+
+    def __init__(self, ids, strings):
+        self._ids = ids
+        self._strings = strings
+        self._changed = {}
+        self._tail = []
+
+    def __len__(self):
+        return len(self._ids) + len(self._tail)
+
+    def __getitem__(self, slot):
+        base = len(self._ids)
+        if slot >= base:
+            return self._tail[slot - base]
+        if slot < 0:
+            return self[slot + len(self)]
+        value = self._changed.get(slot, _MISSING)
+        return self._strings[self._ids[slot]] if value is _MISSING else value
+
+    def __setitem__(self, slot, value):
+        base = len(self._ids)
+        if slot >= base:
+            self._tail[slot - base] = value
+        elif 0 <= slot:
+            self._changed[slot] = value
+        else:
+            self[slot + len(self)] = value
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    def append(self, value):
+        self._tail.append(value)
+
+    def extend(self, values):
+        self._tail.extend(values)
+
+    def copy(self):
+        column = TextColumn(self._ids, self._strings)
+        column._changed = dict(self._changed)
+        column._tail = list(self._tail)
+        return column
+
+
+class PackedInts:
+    # Read-only sequence of ints stored big-endian (two's complement), width bytes each
+    __slots__ = ("_data", "_width")
+
+    def __init__(self, data, width):
+        self._data = data
+        self._width = width
+
+    def __len__(self):
+        return len(self._data) // self._width
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self._decode(start, max(start, stop)))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("packed int index out of range")
+        start = index * self._width
+        return int.from_bytes(self._data[start:start + self._width], "big", signed=True)
+
+    def __iter__(self):
+        return self._decode(0, len(self))
+
+    def _decode(self, start, stop):
+        width = self._width
+        data = bytes(self._data[start * width:stop * width])
+        return (int.from_bytes(data[offset:offset + width], "big", signed=True)
+                for offset in range(0, len(data), width))
+
+
+def pack_ints(values, width):
+    return b"".join(value.to_bytes(width, "big", signed=True) for value in values)
+
+
+@timed("snapshot.write")
+def write_snapshot(path, meta, arrays=(), texts=(), packed=()):
+    # arrays: {name: array}, texts: {name: iterable of str}, packed: {name: (bytes, width)}.
+    # Written to a temp file and renamed into place; returns False if the
+    # old snapshot could not be replaced (it is still mapped on Windows)
+    arrays, texts, packed = dict(arrays), dict(texts), dict(packed)
+    strings, ids_of = [], {}
+    text_ids = {}
+    for name, values in texts.items():
+        # New strings get IDs in one pass over the distinct values; the cells
+        # are then mapped to their IDs without a Python-level loop
+        values = list(values)
+        for value in dict.fromkeys(values):
+            if value not in ids_of:
+                ids_of[value] = len(strings)
+                strings.append(value)
+        text_ids[name] = array('I', map(ids_of.__getitem__, values))
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = array('Q', [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+
+    blobs, sections = [], {}
+    def section(name, kind, data, **fields):
+        sections[name] = dict(kind=kind, length=len(data), **fields)
+        blobs.append((name, data))
+    for name, values in arrays.items():
+        section(name, "array", values.tobytes(), typecode=values.typecode, itemsize=values.itemsize)
+    for name, ids in text_ids.items():
+        section(name, "text", ids.tobytes(), itemsize=ids.itemsize)
+    for name, (data, width) in packed.items():
+        section(name, "packed", data, width=width)
+    section("_string_offsets", "array", offsets.tobytes(), typecode='Q', itemsize=offsets.itemsize)
+    section("_string_blob", "blob", b"".join(encoded))
+
+    # Section offsets are relative to the end of the header, so the header
+    # can be serialized once they are known
+    header = {"byteorder": sys.byteorder, "meta": meta, "sections": sections}
+    position = 0
+    for name, data in blobs:
+        sections[name]["offset"] = position
+        position += len(data) + (-len(data)) % ALIGN
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * ((-len(MAGIC) - 8 - len(header_bytes)) % ALIGN)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes)
+        for name, data in blobs:
+            f.write(data)
+            f.write(b"\0" * ((-len(data)) % ALIGN))
+        f.flush()
+        os.fsync(f.fileno())
+        count("snapshot.bytes_written", f.tell())
+    try:
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print("Snapshot not replaced:", path, e)
+        os.remove(tmp_path)
+        return False
+    return True
+
+
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+        (header_length,) = struct.unpack("<Q", view[len(MAGIC):len(MAGIC) + 8])
+        base = len(MAGIC) + 8
+        try:
+            header = json.loads(bytes(view[base:base + header_length]))
+        except ValueError:
+            raise SnapshotError(f"{path} has a damaged header")
+        if header.get("byteorder") != sys.byteorder:
+            raise SnapshotError(f"{path} was written on a machine with another byte order")
+        self.meta = header["meta"]
+        self._sections = header["sections"]
+        self._view = view[base + header_length:]
+        for name, section in self._sections.items():
+            if section["offset"] + section["length"] > len(self._view):
+                raise SnapshotError(f"{path} is truncated")
+            if "typecode" in section and array(section["typecode"]).itemsize != section["itemsize"]:
+                raise SnapshotError(f"{path}: {name} was written with another item size")
+        self._strings = StringTable(self._raw("_string_offsets").cast('Q'), self._raw("_string_blob"))
+        count("snapshot.opened")
+
+    def __contains__(self, name):
+        return name in self._sections
+
+    def _raw(self, name):
+        section = self._sections[name]
+        return self._view[section["offset"]:section["offset"] + section["length"]]
+
+    def array(self, name):
+        # A copy of a numeric column (one memcpy), so it can grow like any array
+        values = array(self._sections[name]["typecode"])
+        values.frombytes(self._raw(name))
+        return values
+
+    def text(self, name):
+        if array('I').itemsize != self._sections[name]["itemsize"]:
+            raise SnapshotError(f"{self.path}: {name} was written with another item size")
+        return TextColumn(self._raw(name).cast('I'), self._strings)
+
+    def packed(self, name):
+        return PackedInts(self._raw(name), self._sections[name]["width"])
+
+
+def open_snapshot(path):
+    # The snapshot at path, or None if there is none or it cannot be read
+    if not os.path.isfile(path):
+        return None
+    try:
+        return Snapshot(path)
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print("Ignoring snapshot:", path, e)
+        return None
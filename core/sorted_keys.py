@@ -0,0 +1,142 @@
+# Sorted sequence of ints (the order table's packed priority keys) held as a
+# list of sorted blocks of up to 2 * LOAD keys, plus the last key of each
+# block. A bisect over the block maxima finds the block and a bisect inside it
+# the place, so an add or remove shifts one block instead of the whole queue.
+# Positions (the paged Listbox in app.py) come from the block lengths; their
+# running totals are rebuilt only when a position is asked for after a change.
+# Keys read from a snapshot stay packed until their block is first touched.
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate, chain
+
+LOAD = 1024  # keys per block when built; a block is split in two past 2 * LOAD
+
+
+class SortedKeys:
+    def __init__(self, keys=()):
+        # keys must already be ascending
+        self._blocks = []    # sorted lists, or (start, stop) ranges of _packed not decoded yet
+        self._maxes = []     # last key of each block
+        self._lens = []      # keys in each block
+        self._offsets = None  # position of each block's first key; None after a change
+        self._packed = None
+        keys = list(keys)
+        for start in range(0, len(keys), LOAD):
+            block = keys[start:start + LOAD]
+            self._blocks.append(block)
+            self._maxes.append(block[-1])
+            self._lens.append(len(block))
+        self._len = len(keys)
+
+    @classmethod
+    def from_packed(cls, packed):
+        # packed: ascending PackedInts (a snapshot section); only the block maxima are read now
+        keys = cls()
+        keys._packed = packed
+        size = len(packed)
+        for start in range(0, size, LOAD):
+            stop = min(start + LOAD, size)
+            keys._blocks.append((start, stop))
+            keys._maxes.append(packed[stop - 1])
+            keys._lens.append(stop - start)
+        keys._len = size
+        return keys
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(map(self._block, range(len(self._blocks))))
+
+    def _block(self, i):
+        block = self._blocks[i]
+        if block.__class__ is tuple:
+            block = self._blocks[i] = self._packed[block[0]:block[1]]
+        return block
+
+    def _changed(self, delta):
+        self._len += delta
+        self._offsets = None
+
+    def add(self, key):
+        maxes = self._maxes
+        if not maxes:
+            self._blocks.append([key])
+            maxes.append(key)
+            self._lens.append(1)
+            self._changed(1)
+            return
+        i = bisect_left(maxes, key)
+        if i == len(maxes):
+            i -= 1
+            block = self._block(i)
+            block.append(key)
+            maxes[i] = key
+        else:
+            block = self._block(i)
+            insort(block, key)
+        self._lens[i] += 1
+        if len(block) > 2 * LOAD:
+            half = block[LOAD:]
+            del block[LOAD:]
+            self._blocks.insert(i + 1, half)
+            maxes[i] = block[-1]
+            maxes.insert(i + 1, half[-1])
+            self._lens[i] = LOAD
+            self._lens.insert(i + 1, len(half))
+        self._changed(1)
+
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        if i < len(self._maxes):
+            block = self._block(i)
+            j = bisect_left(block, key)
+            if block[j] == key:
+                del block[j]
+                if block:
+                    self._maxes[i] = block[-1]
+                    self._lens[i] -= 1
+                else:
+                    del self._blocks[i], self._maxes[i], self._lens[i]
+                self._changed(-1)
+                return
+        raise ValueError(f"{key} is not in the sorted keys")
+
+    def first(self):
+        if not self._len:
+            raise IndexError("first of empty sorted keys")
+        return self._block(0)[0]
+
+    def _offset(self, i):
+        if self._offsets is None:
+            self._offsets = list(accumulate(self._lens, initial=0))
+        return self._offsets[i]
+
+    def index(self, key):
+        # Position key has (or would have) in the sequence
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            return self._len
+        return self._offset(i) + bisect_left(self._block(i), key)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += self._len
+            if not 0 <= index < self._len:
+                raise IndexError("sorted keys index out of range")
+            return self[index:index + 1][0]
+        start, stop, step = index.indices(self._len)
+        if step != 1:
+            return list(self)[index]
+        keys = []
+        if start >= stop:
+            return keys
+        self._offset(0)
+        offsets = self._offsets
+        i = bisect_right(offsets, start) - 1
+        while start < stop:
+            base = offsets[i]
+            keys.extend(self._block(i)[start - base:stop - base])
+            start = offsets[i + 1]
+            i += 1
+        return keys
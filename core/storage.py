@@ -0,0 +1,446 @@
+# Storage backends shared by OrderApp, VendorDeliveryApp and TodaysPlanApp.
+# CsvStorage keeps the existing CSV files; SqliteStorage keeps everything in
+# one SQLite database (WAL mode) with indexes for lookups, deletes and the
+# Today's Plan join. Pick one with the CMS_STORAGE environment variable.
+# While an order-store server runs (core/store_server.py) every app is a
+# client of it instead, so concurrent operators share one writer.
+import argparse
+import os
+import sqlite3
+import threading
+from .delivered_archive import DeliveredArchive
+from .order_table import OrderTable
+from .pending_store import PendingStore, FIELDNAMES
+from .vendor_store import VendorStore, VENDOR_FIELDS, STATUS_INDEX
+from .vendor_table import VendorTable
+from .instrumentation import count, timed
+
+CSV_PENDING = "pending.csv"
+CSV_DELIVERED = "DELIVERED.csv"  # single-file archive of older versions, split up on first use
+DELIVERED_DIR = "delivered"
+CSV_VENDOR = "orders_export.csv"
+SQLITE_DB = "orders.db"
+
+VENDOR_COLUMNS = ['order_date', 'customer_id', 'product_id', 'product_name', 'customer_name',
+                  'quantity', 'colour', 'price', 'status', 'vendor_name', 'vendor_delivered_date',
+                  'total_price']
+
+
+def open_storage(kind=None):
+    from .store_server import RemoteStorage, StoreError, SERVER_FILE
+    kind = (kind or os.environ.get("CMS_STORAGE", "")).lower()
+    if not kind and os.path.isfile(SERVER_FILE):
+        try:
+            return RemoteStorage()
+        except StoreError as e:
+            print(e, "- using the local files")  # stale SERVER_FILE from a crashed server
+    if kind == "server":
+        return RemoteStorage()
+    if kind == "sqlite":
+        return SqliteStorage(os.environ.get("CMS_SQLITE_DB", SQLITE_DB))
+    if kind in ("csv", ""):
+        return CsvStorage()
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+# ----- CSV BACKEND -----
+class CsvStorage:
+    def __init__(self, pending_csv=CSV_PENDING, delivered_csv=CSV_DELIVERED, vendor_csv=CSV_VENDOR,
+                 delivered_dir=DELIVERED_DIR):
+        self.pending = PendingStore(pending_csv)
+        self.delivered = DeliveredArchive(delivered_dir, legacy_csv=delivered_csv,
+                                          compress=os.environ.get("CMS_ARCHIVE_COMPRESS") == "1")
+        self.vendor_csv = vendor_csv
+        self._vendor = None  # VendorStore, loaded on first use and again when another process changed it
+
+    # Pending orders
+    def next_order_id(self):
+        return self.pending.next_id()
+
+    def reserve_order_ids(self, count):
+        return self.pending.reserve_ids(count)
+
+    def pending_rows(self):
+        return self.pending.rows()
+
+    def pending_records(self):
+        # Same orders as pending_rows() but as lists in FIELDNAMES order (bulk load path)
+        return self.pending.scan()
+
+    def pending_table(self, track=True):
+        # (OrderTable, load stats), from the warm-start snapshot when it is
+        # current. track=False: a read-only copy, not the table save_pending_table() gets
+        return self.pending.load_table(track)
+
+    def save_pending_table(self, table):
+        # Warm-start snapshot of a table loaded by pending_table() and kept in
+        # step with this storage since. Waits for a running compaction first:
+        # it replaces pending.csv, which would make the snapshot stale at once
+        self.pending.wait_for_compaction()
+        return self.pending.save_table(table)
+
+    def add_pending(self, row):
+        self.pending.add(row)
+
+    def add_pending_many(self, rows):
+        self.pending.add_many(rows)
+
+    def remove_pending(self, order_id):
+        self.pending.remove(order_id)
+
+    def remove_pending_many(self, order_ids):
+        self.pending.remove_many(order_ids)
+
+    def update_pending(self, order_id, fields):
+        self.pending.update(order_id, fields)
+
+    # Delivered orders: monthly partitions (core/delivered_archive.py)
+    def append_delivered(self, row):
+        self.append_delivered_many([row])
+
+    def append_delivered_many(self, rows):
+        self.delivered.append_many(rows)
+
+    def delivered_rows(self):
+        return self.delivered.rows()
+
+    def delivered_range(self, start=None, end=None, customer_id=None, product_id=None):
+        # Delivered rows with order dates in [start, end], optionally for one customer / product
+        return self.delivered.rows(start, end, customer_id, product_id)
+
+    def delivered_months(self, start=None, end=None):
+        # Per-month rows and value totals for order dates in [start, end]
+        return self.delivered.totals(start, end)
+
+    # Vendor orders
+    @property
+    def vendor(self):
+        # A process that has not edited vendor orders (Today's Plan, the order
+        # window, the command line) rereads them once another process has.
+        # One that has keeps its table: its VendorBook holds the vendor IDs
+        if self._vendor is None or self._vendor.changed_elsewhere():
+            if self._vendor is not None:
+                self._vendor.discard()
+                count("vendor.reloads")
+            self._vendor = VendorStore(self.vendor_csv)
+        return self._vendor
+
+    def vendor_orders(self):
+        vendor = self.vendor
+        with vendor.lock:
+            return list(vendor.rows.items())
+
+    def vendor_table(self):
+        vendor = self.vendor
+        with vendor.lock:
+            return vendor.rows.copy()
+
+    def add_vendor_order(self, values):
+        return self.vendor.add(values)
+
+    def add_vendor_orders(self, rows):
+        return self.vendor.add_many(rows)
+
+    def update_vendor_status(self, vendor_id, status):
+        self.vendor.update_status(vendor_id, status)
+
+    def delete_vendor_order(self, vendor_id):
+        self.vendor.delete(vendor_id)
+
+    def flush(self):
+        if self._vendor is not None:
+            self._vendor.flush()
+
+    def close(self):
+        self.flush()
+        self.pending.wait_for_compaction()
+
+    # Today's Plan: streaming hash join. The hash table holds only vendor rows
+    # with Status "Delivered" inside the date window; pending.csv is streamed
+    # through it once by the compactor, which writes every non-matching row to
+    # the new snapshot as it goes. Memory is bounded by the delivered set.
+    @timed("plan.join")
+    def take_dispatch_ready(self, start_str, end_str, kept=None):
+        # kept(row), if given, is called with each pending row left in place,
+        # from the same streaming pass
+        customer_index = VENDOR_FIELDS.index('Customer ID')
+        product_index = VENDOR_FIELDS.index('Product ID')
+        date_index = VENDOR_FIELDS.index('Vendor Delivered Date')
+        vendor_dates = {}
+        vendor = self.vendor
+        with vendor.lock:
+            for values in vendor.rows.values():
+                delivered_date = values[date_index].strip()
+                if start_str <= delivered_date <= end_str and values[STATUS_INDEX].strip().lower() == 'delivered':
+                    key = (values[customer_index].strip(), values[product_index].strip())
+                    vendor_dates[key] = max(delivered_date, vendor_dates.get(key, ''))
+        matched = []
+        if not vendor_dates:
+            if kept is not None:
+                for row in self.pending.rows():
+                    kept(row)
+            return matched
+
+        def keep(row):
+            delivered_date = vendor_dates.get((row['customer_id'].strip(), row['product_id'].strip()))
+            if delivered_date is None:
+                if kept is not None:
+                    kept(row)
+                return True
+            matched.append((row, delivered_date))
+            return False
+
+        self.pending.compact(keep)
+        count("plan.rows_matched", len(matched))
+        return matched
+
+
+# ----- SQLITE BACKEND -----
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    order_id INTEGER PRIMARY KEY,
+    order_date TEXT, name TEXT, customer_id TEXT, address TEXT, phone_number TEXT,
+    product_id TEXT, "order" TEXT, total_amount REAL, advance_paid REAL, priority_flag INTEGER
+);
+CREATE TABLE IF NOT EXISTS delivered (
+    order_id INTEGER,
+    order_date TEXT, name TEXT, customer_id TEXT, address TEXT, phone_number TEXT,
+    product_id TEXT, "order" TEXT, total_amount REAL, advance_paid REAL, priority_flag INTEGER
+);
+CREATE TABLE IF NOT EXISTS vendor_orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_date TEXT, customer_id TEXT, product_id TEXT, product_name TEXT, customer_name TEXT,
+    quantity TEXT, colour TEXT, price TEXT, status TEXT, vendor_name TEXT,
+    vendor_delivered_date TEXT, total_price TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE INDEX IF NOT EXISTS idx_pending_cust_prod ON pending (customer_id, product_id);
+CREATE INDEX IF NOT EXISTS idx_pending_order_date ON pending (order_date);
+CREATE INDEX IF NOT EXISTS idx_delivered_cust_prod ON delivered (customer_id, product_id);
+CREATE INDEX IF NOT EXISTS idx_delivered_order_date ON delivered (order_date);
+CREATE INDEX IF NOT EXISTS idx_vendor_cust_prod ON vendor_orders (customer_id, product_id);
+CREATE INDEX IF NOT EXISTS idx_vendor_order_date ON vendor_orders (order_date);
+CREATE INDEX IF NOT EXISTS idx_vendor_status ON vendor_orders (status);
+CREATE INDEX IF NOT EXISTS idx_vendor_delivered_date ON vendor_orders (vendor_delivered_date);
+CREATE INDEX IF NOT EXISTS idx_vendor_ready ON vendor_orders (lower(trim(status)), trim(vendor_delivered_date));
+CREATE INDEX IF NOT EXISTS idx_pending_pair ON pending (trim(customer_id), trim(product_id));
+"""
+
+PENDING_COLUMNS = ", ".join(f'"{f}"' for f in FIELDNAMES)
+PENDING_PARAMS = ", ".join("?" for _ in FIELDNAMES)
+
+
+def _pending_params(row):
+    return [row.get(f, '') for f in FIELDNAMES]
+
+
+def _row_to_strings(row):
+    return {k: ('' if v is None else str(v)) for k, v in zip(row.keys(), row)}
+
+
+def _delivered_filter(start=None, end=None, customer_id=None, product_id=None):
+    # WHERE clause and parameters for the delivered range queries (index on order_date / customer)
+    conditions, params = [], []
+    for condition, value in (("order_date >= ?", start), ("order_date <= ?", end),
+                             ("customer_id = ?", customer_id), ("product_id = ?", product_id)):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+class SqliteStorage:
+    def __init__(self, db_path=SQLITE_DB):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def flush(self):
+        pass  # every write is already its own transaction
+
+    def close(self):
+        self.conn.close()
+
+    # Pending orders
+    def next_order_id(self):
+        return self.reserve_order_ids(1)[0]
+
+    @timed("sqlite.reserve_order_ids")
+    def reserve_order_ids(self, count):
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'order_counter'").fetchone()
+            max_row = self.conn.execute("SELECT MAX(order_id) FROM pending").fetchone()
+            first = max(int(row[0]) if row else 0, (max_row[0] + 1) if max_row[0] is not None else 0)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('order_counter', ?)",
+                              (str(first + count),))
+            return range(first, first + count)
+
+    def pending_rows(self):
+        for row in self.conn.execute(f"SELECT {PENDING_COLUMNS} FROM pending"):
+            yield _row_to_strings(row)
+
+    def pending_records(self):
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        return cursor.execute(f"SELECT {PENDING_COLUMNS} FROM pending")
+
+    def pending_table(self, track=True):
+        table = OrderTable()
+        return table, table.load(self.pending_records())
+
+    def save_pending_table(self, table):
+        return False  # the database opens without a full read; no warm snapshot
+
+    def add_pending(self, row):
+        self.add_pending_many([row])
+
+    @timed("sqlite.add_pending_many")
+    def add_pending_many(self, rows):
+        with self.lock, self.conn:
+            self.conn.executemany(f"INSERT INTO pending ({PENDING_COLUMNS}) VALUES ({PENDING_PARAMS})",
+                                  [_pending_params(row) for row in rows])
+
+    def remove_pending(self, order_id):
+        self.remove_pending_many([order_id])
+
+    @timed("sqlite.remove_pending_many")
+    def remove_pending_many(self, order_ids):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM pending WHERE order_id = ?",
+                                  [(int(order_id),) for order_id in order_ids])
+
+    @timed("sqlite.update_pending")
+    def update_pending(self, order_id, fields):
+        assignments = ", ".join(f'"{k}" = ?' for k in fields if k in FIELDNAMES)
+        values = [v for k, v in fields.items() if k in FIELDNAMES]
+        with self.lock, self.conn:
+            self.conn.execute(f"UPDATE pending SET {assignments} WHERE order_id = ?",
+                              values + [int(order_id)])
+
+    # Delivered orders
+    def append_delivered(self, row):
+        self.append_delivered_many([row])
+
+    @timed("sqlite.append_delivered")
+    def append_delivered_many(self, rows):
+        with self.lock, self.conn:
+            self.conn.executemany(f"INSERT INTO delivered ({PENDING_COLUMNS}) VALUES ({PENDING_PARAMS})",
+                                  [_pending_params(row) for row in rows])
+
+    def delivered_rows(self):
+        for row in self.conn.execute(f"SELECT {PENDING_COLUMNS} FROM delivered"):
+            yield _row_to_strings(row)
+
+    def delivered_range(self, start=None, end=None, customer_id=None, product_id=None):
+        where, params = _delivered_filter(start, end, customer_id, product_id)
+        for row in self.conn.execute(f"SELECT {PENDING_COLUMNS} FROM delivered{where}", params):
+            yield _row_to_strings(row)
+
+    def delivered_months(self, start=None, end=None):
+        where, params = _delivered_filter(start, end)
+        return [{"month": month, "rows": rows, "total_amount": total or 0.0, "advance_paid": advance or 0.0,
+                 "balance_due": (total or 0.0) - (advance or 0.0)}
+                for month, rows, total, advance in self.conn.execute(
+                    f"SELECT substr(order_date, 1, 7) AS month, COUNT(*), SUM(total_amount), SUM(advance_paid) "
+                    f"FROM delivered{where} GROUP BY month ORDER BY month", params)]
+
+    # Vendor orders
+    def vendor_orders(self):
+        columns = ", ".join(VENDOR_COLUMNS)
+        return [(row[0], [('' if v is None else str(v)) for v in row[1:]])
+                for row in self.conn.execute(f"SELECT id, {columns} FROM vendor_orders ORDER BY id")]
+
+    def vendor_table(self):
+        return VendorTable(self.vendor_orders())
+
+    def add_vendor_order(self, values):
+        return self.add_vendor_orders([values])[0]
+
+    @timed("sqlite.add_vendor_order")
+    def add_vendor_orders(self, rows):
+        columns = ", ".join(VENDOR_COLUMNS)
+        params = ", ".join("?" for _ in VENDOR_COLUMNS)
+        with self.lock, self.conn:
+            return [self.conn.execute(f"INSERT INTO vendor_orders ({columns}) VALUES ({params})",
+                                      list(values)).lastrowid for values in rows]
+
+    @timed("sqlite.update_vendor_status")
+    def update_vendor_status(self, vendor_id, status):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE vendor_orders SET status = ? WHERE id = ?", (status, vendor_id))
+
+    @timed("sqlite.delete_vendor_order")
+    def delete_vendor_order(self, vendor_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM vendor_orders WHERE id = ?", (vendor_id,))
+
+    # Today's Plan: index join on the trimmed status / delivered date and the
+    # trimmed (customer_id, product_id) pair, matching the CSV backend's
+    # stripped, case-insensitive comparison; matched rows are deleted in the
+    # same transaction
+    @timed("plan.join")
+    def take_dispatch_ready(self, start_str, end_str, kept=None):
+        # The join runs in SQL; kept(row) is then called with each row left, in one query
+        columns = ", ".join(f'p."{f}"' for f in FIELDNAMES)
+        query = f"""
+            SELECT {columns}, MAX(trim(v.vendor_delivered_date)) AS delivered_date
+            FROM vendor_orders v
+            JOIN pending p ON trim(p.customer_id) = trim(v.customer_id) AND trim(p.product_id) = trim(v.product_id)
+            WHERE lower(trim(v.status)) = 'delivered' AND trim(v.vendor_delivered_date) BETWEEN ? AND ?
+            GROUP BY p.order_id
+        """
+        with self.lock, self.conn:
+            matched = []
+            for row in self.conn.execute(query, (start_str, end_str)).fetchall():
+                values = _row_to_strings(row)
+                matched.append(({f: values[f] for f in FIELDNAMES}, values['delivered_date']))
+            self.conn.executemany("DELETE FROM pending WHERE order_id = ?",
+                                  [(int(row['order_id']),) for row, _ in matched])
+        if kept is not None:
+            for row in self.pending_rows():
+                kept(row)
+        count("plan.rows_matched", len(matched))
+        return matched
+
+
+# ----- CSV IMPORTER -----
+def import_csv_files(db_path=SQLITE_DB, pending_csv=CSV_PENDING, delivered_csv=CSV_DELIVERED,
+                     vendor_csv=CSV_VENDOR):
+    # One pass over each CSV, all inserted in a single transaction
+    target = SqliteStorage(db_path)
+    source = CsvStorage(pending_csv, delivered_csv, vendor_csv)
+    counts = {"pending": 0, "delivered": 0, "vendor": 0}
+    with target.lock, target.conn:
+        conn = target.conn
+        conn.execute("DELETE FROM pending")
+        conn.execute("DELETE FROM delivered")
+        conn.execute("DELETE FROM vendor_orders")
+
+        pending = [_pending_params(row) for row in source.pending_rows() if row.get("order_id")]
+        conn.executemany(f"INSERT OR REPLACE INTO pending ({PENDING_COLUMNS}) VALUES ({PENDING_PARAMS})", pending)
+        counts["pending"] = len(pending)
+
+        delivered = [_pending_params(row) for row in source.delivered_rows()]
+        conn.executemany(f"INSERT INTO delivered ({PENDING_COLUMNS}) VALUES ({PENDING_PARAMS})", delivered)
+        counts["delivered"] = len(delivered)
+
+        vendor = [values for _, values in source.vendor_orders()]
+        conn.executemany(f"INSERT INTO vendor_orders ({', '.join(VENDOR_COLUMNS)}) "
+                         f"VALUES ({', '.join('?' for _ in VENDOR_COLUMNS)})", vendor)
+        counts["vendor"] = len(vendor)
+
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('order_counter', ?)",
+                     (str(source.pending.counter),))
+    target.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the CSV files into the SQLite backend")
+    parser.add_argument("command", choices=["import"])
+    parser.add_argument("--db", default=SQLITE_DB)
+    args = parser.parse_args()
+    print("Imported:", import_csv_files(args.db))
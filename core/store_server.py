@@ -0,0 +1,386 @@
+# Local order-store server. One process owns the pending, delivered and
+# vendor stores (CSV or SQLite backend) and every app talks to it over a Unix
+# socket, or localhost TCP where Unix sockets are not available, so several
+# operators no longer rewrite the same files at once. Requests are one JSON
+# line each. They go through a single queue, and the committer takes
+# everything that queued up while the previous commit was on disk and writes
+# it as one group: all adds in one journal append and fsync, all deliveries
+# in one append, and so on. More operators means bigger groups, not more fsyncs.
+#   python cms.py serve [--backend csv|sqlite] [--address cms.sock | 127.0.0.1:8765]
+import asyncio
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .instrumentation import count, timed, STATS
+from .order_table import OrderTable
+from .vendor_table import VendorTable
+
+SERVER_FILE = "cms_server.addr"  # written while a server runs; apps find it here
+DEFAULT_SOCKET = "cms.sock"
+DEFAULT_PORT = 8765
+MAX_GROUP = 4096      # requests per group commit
+CHUNK_ROWS = 4096     # rows per message in large replies
+LINE_LIMIT = 64 * 1024 * 1024  # longest request line (bulk imports)
+
+# Storage methods clients may call
+OPERATIONS = {
+    "next_order_id", "reserve_order_ids", "pending_rows", "pending_records", "add_pending",
+    "add_pending_many", "remove_pending", "remove_pending_many", "update_pending", "append_delivered",
+    "append_delivered_many", "delivered_rows", "delivered_range", "delivered_months", "vendor_orders",
+    "add_vendor_order", "add_vendor_orders", "update_vendor_status", "delete_vendor_order",
+    "take_dispatch_ready", "flush"
+}
+
+
+# Requests from different clients in one group can be applied in any order
+# (each client waits for its reply before sending the next request), so
+# requests of the same kind are merged into one backend call
+def _next_order_ids(storage, calls):
+    return list(storage.reserve_order_ids(len(calls)))
+
+
+def _add_pending(storage, calls):
+    storage.add_pending_many([row for row, in calls])
+    return [None] * len(calls)
+
+
+def _remove_pending(storage, calls):
+    storage.remove_pending_many([order_id for order_id, in calls])
+    return [None] * len(calls)
+
+
+def _append_delivered(storage, calls):
+    storage.append_delivered_many([row for row, in calls])
+    return [None] * len(calls)
+
+
+def _add_vendor_orders(storage, calls):
+    return storage.add_vendor_orders([values for values, in calls])
+
+
+GROUPED = {
+    "next_order_id": _next_order_ids,
+    "add_pending": _add_pending,
+    "remove_pending": _remove_pending,
+    "append_delivered": _append_delivered,
+    "add_vendor_order": _add_vendor_orders
+}
+
+
+class StoreError(RuntimeError):
+    pass
+
+
+def default_address():
+    return DEFAULT_SOCKET if hasattr(socket, "AF_UNIX") else f"127.0.0.1:{DEFAULT_PORT}"
+
+
+def server_address():
+    # CMS_SERVER, else the address a running server wrote to SERVER_FILE
+    address = os.environ.get("CMS_SERVER")
+    if address:
+        return address
+    try:
+        with open(SERVER_FILE, encoding='utf-8') as f:
+            return f.read().strip() or default_address()
+    except OSError:
+        return default_address()
+
+
+def _tcp(address):
+    # "host:port" -> (host, port); anything else is a Unix socket path
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port)) if port.isdigit() else None
+
+
+def _plain(value):
+    # Backend results (generators, cursors, ranges, tuples) as JSON values
+    if isinstance(value, (str, int, float, bool, dict)) or value is None:
+        return value
+    return [_plain(item) if isinstance(item, (tuple, list, range)) else item for item in value]
+
+
+class StoreServer:
+    def __init__(self, storage, max_group=MAX_GROUP):
+        self.storage = storage
+        self.max_group = max_group
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+        self._queue = None
+        self._server = None
+
+    # ----- Group commit -----
+    @timed("server.commit")
+    def _commit(self, group):
+        # Runs on the store thread. group: [(op, args)] -> [(ok, result)]
+        results = [None] * len(group)
+        by_op = {}
+        for position, (op, _) in enumerate(group):
+            by_op.setdefault(op, []).append(position)
+        for op, positions in by_op.items():
+            merge = GROUPED.get(op)
+            if merge is not None:
+                try:
+                    values = merge(self.storage, [group[position][1] for position in positions])
+                    for position, value in zip(positions, values):
+                        results[position] = (True, value)
+                except Exception as e:
+                    for position in positions:
+                        results[position] = (False, e)
+                continue
+            for position in positions:
+                try:
+                    results[position] = (True, _plain(getattr(self.storage, op)(*group[position][1])))
+                except Exception as e:
+                    results[position] = (False, e)
+        return results
+
+    async def _commit_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            group = [await self._queue.get()]
+            while len(group) < self.max_group and not self._queue.empty():
+                group.append(self._queue.get_nowait())
+            results = await loop.run_in_executor(self._executor, self._commit,
+                                                 [(op, args) for op, args, _ in group])
+            count("server.commits")
+            count("server.requests", len(group))
+            for (_, _, future), result in zip(group, results):
+                if not future.done():
+                    future.set_result(result)
+
+    # ----- Connections -----
+    async def _handle(self, reader, writer):
+        count("server.connections")
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    op, args = request["op"], request.get("args", [])
+                    if op not in OPERATIONS:
+                        raise ValueError(f"Unknown operation: {op}")
+                except (ValueError, KeyError, TypeError) as e:
+                    ok, result = False, e
+                else:
+                    future = loop.create_future()
+                    await self._queue.put((op, args, future))
+                    ok, result = await future
+                await self._reply(writer, ok, result)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            print("Client connection closed:", e)
+        finally:
+            writer.close()
+
+    async def _reply(self, writer, ok, result):
+        if not ok:
+            message = {"ok": False, "error": type(result).__name__, "message": str(result)}
+        elif isinstance(result, list) and len(result) > CHUNK_ROWS:
+            # Large reads go out in chunks so other clients get a turn
+            for start in range(0, len(result), CHUNK_ROWS):
+                writer.write(json.dumps({"chunk": result[start:start + CHUNK_ROWS]}).encode("utf-8") + b"\n")
+                await writer.drain()
+            message = {"ok": True, "chunked": True}
+        else:
+            message = {"ok": True, "result": result}
+        writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        await writer.drain()
+
+    # ----- Lifecycle -----
+    async def start(self, address):
+        self._queue = asyncio.Queue()
+        tcp = _tcp(address)
+        if tcp is not None:
+            self._server = await asyncio.start_server(self._handle, *tcp, limit=LINE_LIMIT)
+        else:
+            if os.path.exists(address):
+                if _reachable(address):
+                    raise StoreError(f"A server is already running at {address}")
+                os.remove(address)  # stale socket from a crashed server
+            self._server = await asyncio.start_unix_server(self._handle, address, limit=LINE_LIMIT)
+        return asyncio.ensure_future(self._commit_loop())
+
+    async def serve(self, address):
+        committer = await self.start(address)
+        with open(SERVER_FILE, 'w', encoding='utf-8') as f:
+            f.write(address)
+        print(f"Order store serving on {address}")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            committer.cancel()
+
+    def close(self, address):
+        self._executor.shutdown(wait=True)
+        self.storage.close()
+        for path in (SERVER_FILE, address if _tcp(address) is None else None):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def _reachable(address):
+    try:
+        _connect(address, timeout=1.0).close()
+        return True
+    except OSError:
+        return False
+
+
+def _connect(address, timeout=None):
+    tcp = _tcp(address)
+    if tcp is not None:
+        return socket.create_connection(tcp, timeout=timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def serve(address=None, backend=None):
+    # Blocks until interrupted (Ctrl+C)
+    from .storage import open_storage
+    address = address or os.environ.get("CMS_SERVER") or default_address()
+    if backend is None:
+        backend = "sqlite" if os.environ.get("CMS_STORAGE", "").lower() == "sqlite" else "csv"
+    server = StoreServer(open_storage(backend))
+    if STATS.enabled:
+        STATS.start_dump("stats_server.json")
+    try:
+        asyncio.run(server.serve(address))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close(address)
+        print("Order store stopped")
+
+
+# ----- Client -----
+ERRORS = {"KeyError": KeyError, "ValueError": ValueError, "IndexError": IndexError, "OSError": OSError}
+
+
+class RemoteStorage:
+    # Same interface as CsvStorage / SqliteStorage, served by a StoreServer
+    def __init__(self, address=None):
+        self.address = address or server_address()
+        try:
+            self._sock = _connect(self.address)
+        except OSError as e:
+            raise StoreError(f"No order store server at {self.address} ({e}); "
+                             f"start one with: python cms.py serve") from e
+        self._reader = self._sock.makefile('rb')
+        self.lock = threading.Lock()
+
+    @timed("client.call")
+    def _call(self, op, *args):
+        request = json.dumps({"op": op, "args": args}).encode("utf-8") + b"\n"
+        with self.lock:
+            self._sock.sendall(request)
+            chunks = []
+            while True:
+                line = self._reader.readline()
+                if not line:
+                    raise StoreError("Order store server closed the connection")
+                message = json.loads(line)
+                if "chunk" in message:
+                    chunks.extend(message["chunk"])
+                    continue
+                break
+        if not message["ok"]:
+            raise ERRORS.get(message["error"], StoreError)(message["message"])
+        return chunks if message.get("chunked") else message["result"]
+
+    def close(self):
+        self._reader.close()
+        self._sock.close()
+
+    def flush(self):
+        self._call("flush")
+
+    # Pending orders
+    def next_order_id(self):
+        return self._call("next_order_id")
+
+    def reserve_order_ids(self, count):
+        return self._call("reserve_order_ids", count)
+
+    def pending_rows(self):
+        return self._call("pending_rows")
+
+    def pending_records(self):
+        return self._call("pending_records")
+
+    def pending_table(self, track=True):
+        table = OrderTable()
+        return table, table.load(self.pending_records())
+
+    def save_pending_table(self, table):
+        return False  # the server's compactor keeps the warm snapshot
+
+    def add_pending(self, row):
+        self._call("add_pending", row)
+
+    def add_pending_many(self, rows):
+        self._call("add_pending_many", list(rows))
+
+    def remove_pending(self, order_id):
+        self._call("remove_pending", order_id)
+
+    def remove_pending_many(self, order_ids):
+        self._call("remove_pending_many", list(order_ids))
+
+    def update_pending(self, order_id, fields):
+        self._call("update_pending", order_id, fields)
+
+    # Delivered orders
+    def append_delivered(self, row):
+        self._call("append_delivered", row)
+
+    def append_delivered_many(self, rows):
+        self._call("append_delivered_many", list(rows))
+
+    def delivered_rows(self):
+        return self._call("delivered_rows")
+
+    def delivered_range(self, start=None, end=None, customer_id=None, product_id=None):
+        return self._call("delivered_range", start, end, customer_id, product_id)
+
+    def delivered_months(self, start=None, end=None):
+        return self._call("delivered_months", start, end)
+
+    # Vendor orders
+    def vendor_orders(self):
+        return [(vendor_id, values) for vendor_id, values in self._call("vendor_orders")]
+
+    def vendor_table(self):
+        return VendorTable(self.vendor_orders())
+
+    def add_vendor_order(self, values):
+        return self._call("add_vendor_order", list(values))
+
+    def add_vendor_orders(self, rows):
+        return self._call("add_vendor_orders", [list(values) for values in rows])
+
+    def update_vendor_status(self, vendor_id, status):
+        self._call("update_vendor_status", vendor_id, status)
+
+    def delete_vendor_order(self, vendor_id):
+        self._call("delete_vendor_order", vendor_id)
+
+    # Today's Plan
+    def take_dispatch_ready(self, start_str, end_str, kept=None):
+        # A callback cannot cross the socket: the rows left are fetched after the join
+        matched = [(row, delivered_date) for row, delivered_date in
+                   self._call("take_dispatch_ready", start_str, end_str)]
+        if kept is not None:
+            for row in self.pending_rows():
+                kept(row)
+        return matched
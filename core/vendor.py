@@ -0,0 +1,199 @@
+# Vendor order table: vendor_id -> values, the customer search index and the
+# storage writes behind add / status update / delete. Used by
+# VendorDeliveryApp and by the command line, no GUI imports.
+from functools import partial
+from .events import VENDOR_ADDED, VENDOR_STATUS, VENDOR_DELETED, StoreRead
+from .ledger import Ledger
+from .order_rules import OrderError
+from .search_index import SearchIndex
+from .storage import open_storage
+from .vendor_store import VENDOR_FIELDS, STATUS_INDEX
+from .vendor_table import VendorTable
+from .instrumentation import timed
+
+NAME_INDEX = VENDOR_FIELDS.index('Customer Name')
+CUSTOMER_INDEX = VENDOR_FIELDS.index('Customer ID')
+QUANTITY_INDEX = VENDOR_FIELDS.index('Quantity')
+PRICE_INDEX = VENDOR_FIELDS.index('Price')
+VENDOR_STATUSES = ["Delivered", "Not Delivered"]
+
+
+def total_price(quantity, price):
+    try:
+        return float(quantity) * float(price)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def vendor_values(fields):
+    # fields: raw strings keyed by VENDOR_FIELDS (HTTP intake); every field is
+    # required, as in the vendor form. Returns the values list or raises OrderError
+    values = []
+    for field in VENDOR_FIELDS:
+        value = fields.get(field)
+        value = '' if value is None else str(value).strip()
+        if not value:
+            raise OrderError("Input Error", f"Please enter {field}")
+        values.append(value)
+    if values[STATUS_INDEX] not in VENDOR_STATUSES:
+        raise OrderError("Input Error", f"Status must be one of: {', '.join(VENDOR_STATUSES)}")
+    return values
+
+
+class VendorBook:
+    def __init__(self, storage=None, io=None, events=None):
+        self.storage = storage or open_storage()
+        self.io = io  # IOWorker for status/delete writes and flushes; None writes inline
+        self.events = events  # EventLog the changes are published to (core/events.py); None = not published
+        self.orders = VendorTable()  # vendor_id -> values (VENDOR_FIELDS + Total Price)
+        self.search_index = None  # SearchIndex, built by index_search() on the worker or by the first search
+        self._search_backlog = None  # index changes made while index_search() is building
+        self.ledger = None  # Ledger, built the first time the dashboard is opened; owned by the I/O worker
+        self._follower = None  # EventFollower keeping the ledger current
+
+    def __len__(self):
+        return len(self.orders)
+
+    def _persist(self, fn, *args, label=None, on_done=None):
+        # on_done(result) runs on the UI thread, or at once when run inline
+        if self.io is None:
+            result = fn(*args)
+            if on_done is not None:
+                on_done(result)
+        else:
+            self.io.submit(fn, *args, label=label, on_done=on_done)
+
+    def _publish(self, kind, old_values, new_values):
+        # Whole rows before and after: vendor IDs are local to each process
+        if self.events is not None:
+            self._persist(partial(self.events.publish, kind, old=old_values, new=new_values))
+
+    @timed("vendor_book.load")
+    def load(self):
+        self.orders = self.storage.vendor_table()
+        self.search_index = None
+        self._search_backlog = None
+
+    def add(self, fields, on_done=None):
+        # fields: VENDOR_FIELDS values; Total Price is derived from quantity and
+        # price. The store assigns the vendor ID, so the row joins the table
+        # when the write is done; on_done(vendor_id) follows. Returns the ID
+        # when written inline (no I/O worker)
+        values = list(fields) + [f"{total_price(fields[QUANTITY_INDEX], fields[PRICE_INDEX]):.2f}"]
+        added = []
+
+        def written(vendor_id):
+            self.orders[vendor_id] = values
+            self._index("add", vendor_id, values[NAME_INDEX], values[CUSTOMER_INDEX])
+            added.append(vendor_id)
+            if on_done is not None:
+                on_done(vendor_id)
+        self._persist(self._write_added, values, label="Adding vendor order", on_done=written)
+        return added[0] if added else None
+
+    def _write_added(self, values):
+        # Worker side of add(): the ID comes from the store
+        vendor_id = self.storage.add_vendor_order(values)
+        if self.events is not None:
+            self.events.publish(VENDOR_ADDED, old=None, new=values)
+        return vendor_id
+
+    def update_status(self, vendor_id, status):
+        old_values = self.orders[vendor_id] if self.events is not None else None
+        self.orders.set_field(vendor_id, STATUS_INDEX, status)
+        self._persist(self.storage.update_vendor_status, vendor_id, status)
+        self._publish(VENDOR_STATUS, old_values, self.orders[vendor_id])
+
+    def delete(self, vendor_id):
+        old_values = self.orders[vendor_id] if self.events is not None else None
+        del self.orders[vendor_id]
+        self._index("remove", vendor_id)
+        self._persist(self.storage.delete_vendor_order, vendor_id)
+        self._publish(VENDOR_DELETED, old_values, None)
+
+    def finances(self):
+        # Pending orders are read once for the recompute, queued on first use;
+        # then the event log keeps it current, with this app's vendor edits
+        # and the order windows' changes (without an EventLog it stays as built)
+        if self.ledger is None:
+            self.ledger = Ledger()
+            self._persist(self._build_ledger, self.ledger, label="Building dashboard")
+        return self.ledger
+
+    def _build_ledger(self, ledger):
+        # Vendor rows from the store too: self.orders belongs to the UI thread.
+        # The follower is opened first, so nothing published after the read is
+        # missed; what was published during it and is already in the read is skipped
+        if self.events is not None and self._follower is None:
+            self._follower = self.events.follow()
+        read = StoreRead(self.storage.pending_table(track=False)[0], self.storage.vendor_table())
+        ledger.rebuild(read.pending, self.storage.delivered_rows(), read.vendor)
+        if self._follower is not None:
+            for event in self._follower.poll():
+                if not read.holds(event):
+                    ledger.apply_event(event)
+
+    def _summary(self, top, days):
+        # Worker side: the events published since the last refresh, then the totals
+        if self._follower is not None:
+            for event in self._follower.poll():
+                self.ledger.apply_event(event)
+        return self.ledger.summary(top, days)
+
+    def finance_summary(self, on_done, top=10, days=14):
+        # on_done(Ledger.summary()) on the UI thread
+        self.finances()
+        self._persist(self._summary, top, days, on_done=on_done)
+
+    # ----- Search -----
+    def _search_items(self):
+        # (vendor_id, name, customer ID) per row, read column-wise
+        slots = self.orders.slots()
+        return list(zip(self.orders, map(self.orders.column(NAME_INDEX).__getitem__, slots),
+                        map(self.orders.column(CUSTOMER_INDEX).__getitem__, slots)))
+
+    def _build_search(self, items):
+        index = SearchIndex()
+        index.build(items)
+        return index
+
+    def index_search(self):
+        # Builds the search index on the I/O worker from the rows as they are
+        # now, so the window opens without waiting for it; adds and deletes
+        # made meanwhile are replayed onto it when it arrives
+        if self.io is None or self.search_index is not None or self._search_backlog is not None:
+            return
+        self._search_backlog = []
+        self.io.submit(self._build_search, self._search_items(), label="Indexing vendor orders",
+                       on_done=self._search_built)
+
+    def _search_built(self, index):
+        if self.search_index is None:
+            for method, args in self._search_backlog:
+                getattr(index, method)(*args)
+            self.search_index = index
+        self._search_backlog = None
+
+    def _index(self, method, *args):
+        # A search index change: applied now, or kept for the index being
+        # built. With no index yet, the build reads self.orders later anyway
+        if self.search_index is not None:
+            getattr(self.search_index, method)(*args)
+        elif self._search_backlog is not None:
+            self._search_backlog.append((method, args))
+
+    def search(self, text):
+        if self.search_index is None:
+            # First search before (or without) the background build
+            self.search_index = self._build_search(self._search_items())
+        return self.search_index.search(text)
+
+    def flush(self, on_done=None, on_error=None):
+        # The debounced CSV rewrite; on_done() runs once it is on disk
+        if self.io is None:
+            self.storage.flush()
+            if on_done is not None:
+                on_done()
+            return
+        self.io.submit(self.storage.flush, label="Saving vendor orders",
+                       on_done=on_done and (lambda _: on_done()), on_error=on_error)
@@ -0,0 +1,253 @@
+# Vendor order store for orders_export.csv. New orders are appended to the
+# CSV, status changes and deletes go to a small delta log next to it, and the
+# full rewrite (renumbering S.No and folding the delta) is debounced: many
+# edits inside one interval cost a single atomic temp-file-and-rename, and
+# anything still pending is written on exit. Each rewrite, and a clean exit,
+# also leaves orders_export.csv.snap, a binary copy of the table
+# (core/snapshot.py) that the next start maps instead of parsing the CSV
+# while the CSV and delta log are unchanged.
+import atexit
+import csv
+import json
+import os
+import threading
+import zlib
+from array import array
+from .id_index import IdIndex
+from .snapshot import file_stamp, open_snapshot
+from .vendor_table import VendorTable, VENDOR_FIELDS
+from .instrumentation import STATS, count, timed
+
+VENDOR_HEADER = ['S.No'] + VENDOR_FIELDS + ['Total Price']
+STATUS_INDEX = VENDOR_FIELDS.index('Status')
+REWRITE_INTERVAL = 5.0  # seconds between full rewrites
+
+
+def fingerprint(values):
+    # Identifies a row independently of its status, so a delta record is only
+    # applied to the row it was written for
+    key = values[:STATUS_INDEX] + values[STATUS_INDEX + 1:]
+    return zlib.crc32("\x1f".join(key).encode("utf-8"))
+
+
+class VendorStore:
+    def __init__(self, path, rewrite_interval=REWRITE_INTERVAL):
+        self.path = path
+        self.delta_path = path + ".delta"
+        self.warm_path = path + ".snap"
+        self.rewrite_interval = rewrite_interval
+        self.lock = threading.RLock()
+        self.rows = VendorTable()  # vendor_id -> values (without S.No)
+        self._positions = IdIndex()  # vendor_id -> data row index in the CSV file
+        self._file_rows = 0   # data rows physically in the CSV file
+        self._next_id = 0
+        self._dirty = False
+        self._timer = None
+        self._seen = None  # file stamps as of the load or this process's last write
+        self._foreign = False  # another process wrote since the load
+        self._warm = False  # the warm snapshot matches the files
+        self._written = False  # this process has edited the table (its vendor IDs are in use)
+        self._load()
+        atexit.register(self.flush)
+
+    # ----- Loading -----
+    @timed("vendor.load")
+    def _load(self):
+        self._seen = self._stamps()
+        if self._load_warm():
+            return
+        by_position = {}
+        if STATS.enabled:
+            count("vendor.bytes_read", sum(os.path.getsize(path) for path in (self.path, self.delta_path)
+                                           if os.path.exists(path)))
+        if os.path.exists(self.path):
+            with open(self.path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                self.rows.extend(self._read_rows(reader, by_position))
+                count("vendor.rows_read", self._file_rows)
+        if os.path.exists(self.delta_path):
+            with open(self.delta_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash mid-append
+                    vendor_id = by_position.get(record.get("pos"))
+                    if vendor_id is None or vendor_id not in self.rows:
+                        continue
+                    if fingerprint(self.rows[vendor_id]) != record.get("fp"):
+                        continue  # delta already folded in by an interrupted rewrite
+                    if record["op"] == "status":
+                        self.rows.set_field(vendor_id, STATUS_INDEX, record["status"])
+                    elif record["op"] == "del":
+                        del self.rows[vendor_id]
+                        del self._positions[vendor_id]
+        # Replaying someone else's delta does not make this process a writer;
+        # the next local edit folds it in with the rest
+
+    def _load_warm(self):
+        snapshot = open_snapshot(self.warm_path)
+        if snapshot is None:
+            return False
+        if snapshot.meta.get("stamps") != self._seen:
+            count("vendor.warm_stale")
+            return False
+        try:
+            self.rows.load_snapshot(snapshot)
+            positions = snapshot.array("positions")
+            self._next_id = snapshot.meta["next_id"]
+            self._file_rows = snapshot.meta["file_rows"]
+        except (KeyError, ValueError) as e:
+            print("Ignoring snapshot:", self.warm_path, e)
+            self.rows = VendorTable()
+            return False
+        self._positions = IdIndex()
+        self._positions.append_sorted(array('q', self.rows), positions)
+        self._warm = True
+        count("vendor.rows_read", len(self.rows))
+        return True
+
+    def _read_rows(self, reader, by_position):
+        for position, row in enumerate(reader):
+            self._file_rows = position + 1
+            if len(row) == len(VENDOR_HEADER):
+                vendor_id = self._next_id
+                self._next_id += 1
+                self._positions[vendor_id] = position
+                by_position[position] = vendor_id
+                yield vendor_id, row[1:]
+
+    # ----- Edits -----
+    def add(self, values):
+        return self.add_many([values])[0]
+
+    @timed("vendor.append")
+    def add_many(self, rows):
+        # One append for the whole batch; returns the new vendor IDs
+        with self.lock:
+            self._check_seen()
+            self._written = True
+            rows = [list(values) for values in rows]
+            new_file = not os.path.exists(self.path)
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                start = f.tell()
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(VENDOR_HEADER)
+                vendor_ids = []
+                for values in rows:
+                    writer.writerow([len(self.rows) + 1] + values)
+                    vendor_id = self._next_id
+                    self._next_id += 1
+                    self.rows[vendor_id] = values
+                    self._positions[vendor_id] = self._file_rows
+                    self._file_rows += 1
+                    vendor_ids.append(vendor_id)
+                count("vendor.bytes_written", f.tell() - start)
+            self._update_seen()
+            return vendor_ids
+
+    @timed("vendor.delta_append")
+    def _log(self, record):
+        self._check_seen()
+        self._written = True
+        with open(self.delta_path, 'a', encoding='utf-8') as f:
+            start = f.tell()
+            f.write(json.dumps(record) + "\n")
+            count("vendor.bytes_written", f.tell() - start)
+        self._update_seen()
+        self._dirty = True
+        self._schedule_rewrite()
+
+    def update_status(self, vendor_id, status):
+        with self.lock:
+            self._log({"op": "status", "pos": self._positions[vendor_id],
+                       "fp": fingerprint(self.rows[vendor_id]), "status": status})
+            self.rows.set_field(vendor_id, STATUS_INDEX, status)
+
+    def delete(self, vendor_id):
+        with self.lock:
+            self._log({"op": "del", "pos": self._positions[vendor_id],
+                       "fp": fingerprint(self.rows[vendor_id])})
+            del self.rows[vendor_id]
+            del self._positions[vendor_id]
+
+    # ----- Debounced rewrite -----
+    def _schedule_rewrite(self):
+        if self._timer is not None:
+            return  # coalesce with the rewrite already scheduled
+        # The first edit after a rewrite opens a window; everything edited in
+        # it is written together when the window closes
+        self._timer = threading.Timer(self.rewrite_interval, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._dirty:
+                self._rewrite()
+            if not self._warm:
+                self._save_warm()
+
+    @timed("vendor.rewrite")
+    def _rewrite(self):
+        # Caller holds self.lock
+        self._check_seen()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(VENDOR_HEADER)
+            for s_no, values in enumerate(self.rows.values(), 1):
+                writer.writerow([s_no] + values)
+            f.flush()
+            os.fsync(f.fileno())
+            count("vendor.bytes_written", f.tell())
+            count("vendor.rows_written", len(self.rows))
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.delta_path):
+            os.remove(self.delta_path)
+        self._positions = IdIndex((vendor_id, position) for position, vendor_id in enumerate(self.rows))
+        self._file_rows = len(self.rows)
+        self._dirty = False
+        self._foreign = False  # the files hold this table again
+        self._update_seen()
+
+    def changed_elsewhere(self):
+        # A read-only copy (nothing edited here) that another process has
+        # written past: the caller should load a fresh store
+        with self.lock:
+            return not self._written and self._stamps() != self._seen
+
+    def discard(self):
+        # Drops a read-only copy replaced by a fresh load
+        atexit.unregister(self.flush)
+        if self._timer is not None:
+            self._timer.cancel()
+
+    # ----- Warm start -----
+    def _stamps(self):
+        return [file_stamp(self.path), file_stamp(self.delta_path)]
+
+    def _check_seen(self):
+        # Caller holds self.lock, before writing: any change since the load or
+        # this process's last write came from another process
+        if self._stamps() != self._seen:
+            self._foreign = True
+
+    def _update_seen(self):
+        # Caller holds self.lock, after writing
+        self._seen = self._stamps()
+        self._warm = False
+
+    @timed("vendor.save_warm")
+    def _save_warm(self):
+        # Caller holds self.lock. Skipped if another process has written since
+        # the load: the table no longer matches the files
+        if self._foreign or self._stamps() != self._seen or self._seen[0] is None:
+            return
+        meta = {"stamps": self._seen, "next_id": self._next_id, "file_rows": self._file_rows}
+        self._warm = self.rows.save_snapshot(self.warm_path, meta, {"positions": self._positions.values})
@@ -0,0 +1,182 @@
+# Columnar table for vendor orders: vendor_id -> values (VENDOR_FIELDS plus
+# Total Price), stored as one column per field instead of one list of strings
+# per row. Cells are interned strings (dates, products, colours, statuses,
+# vendor names and most prices repeat across rows), and Quantity, Price and
+# Total Price are also kept in float arrays for arithmetic. Reading a row
+# builds its list on demand, with the same string values that are in the CSV.
+import sys
+from array import array
+from collections.abc import MutableMapping
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter, lt
+from .id_index import IdIndex
+from .snapshot import SnapshotError, write_snapshot
+
+VENDOR_FIELDS = ['Order Date', 'Customer ID', 'Product ID', 'Product Name', 'Customer Name',
+                 'Quantity', 'Colour', 'Price', 'Status', 'Vendor Name', 'Vendor Delivered Date']
+QUANTITY_INDEX = VENDOR_FIELDS.index('Quantity')
+PRICE_INDEX = VENDOR_FIELDS.index('Price')
+TOTAL_INDEX = len(VENDOR_FIELDS)
+VALUE_COUNT = len(VENDOR_FIELDS) + 1
+BATCH_ROWS = 4096  # rows per column-wise batch in extend()
+NUMBER_INDEXES = (QUANTITY_INDEX, PRICE_INDEX, TOTAL_INDEX)
+COLUMN_NAMES = VENDOR_FIELDS + ['Total Price']  # snapshot section names
+
+
+def _text(value):
+    return sys.intern(value) if value.__class__ is str else ('' if value is None else str(value))
+
+
+@lru_cache(maxsize=65536)
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class VendorTable(MutableMapping):
+    def __init__(self, rows=()):
+        self._slots = IdIndex()  # vendor_id -> slot; IDs ascend in S.No order
+        self._free = []
+        self._cells = [[] for _ in range(VALUE_COUNT)]  # interned text, one list per column
+        self._numbers = {index: array('d') for index in NUMBER_INDEXES}  # the same cells as floats
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __contains__(self, vendor_id):
+        return vendor_id in self._slots
+
+    def __getitem__(self, vendor_id):
+        slot = self._slots[vendor_id]
+        return [cells[slot] for cells in self._cells]
+
+    def __setitem__(self, vendor_id, values):
+        # Rows shorter than VALUE_COUNT (no Total Price yet) are padded with ''
+        if len(values) != VALUE_COUNT:
+            values = (list(values) + [''] * VALUE_COUNT)[:VALUE_COUNT]
+        values = [sys.intern(value) if value.__class__ is str else _text(value) for value in values]
+        slot = self._slots.get(vendor_id)
+        if slot is None and self._free:
+            slot = self._free.pop()
+        if slot is None:
+            slot = len(self._cells[0])
+            for cells, value in zip(self._cells, values):
+                cells.append(value)
+            for index, numbers in self._numbers.items():
+                numbers.append(_number(values[index]))
+        else:
+            for cells, value in zip(self._cells, values):
+                cells[slot] = value
+            for index, numbers in self._numbers.items():
+                numbers[slot] = _number(values[index])
+        self._slots[vendor_id] = slot
+
+    def extend(self, rows):
+        # Bulk load of (vendor_id, values) pairs, filled column by column so
+        # the per-cell work stays in C. Batches with anything unusual (known
+        # IDs, short rows, non-string cells) go through __setitem__ instead
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, BATCH_ROWS))
+            if not batch:
+                break
+            vendor_ids = [vendor_id for vendor_id, _ in batch]
+            rows_values = [values for _, values in batch]
+            columns = None
+            ascending = all(map(lt, vendor_ids, islice(vendor_ids, 1, None)))
+            if not self._free and ascending and (self._slots.last() is None or vendor_ids[0] > self._slots.last()) \
+                    and all(len(values) == VALUE_COUNT for values in rows_values):
+                try:
+                    columns = [list(map(sys.intern, map(itemgetter(index), rows_values)))
+                               for index in range(VALUE_COUNT)]
+                except TypeError:
+                    columns = None
+            if columns is None:
+                for vendor_id, values in batch:
+                    self[vendor_id] = values
+                continue
+            start = len(self._cells[0])
+            for cells, column in zip(self._cells, columns):
+                cells.extend(column)
+            for index, numbers in self._numbers.items():
+                numbers.extend(map(_number, columns[index]))
+            self._slots.append_sorted(vendor_ids, range(start, start + len(batch)))
+
+    def __delitem__(self, vendor_id):
+        slot = self._slots.pop(vendor_id)
+        for cells in self._cells:
+            cells[slot] = None
+        self._free.append(slot)
+
+    def items(self):
+        # Rows are built column by column, which keeps the per-cell work in C
+        vendor_ids, slots = self._slots.ids[:], self._slots.values[:]
+        columns = [map(cells.__getitem__, slots) for cells in self._cells]
+        for vendor_id, values in zip(vendor_ids, zip(*columns)):
+            yield vendor_id, list(values)
+
+    def values(self):
+        for _, values in self.items():
+            yield values
+
+    def copy(self):
+        table = VendorTable()
+        table._slots = self._slots.copy()
+        table._free = list(self._free)
+        table._cells = [cells.copy() for cells in self._cells]
+        table._numbers = {index: array('d', numbers) for index, numbers in self._numbers.items()}
+        return table
+
+    def save_snapshot(self, path, meta, arrays=()):
+        # Writes the live rows to a snapshot file (core/snapshot.py) in
+        # vendor_id order, renumbered to slots 0..n-1. arrays: extra columns
+        # for the caller (VendorStore's file positions)
+        slots = self.slots()
+        arrays = dict(arrays, vendor_ids=self._slots.ids)
+        arrays.update({f"number:{COLUMN_NAMES[index]}": array('d', map(numbers.__getitem__, slots))
+                       for index, numbers in self._numbers.items()})
+        texts = {name: map(cells.__getitem__, slots) for name, cells in zip(COLUMN_NAMES, self._cells)}
+        return write_snapshot(path, meta, arrays, texts)
+
+    def load_snapshot(self, snapshot):
+        # Replaces the contents with a snapshot written by save_snapshot; text
+        # cells are decoded when first read
+        vendor_ids = snapshot.array("vendor_ids")
+        self._cells = [snapshot.text(name) for name in COLUMN_NAMES]
+        self._numbers = {index: snapshot.array(f"number:{COLUMN_NAMES[index]}") for index in NUMBER_INDEXES}
+        if any(len(cells) != len(vendor_ids) for cells in self._cells):
+            raise SnapshotError(f"{snapshot.path}: column lengths differ")
+        self._slots = IdIndex()
+        self._slots.append_sorted(vendor_ids, range(len(vendor_ids)))
+        self._free = []
+
+    def field(self, vendor_id, index):
+        return self._cells[index][self._slots[vendor_id]]
+
+    def set_field(self, vendor_id, index, value):
+        slot = self._slots[vendor_id]
+        self._cells[index][slot] = _text(value)
+        if index in self._numbers:
+            self._numbers[index][slot] = _number(value)
+
+    def slots(self):
+        # Slots of the live rows in vendor_id order, for column-wise passes
+        return array('q', self._slots.values)
+
+    def column(self, index):
+        return self._cells[index]
+
+    def numbers(self, index):
+        # Float array for Quantity, Price or Total Price, indexed by slot
+        return self._numbers[index]
+
+    def number(self, vendor_id, index):
+        # Quantity, Price or Total Price as a float (0.0 if the text is not a number)
+        return self._numbers[index][self._slots[vendor_id]]
@@ -0,0 +1,47 @@
+# Toggleable "Dashboard" window over a Ledger (core/ledger.py): balances,
+# revenue and vendor totals, refreshed live from the running aggregates. The
+# ledger lives on the app's I/O worker; each refresh asks it for a summary.
+import tkinter as tk
+from core.ledger import format_dashboard
+
+REFRESH_MS = 1000
+_windows = {}  # root -> open dashboard Toplevel
+
+
+def toggle_dashboard_window(root, finance_summary):
+    # finance_summary(on_done): the book's, calls on_done(Ledger.summary()) on the UI thread
+    win = _windows.pop(root, None)
+    if win is not None and win.winfo_exists():
+        win.destroy()
+        return
+    _windows[root] = open_dashboard_window(root, finance_summary)
+
+
+def open_dashboard_window(root, finance_summary):
+    win = tk.Toplevel(root)
+    win.title("Dashboard")
+    win.configure(bg='#153e75')
+
+    text = tk.Text(win, width=70, height=40, font=("Courier", 10))
+    text.pack(fill='both', expand=True, padx=10, pady=10)
+
+    def show(summary):
+        # The next refresh is asked for once this one is shown, so slow
+        # summaries never pile up on the worker
+        if not win.winfo_exists():
+            return
+        text.delete("1.0", tk.END)
+        text.insert(tk.END, format_dashboard(summary))
+        win.after(REFRESH_MS, refresh)
+
+    def refresh():
+        if win.winfo_exists():
+            finance_summary(show)
+
+    def on_close():
+        _windows.pop(root, None)
+        win.destroy()
+
+    win.protocol("WM_DELETE_WINDOW", on_close)
+    refresh()
+    return win
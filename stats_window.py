@@ -0,0 +1,72 @@
+# Toggleable "Stats" window for the instrumentation in instrumentation.py:
+# p50/p99 latency per timer plus the row and byte counters, refreshed live.
+import tkinter as tk
+from tkinter import ttk
+from core.instrumentation import STATS
+
+REFRESH_MS = 1000
+_windows = {}  # root -> open stats Toplevel
+
+
+def toggle_stats_window(root):
+    win = _windows.pop(root, None)
+    if win is not None and win.winfo_exists():
+        win.close()
+        return
+    _windows[root] = open_stats_window(root)
+
+
+def open_stats_window(root):
+    win = tk.Toplevel(root)
+    win.title("Stats")
+    win.geometry("700x500")
+
+    top = tk.Frame(win)
+    top.pack(fill='x', padx=10, pady=5)
+    was_enabled = STATS.enabled  # put back when the window closes
+    collecting = tk.IntVar(value=int(STATS.enabled))
+
+    def set_collecting():
+        STATS.enabled = bool(collecting.get())
+
+    tk.Checkbutton(top, text="Collect", variable=collecting, command=set_collecting).pack(side='left')
+    tk.Button(top, text="Reset", command=STATS.reset).pack(side='left', padx=5)
+
+    columns = ("count", "p50_ms", "p99_ms", "max_ms", "total_ms")
+    timers = ttk.Treeview(win, columns=columns, height=14)
+    timers.heading("#0", text="Timer")
+    timers.column("#0", width=220)
+    for column in columns:
+        timers.heading(column, text=column)
+        timers.column(column, width=90, anchor='e')
+    timers.pack(fill='both', expand=True, padx=10, pady=5)
+
+    counters = ttk.Treeview(win, columns=("value",), height=8)
+    counters.heading("#0", text="Counter")
+    counters.column("#0", width=220)
+    counters.heading("value", text="value")
+    counters.column("value", width=150, anchor='e')
+    counters.pack(fill='both', expand=True, padx=10, pady=5)
+
+    def refresh():
+        if not win.winfo_exists():
+            return
+        snapshot = STATS.snapshot()
+        timers.delete(*timers.get_children())
+        for name, t in snapshot["timers"].items():
+            timers.insert('', 'end', text=name, values=(
+                t["count"], f"{t['p50_ms']:.3f}", f"{t['p99_ms']:.3f}", f"{t['max_ms']:.3f}", f"{t['total_ms']:.1f}"))
+        counters.delete(*counters.get_children())
+        for name, value in snapshot["counters"].items():
+            counters.insert('', 'end', text=name, values=(f"{value:,}",))
+        win.after(REFRESH_MS, refresh)
+
+    def on_close():
+        _windows.pop(root, None)
+        STATS.enabled = was_enabled
+        win.destroy()
+
+    win.close = on_close
+    win.protocol("WM_DELETE_WINDOW", on_close)
+    refresh()
+    return win